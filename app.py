@@ -1,11 +1,51 @@
 import os
-import json
-import time
+import sys
+import multiprocessing
 from datetime import datetime
-from utils import file_utils
-from parser import ads_parser, phones_parser
+from utils import file_utils, log_utils, profiling, storage
+from parser import ads_parser, phones_parser, pipeline
+import config
+import database
+
+def run_queue_worker():
+    """Воркер парсинга телефонов, берущий объявления из общей очереди"""
+    database.init_db()
+    file_utils.ensure_output_dir()
+    log = log_utils.create_pipeline(print)
+    try:
+        with profiling.profile_stage(f"phones_worker_{os.getpid()}"):
+            parser = phones_parser.CianPhoneParser(log_callback=log)
+            parser.parse_queue()
+    finally:
+        log.close()
+
+def run_phone_stage(log_callback=None):
+    """Запускает парсинг телефонов в одном процессе или несколькими воркерами"""
+    if config.PHONE_WORKERS <= 1:
+        with profiling.profile_stage("phones"):
+            parser = phones_parser.CianPhoneParser(log_callback=log_callback)
+            parser.parse()
+        return
+    
+    print(f"Запускаем {config.PHONE_WORKERS} воркеров парсинга телефонов...")
+    workers = [
+        multiprocessing.Process(target=run_queue_worker, name=f"phone-worker-{i}")
+        for i in range(config.PHONE_WORKERS)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
 
 def main():
+    database.init_db()
+    log = log_utils.create_pipeline(print)
+    try:
+        run(log)
+    finally:
+        log.close()
+
+def run(log):
     file_utils.ensure_output_dir()
     region_file = file_utils.get_region_file()
     
@@ -16,8 +56,7 @@ def main():
     # Проверяем наличие файла с данными
     if os.path.exists(region_file):
         try:
-            with open(region_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = storage.load(region_file)
             
             if "data" in data and len(data["data"]) > 0:
                 # Фильтруем только выбранные типы авторов
@@ -27,36 +66,49 @@ def main():
                 print("="*50)
                 print(f"Начинаем парсинг телефонов...")
                 print("="*50 + "\n")
-                parser = phones_parser.CianPhoneParser()
-                parser.parse()
+                run_phone_stage(log)
                 return
         
-        except (json.JSONDecodeError, KeyError) as e:
+        except (OSError, ValueError, KeyError) as e:
             print(f"Ошибка чтения файла регионов: {str(e)}. Будет выполнен перепарсинг.")
     
     print("Файл с объявлениями отсутствует или пуст.")
     
     if file_utils.is_parsing_in_progress():
         print("Парсинг объявлений уже выполняется. Ожидание завершения...")
-        
-        while file_utils.is_parsing_in_progress():
-            time.sleep(30)
-            print("Ожидание...")
+        if not file_utils.wait_for_parsing():
+            print(f"Парсинг объявлений завис ({file_utils.describe_hung_parsing()}). Завершите процесс и повторите запуск.")
+            return
         
         print("Парсинг объявлений завершен! Начинаем парсинг телефонов...")
-        parser = phones_parser.CianPhoneParser()
-        parser.parse()
+        run_phone_stage(log)
+    elif config.PIPELINE_ENABLED:
+        print("Запускаем конвейерный парсинг объявлений и телефонов...")
+        with profiling.profile_stage("pipeline"):
+            pipeline.run_pipeline(log_callback=log)
     else:
         print("Запускаем парсинг объявлений...")
-        success, count = ads_parser.parse_cian_ads(log_callback=print)
+        with profiling.profile_stage("ads"):
+            success, count = ads_parser.parse_cian_ads(log_callback=log)
         if success:
             print("\n" + "="*50)
             print(f"Данные объявлений сохранены в {region_file}")
             print(f"Найдено {count} объявлений после фильтрации")
             print("Начинаем парсинг телефонов...")
             print("="*50 + "\n")
-            parser = phones_parser.CianPhoneParser()
-            parser.parse()
+            run_phone_stage(log)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # --profile: профилирование этапов (то же, что CIAN_PROFILE=1)
+    if "--profile" in sys.argv[1:]:
+        config.PROFILE_ENABLED = True
+    
+    # --pipeline: объявления и телефоны парсятся одновременно (то же, что CIAN_PIPELINE=1)
+    if "--pipeline" in sys.argv[1:]:
+        config.PIPELINE_ENABLED = True
+    
+    # --worker: отдельный воркер очереди (например, на другом хосте с общим файлом очереди)
+    if "--worker" in sys.argv[1:]:
+        run_queue_worker()
+    else:
+        main()
\ No newline at end of file
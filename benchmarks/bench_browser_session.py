@@ -0,0 +1,76 @@
+"""Задержка активации и запасного пути Playwright: прежний профиль браузера против облегченного.
+
+Прежний профиль: перехват всех запросов в Python, полная загрузка страницы
+и фиксированные 5 секунд ожидания. Облегченный: картинки, шрифты и счетчики
+отменяются, ожидание заканчивается сразу после запроса к API.
+
+Запуск из корня проекта (нужны сеть и установленный chromium):
+python -m benchmarks.bench_browser_session [URL объявления застройщика] [повторов]
+"""
+import statistics
+import sys
+import time
+from utils import browser_session
+
+DEFAULT_URL = "https://tyumen.cian.ru/sale/flat/307997699/"
+
+def legacy_activation(url):
+    """Активация в том виде, в котором она была до облегченного профиля"""
+    with browser_session.light_page(block_resources=False) as page:
+        captured = []
+
+        def handle_request(route, request):
+            if browser_session.is_api_request(request):
+                captured.append(request)
+            route.continue_()
+
+        page.route("**/*", handle_request)
+        page.goto(url, wait_until="domcontentloaded", timeout=60000)
+        browser_session.click_contacts(page)
+        try:
+            page.wait_for_selector(browser_session.PHONE_SELECTOR, state="attached", timeout=10000)
+        except Exception:
+            pass
+        page.wait_for_timeout(5000)
+        return bool(captured)
+
+def light_activation(url):
+    with browser_session.light_page() as page:
+        try:
+            browser_session.capture_api_request(page, url)
+            return True
+        except Exception:
+            return False
+
+def legacy_fallback(url):
+    with browser_session.light_page(block_resources=False) as page:
+        return browser_session.read_phone(page, url) is not None
+
+def light_fallback(url):
+    with browser_session.light_page() as page:
+        return browser_session.read_phone(page, url) is not None
+
+def measure(func, url, runs):
+    timings = []
+    successes = 0
+    for _ in range(runs):
+        started = time.perf_counter()
+        successes += bool(func(url))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), max(timings), successes
+
+def main():
+    url = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_URL
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    print(f"URL: {url}, повторов: {runs}")
+    for name, func in [
+        ("активация (прежняя)", legacy_activation),
+        ("активация (облегченная)", light_activation),
+        ("запасной путь (прежний)", legacy_fallback),
+        ("запасной путь (облегченный)", light_fallback),
+    ]:
+        median, worst, successes = measure(func, url, runs)
+        print(f"{name}: медиана {median:.2f} с, максимум {worst:.2f} с, успешно {successes}/{runs}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Экспорт 100k записей телефонов во все доступные форматы.
+
+Для каждого формата выводит время записи, пик дополнительной памяти
+(tracemalloc, отдельным прогоном) и размер файла; последней строкой -
+экспорт с фильтром по источнику и типу автора. Файлы пишутся во
+временную директорию.
+
+Запуск из корня проекта: python -m benchmarks.bench_export [количество]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from parser import export
+from parser.models import PhoneRecord, AuthorType
+from benchmarks.bench_records_memory import make_phone_dicts, AUTHOR_TYPES
+
+def make_records(count):
+    records = {}
+    for i, (aid, data) in enumerate(make_phone_dicts(count).items()):
+        record = PhoneRecord.from_dict(data)
+        record.author_type = AuthorType.parse(AUTHOR_TYPES[i % len(AUTHOR_TYPES)])
+        records[aid] = record
+    return records
+
+def measure(parsed_data, path, fmt, sources=None, author_types=None):
+    started = time.perf_counter()
+    written = export.export(export.select(parsed_data, sources, author_types), path, fmt, ["заголовок"])
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    export.export(export.select(parsed_data, sources, author_types), path, fmt, ["заголовок"])
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return written, elapsed, peak, os.path.getsize(path)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    parsed_data = make_records(count)
+    formats = [fmt for fmt in export.FORMATS if fmt != "parquet" or export.pyarrow is not None]
+    print(f"Записей: {count}" + ("" if export.pyarrow is not None else " (parquet пропущен: pyarrow не установлен)"))
+    print(f"{'формат':<22} {'записей':>8} {'время, мс':>10} {'пик памяти, КБ':>15} {'размер, КБ':>11}")
+    with tempfile.TemporaryDirectory() as workdir:
+        runs = [(fmt, fmt, None, None) for fmt in formats]
+        runs.append(("csv (api, homeowner)", "csv", ["api"], ["homeowner"]))
+        for name, fmt, sources, author_types in runs:
+            path = os.path.join(workdir, f"phones.{fmt}")
+            written, elapsed, peak, size = measure(parsed_data, path, fmt, sources, author_types)
+            print(f"{name:<22} {written:>8} {elapsed * 1000:>10.1f} {peak / 1024:>15.1f} {size / 1024:>11.1f}")
+
+if __name__ == "__main__":
+    main()
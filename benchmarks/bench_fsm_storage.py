@@ -0,0 +1,68 @@
+"""Задержка операций хранилища состояний FSM: MemoryStorage против SQLiteStorage.
+
+Имитирует нажатия кнопок в диалоге настроек (get_data + update_data +
+get_state) для многих пользователей и выводит медиану и p99 на операцию.
+Второй процесс одновременно пишет в тот же файл, проверяя, что общий
+доступ нескольких процессов бота не приводит к ошибкам блокировки.
+
+Запуск из корня проекта: python -m benchmarks.bench_fsm_storage [нажатий]
+"""
+import asyncio
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from utils.fsm_storage import SQLiteStorage
+
+USERS = 50
+
+async def tap(storage, key, floor):
+    data = await storage.get_data(bot=None, key=key)
+    floors = data.get("min_floors", [])
+    floors.append(floor)
+    await storage.update_data(bot=None, key=key, data={"min_floors": floors[-20:]})
+    await storage.get_state(bot=None, key=key)
+
+async def measure(storage, taps):
+    timings = []
+    for i in range(taps):
+        key = StorageKey(bot_id=1, chat_id=i % USERS, user_id=i % USERS)
+        started = time.perf_counter()
+        await tap(storage, key, i % 100)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+def background_writer(db_path, taps):
+    async def run():
+        storage = SQLiteStorage(db_path)
+        for i in range(taps):
+            await tap(storage, StorageKey(bot_id=2, chat_id=i % USERS, user_id=i % USERS), i % 100)
+        await storage.close()
+    asyncio.run(run())
+
+async def main():
+    taps = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "fsm.db")
+        writer = multiprocessing.Process(target=background_writer, args=(db_path, taps))
+        writer.start()
+        for name, storage in (("memory", MemoryStorage()), ("sqlite", SQLiteStorage(db_path))):
+            median, p99 = await measure(storage, taps)
+            print(f"{name:<7} медиана {median * 1e6:8.1f} мкс, p99 {p99 * 1e6:8.1f} мкс на нажатие")
+            await storage.close()
+        writer.join()
+        assert writer.exitcode == 0, "второй процесс завершился с ошибкой"
+
+        # Состояние переживает перезапуск
+        storage = SQLiteStorage(db_path)
+        data = await storage.get_data(bot=None, key=StorageKey(bot_id=2, chat_id=0, user_id=0))
+        print(f"После перезапуска: {len(data['min_floors'])} этажей в черновике пользователя второго процесса")
+        await storage.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
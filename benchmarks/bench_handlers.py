@@ -0,0 +1,272 @@
+"""Нагрузочный тест обработчиков бота на синтетических обновлениях Telegram.
+
+Несколько администраторов (отдельные чаты) одновременно проходят диалоги
+настроек: этажи с быстрыми нажатиями, цены, комнаты, типы авторов, регион.
+Обновления подаются в Dispatcher.feed_update; сессия бота подменена и
+отвечает на запросы к Bot API без сети. База настроек и файлы создаются
+во временной директории.
+
+Выводит распределение задержки по обработчикам и общую пропускную
+способность. Завершается с кодом 1, если p95 какого-либо обработчика
+превышает порог (--max-p95-ms или базовую линию с допуском --tolerance),
+либо пропускная способность ниже --min-throughput.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_handlers [--chats 50] [--rounds 3] [--api-ms 0]
+        [--storage memory|sqlite] [--max-p95-ms 100] [--min-throughput 0]
+        [--baseline файл.json] [--save-baseline файл.json] [--tolerance 0.5] [--min-delta-ms 1]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pydantic import ValidationError
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
+
+ADMIN_ID = 1000
+BOT_ID = 42
+
+class MockedSession(BaseSession):
+    """Сессия Bot API без сети: на любой запрос возвращает правдоподобный ответ"""
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1)
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = {
+            "message_id": next(self._message_ids),
+            "date": 0,
+            "chat": {"id": getattr(method, "chat_id", None) or ADMIN_ID, "type": "private"},
+            "text": ""
+        }
+        try:
+            return method.build_response({"ok": True, "result": message}).result
+        except ValidationError:
+            # Методы, возвращающие True (answerCallbackQuery, deleteMessage, ...)
+            return method.build_response({"ok": True, "result": True}).result
+
+    async def stream_content(self, url, timeout, chunk_size, raise_for_status):
+        yield b""
+
+    async def close(self):
+        pass
+
+class HandlerTimer(BaseMiddleware):
+    """Внутренний middleware: время выполнения по имени обработчика"""
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.timings[name].append(time.perf_counter() - started)
+
+class UpdateFactory:
+    """Синтетические обновления: сообщения и нажатия inline-кнопок"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def _user(self):
+        return {"id": ADMIN_ID, "is_bot": False, "first_name": "admin"}
+
+    def _message(self, chat_id, text=None, from_bot=False):
+        message = {
+            "message_id": next(self._ids),
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": BOT_ID, "is_bot": True, "first_name": "bot"} if from_bot else self._user()
+        }
+        if text is not None:
+            message["text"] = text
+        return message
+
+    def message(self, chat_id, text):
+        return Update(update_id=next(self._ids), message=self._message(chat_id, text))
+
+    def callback(self, chat_id, data):
+        return Update(update_id=next(self._ids), callback_query={
+            "id": str(next(self._ids)),
+            "from": self._user(),
+            "chat_instance": str(chat_id),
+            "message": self._message(chat_id, "клавиатура", from_bot=True),
+            "data": data
+        })
+
+def admin_dialog(factory, chat_id):
+    """Один проход администратора по настройкам"""
+    m = lambda text: factory.message(chat_id, text)
+    c = lambda data: factory.callback(chat_id, data)
+    return [
+        m("⚙️ Настройки парсинга"),
+        # Этажи: быстрые нажатия по кнопкам
+        m("🏢 Настроить этажи"),
+        c("floor_range_1_10"),
+        *[c(f"floor_{floor}") for floor in (2, 3, 4, 5, 6, 7, 8, 9, 5, 6)],
+        c("floor_save"),
+        c("floor_range_11_20"),
+        *[c(f"floor_{floor}") for floor in (12, 14, 16, 18)],
+        c("floor_save"),
+        # Цены
+        m("💰 Настроить цены"),
+        c("min_price_set"),
+        m("5000000"),
+        c("max_price_set"),
+        m("9000000"),
+        c("save_prices"),
+        # Комнаты
+        m("🚪 Выбрать комнаты"),
+        *[c(f"room_{room}") for room in (1, 2, 3, 2)],
+        c("save_rooms"),
+        # Типы авторов
+        m("👥 Типы авторов"),
+        c("toggle_author_homeowner"),
+        c("toggle_author_realtor"),
+        c("toggle_author_homeowner"),
+        c("save_authors"),
+        # Регион
+        m("📍 Изменить регион"),
+        m("Тюмень"),
+    ]
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def create_storage(kind, workdir):
+    if kind == "sqlite":
+        from utils.fsm_storage import SQLiteStorage
+        return SQLiteStorage(os.path.join(workdir, "fsm.db"))
+    return MemoryStorage()
+
+async def run(args, workdir):
+    import database
+    from handlers import settings, parsing
+
+    database.DB_NAME = os.path.join(workdir, "cian_bot.db")
+    database.init_db()
+
+    timer = HandlerTimer()
+    for router in (settings.router, parsing.router):
+        router.message.middleware(timer)
+        router.callback_query.middleware(timer)
+
+    dp = Dispatcher(storage=create_storage(args.storage, workdir))
+    dp.include_router(parsing.router)
+    dp.include_router(settings.router)
+    session = MockedSession(args.api_ms / 1000)
+    bot = Bot(f"{BOT_ID}:BENCHMARK", session=session)
+    factory = UpdateFactory()
+
+    # Прогрев: справочник регионов загружается один раз за процесс
+    from utils import async_settings
+    await async_settings.list_locations()
+
+    update_latencies = []
+
+    async def admin(chat_id):
+        # Обновления одного чата подаются последовательно, как их доставил бы Telegram
+        for _ in range(args.rounds):
+            for update in admin_dialog(factory, chat_id):
+                started = time.perf_counter()
+                await dp.feed_update(bot, update)
+                update_latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(admin(chat_id) for chat_id in range(1, args.chats + 1)))
+    elapsed = time.perf_counter() - started
+    await dp.storage.close()
+    return timer.timings, update_latencies, elapsed, session.calls
+
+def check(args, timings, throughput):
+    """Список нарушений порогов"""
+    from utils import serialization
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "rb") as f:
+            baseline = serialization.loads(f.read())
+
+    failures = []
+    for name, values in sorted(timings.items()):
+        p95_ms = percentile(values, 0.95) * 1000
+        if args.max_p95_ms and p95_ms > args.max_p95_ms:
+            failures.append(f"{name}: p95 {p95_ms:.2f} мс > порога {args.max_p95_ms:.2f} мс")
+        # Доли миллисекунды - шум измерения, а не регрессия
+        if name in baseline and p95_ms > baseline[name] * (1 + args.tolerance) and p95_ms - baseline[name] > args.min_delta_ms:
+            failures.append(f"{name}: p95 {p95_ms:.2f} мс > базовой линии {baseline[name]:.2f} мс (+{args.tolerance:.0%})")
+    if args.min_throughput and throughput < args.min_throughput:
+        failures.append(f"пропускная способность {throughput:.0f} обновлений/сек < {args.min_throughput:.0f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "wb") as f:
+            f.write(serialization.dumps({name: percentile(values, 0.95) * 1000 for name, values in timings.items()}, indent=True))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчиков бота")
+    parser.add_argument("--chats", type=int, default=50, help="одновременных администраторов (чатов)")
+    parser.add_argument("--rounds", type=int, default=3, help="проходов по настройкам на чат")
+    parser.add_argument("--api-ms", type=float, default=0, help="имитация задержки Bot API (мс)")
+    parser.add_argument("--storage", choices=("memory", "sqlite"), default="memory", help="хранилище FSM")
+    parser.add_argument("--max-p95-ms", type=float, default=100, help="порог p95 любого обработчика (мс), 0 - не проверять")
+    parser.add_argument("--min-throughput", type=float, default=0, help="минимум обновлений в секунду")
+    parser.add_argument("--baseline", help="JSON с p95 обработчиков (мс) из прошлого запуска")
+    parser.add_argument("--save-baseline", help="сохранить p95 этого запуска как базовую линию")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="допустимый рост p95 относительно базовой линии")
+    parser.add_argument("--min-delta-ms", type=float, default=1, help="рост p95 меньше стольких мс не считается регрессией")
+    args = parser.parse_args()
+
+    # Пути к файлам базовой линии - относительно исходной директории
+    for name in ("baseline", "save_baseline"):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+
+    os.environ["TELEGRAM_ADMIN_ID"] = str(ADMIN_ID)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Обработчики пишут временные файлы в текущую директорию
+        os.chdir(workdir)
+        try:
+            timings, update_latencies, elapsed, calls = asyncio.run(run(args, workdir))
+        finally:
+            os.chdir(cwd)
+
+    throughput = len(update_latencies) / elapsed
+    print(f"Чатов: {args.chats}, проходов: {args.rounds}, хранилище: {args.storage}, задержка API: {args.api_ms:.0f} мс")
+    print(f"Обновлений: {len(update_latencies)} за {elapsed:.2f} сек, {throughput:.0f} обновлений/сек, "
+          f"p50 {percentile(update_latencies, 0.5) * 1000:.2f} мс, p95 {percentile(update_latencies, 0.95) * 1000:.2f} мс")
+    print(f"Запросов к Bot API: {sum(calls.values())} ({', '.join(f'{k}: {v}' for k, v in calls.most_common())})\n")
+    print(f"{'обработчик':<32} {'вызовов':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9} {'макс, мс':>9}")
+    for name, values in sorted(timings.items(), key=lambda item: -percentile(item[1], 0.95)):
+        print(f"{name:<32} {len(values):>8} {statistics.median(values) * 1000:>9.2f} "
+              f"{percentile(values, 0.95) * 1000:>9.2f} {percentile(values, 0.99) * 1000:>9.2f} {max(values) * 1000:>9.2f}")
+
+    failures = check(args, timings, throughput)
+    if failures:
+        print("\n❌ Превышены пороги:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\n✅ Пороги не превышены")
+
+if __name__ == "__main__":
+    main()
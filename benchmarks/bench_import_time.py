@@ -0,0 +1,35 @@
+"""Время холодного старта: импорт app.py и bot.py в чистом интерпретаторе.
+
+Запуск из корня проекта: python -m benchmarks.bench_import_time [повторов]
+Для сравнения до/после запустите скрипт на разных коммитах (например, через git worktree).
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+MODULES = ["app", "bot", "parser.ads_parser", "parser.phones_parser"]
+
+def measure(module, runs, cwd):
+    env = dict(os.environ)
+    # bot.py создает Bot при импорте, токену достаточно корректного формата
+    env.setdefault("TELEGRAM_BOT_TOKEN", "123456:TEST")
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], cwd=cwd, env=env, check=True)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    cwd = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    baseline = measure("sys", runs, cwd)
+    print(f"Пустой интерпретатор: {baseline * 1000:.0f} мс (медиана из {runs})")
+    for module in MODULES:
+        elapsed = measure(module, runs, cwd)
+        print(f"import {module}: {elapsed * 1000:.0f} мс (+{(elapsed - baseline) * 1000:.0f} мс к интерпретатору)")
+
+if __name__ == "__main__":
+    main()
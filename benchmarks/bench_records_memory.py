@@ -0,0 +1,75 @@
+"""Сравнение памяти: словари vs компактные записи для 50k объявлений.
+
+Запуск из корня проекта: python -m benchmarks.bench_records_memory [количество]
+"""
+import json
+import sys
+import tracemalloc
+from parser.models import PhoneRecord, OfferRecord
+
+AUTHOR_TYPES = ["developer", "realtor", "real_estate_agent", "homeowner"]
+
+def make_phone_dicts(count):
+    # Имитируем загрузку data.json: строки создаются декодером заново для каждой записи
+    raw = {}
+    for i in range(count):
+        if i % 7 == 0:
+            raw[str(300000000 + i)] = {"phone": "не удалось получить", "notFormattedPhone": "", "source": "failed"}
+        else:
+            raw[str(300000000 + i)] = {
+                "phone": f"+7912{i:07d}",
+                "notFormattedPhone": f"7912{i:07d}",
+                "source": "api",
+                "siteBlockId": 10000 + i // 40
+            }
+    return json.loads(json.dumps({"data": raw}))["data"]
+
+def make_offer_dicts(count):
+    offers = []
+    for i in range(count):
+        offers.append({
+            "author": f"Автор {i % 500}",
+            "author_type": AUTHOR_TYPES[i % 4],
+            "url": f"https://tyumen.cian.ru/sale/flat/{300000000 + i}/",
+            "location": "Тюмень",
+            "deal_type": "sale",
+            "accommodation_type": "flat",
+            "floor": i % 25 + 1,
+            "floors_count": 25,
+            "rooms_count": i % 4 + 1,
+            "total_meters": 30.5 + i % 70,
+            "price": 4000000 + i * 10,
+            "district": "Центральный",
+            "street": "улица Республики",
+            "house_number": str(i % 200),
+            "underground": "",
+            "residential_complex": "ЖК Пример",
+        })
+    return json.loads(json.dumps(offers))
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    phone_dicts, phone_dicts_size = measure(lambda: make_phone_dicts(count))
+    _, phone_records_size = measure(lambda: {aid: PhoneRecord.from_dict(d) for aid, d in make_phone_dicts(count).items()})
+
+    offer_dicts, offer_dicts_size = measure(lambda: make_offer_dicts(count))
+    _, offer_records_size = measure(lambda: [OfferRecord.from_dict(d) for d in make_offer_dicts(count)])
+
+    print(f"Записей: {count}")
+    for name, before, after in (
+        ("parsed_data (телефоны)", phone_dicts_size, phone_records_size),
+        ("data (объявления)", offer_dicts_size, offer_records_size),
+    ):
+        print(f"{name}: словари {before / 1024 / 1024:.1f} МБ -> записи {after / 1024 / 1024:.1f} МБ "
+              f"({1 - after / before:.0%} экономии)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Кодирование и декодирование JSON: stdlib json против выбранной реализации serialization.
+
+Проверяет, что результат разбирается в те же значения, что и вывод stdlib
+(побайтно orjson может отличаться записью чисел с экспонентой, такие числа
+добавлены в документы), и сравнивает время на реалистичном файле региона
+(по умолчанию 50k объявлений) и файле телефонов.
+
+Запуск из корня проекта: python -m benchmarks.bench_serialization [количество] [повторов]
+"""
+import statistics
+import sys
+import time
+from utils import serialization
+from benchmarks.bench_records_memory import make_offer_dicts, make_phone_dicts
+
+# Числа, которые orjson и stdlib записывают по-разному: 1e16 / 1e+16, 1.5e-7 / 1.5e-07
+EXPONENT_FLOATS = [1e16, 1.5e-7, 1e-5, 2.5e22, -3e-10]
+
+def timed(func, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"Реализация: {serialization.BACKEND}, записей: {count}, повторов: {runs}")
+
+    documents = {
+        "регион": {"created_at": "2024-01-01T00:00:00Z", "region": {"name": "Тюмень", "id": 4827},
+                   "floats": EXPONENT_FLOATS, "data": make_offer_dicts(count)},
+        "телефоны": {"data": make_phone_dicts(count)},
+    }
+    for name, document in documents.items():
+        for indent in (False, True):
+            encoded = serialization.dumps(document, indent)
+            stdlib_encoded = serialization._dumps_stdlib(document, indent)
+            assert serialization.loads(encoded) == document
+            assert serialization.json.loads(encoded) == serialization.json.loads(stdlib_encoded), f"{name}: значения отличаются от stdlib json"
+
+            stdlib_dump = timed(lambda: serialization._dumps_stdlib(document, indent), runs)
+            fast_dump = timed(lambda: serialization.dumps(document, indent), runs)
+            stdlib_load = timed(lambda: serialization.json.loads(encoded), runs)
+            fast_load = timed(lambda: serialization.loads(encoded), runs)
+
+            layout = "с отступами" if indent else "компактно"
+            same_bytes = "совпадает" if encoded == stdlib_encoded else "отличается записью чисел"
+            print(f"{name} ({layout}, {len(encoded) / 1024 / 1024:.1f} МБ, вывод побайтно {same_bytes}):")
+            print(f"  запись: json {stdlib_dump * 1000:6.0f} мс, {serialization.BACKEND} {fast_dump * 1000:6.0f} мс "
+                  f"(x{stdlib_dump / fast_dump:.1f})")
+            print(f"  чтение: json {stdlib_load * 1000:6.0f} мс, {serialization.BACKEND} {fast_load * 1000:6.0f} мс "
+                  f"(x{stdlib_load / fast_load:.1f})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Размер файлов и время записи/чтения для кодеков хранения.
+
+Файл региона с синтетическими объявлениями и файл телефонов записываются
+каждым кодеком; чтение - через storage.load (как при загрузке данных).
+
+Запуск из корня проекта: python -m benchmarks.bench_storage_codecs [количество]
+"""
+import os
+import sys
+import tempfile
+import time
+from utils import storage
+from benchmarks.bench_records_memory import make_offer_dicts, make_phone_dicts
+
+def measure(codec, document, path):
+    started = time.perf_counter()
+    storage.dump(document, path, codec=codec)
+    write_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    loaded = storage.load(path)
+    read_time = time.perf_counter() - started
+
+    assert loaded == document, f"{codec}: данные после чтения отличаются"
+    return os.path.getsize(path), write_time, read_time
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    documents = {
+        "регион": {"created_at": "2024-01-01T00:00:00Z", "region": {"name": "Тюмень", "id": 4827}, "data": make_offer_dicts(count)},
+        "телефоны": {"data": make_phone_dicts(count)},
+    }
+
+    codecs = [c for c in storage.CODECS if storage.resolve_codec(c) == c]
+    if "zstd" not in codecs:
+        print("zstd пропущен: пакет zstandard не установлен")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, document in documents.items():
+            print(f"\n{name}, {count} записей:")
+            baseline = None
+            for codec in codecs:
+                size, write_time, read_time = measure(codec, document, os.path.join(tmp, f"{codec}.bin"))
+                baseline = baseline or size
+                print(f"  {codec:8} {size / 1024 / 1024:7.1f} МБ ({size / baseline:4.0%})  "
+                      f"запись {write_time * 1000:6.0f} мс  чтение {read_time * 1000:6.0f} мс")
+
+if __name__ == "__main__":
+    main()
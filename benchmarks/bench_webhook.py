@@ -0,0 +1,98 @@
+"""Нагрузочный тест режима webhook: пропускная способность и p95 обработки.
+
+Отправляет обновления POST-запросами на локальный сервер webhook и ждет их
+обработки. Обработчик имитирует обращение к Telegram API паузой. Проверяет,
+что обновления каждого чата обработаны в порядке отправки, и сравнивает
+один обработчик с пулом config.BOT_UPDATE_WORKERS.
+
+Обновления берутся из файла JSONL (по одному обновлению Telegram в строке),
+иначе генерируются сообщения от нескольких чатов.
+
+Запуск из корня проекта: python -m benchmarks.bench_webhook [обновлений|файл.jsonl] [пауза_мс]
+"""
+import asyncio
+import os
+import sys
+import time
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher, Router
+from aiogram.fsm.storage.memory import MemoryStorage
+from utils import serialization, webhook_server
+import config
+
+CHATS = 20
+
+def make_updates(count):
+    return [
+        {
+            "update_id": i,
+            "message": {
+                "message_id": i,
+                "date": 0,
+                "chat": {"id": i % CHATS + 1, "type": "private"},
+                "from": {"id": i % CHATS + 1, "is_bot": False, "first_name": "user"},
+                "text": f"сообщение {i}"
+            }
+        }
+        for i in range(count)
+    ]
+
+def load_updates(arg):
+    if arg and os.path.exists(arg):
+        with open(arg, "rb") as f:
+            return [serialization.loads(line) for line in f if line.strip()]
+    return make_updates(int(arg) if arg else 2000)
+
+async def run(updates, workers_count, delay):
+    seen = {}
+    router = Router()
+
+    @router.message()
+    async def handle(message):
+        seen.setdefault(message.chat.id, []).append(message.message_id)
+        # Имитация ответа через Telegram API
+        await asyncio.sleep(delay)
+
+    dp = Dispatcher(storage=MemoryStorage())
+    dp.include_router(router)
+    bot = Bot("42:BENCHMARK")
+    workers = webhook_server.ChatOrderedWorkers(lambda update: dp.feed_raw_update(bot, update), workers=workers_count)
+    app = webhook_server.create_app(dp, bot, workers, path="/webhook", secret="")
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=50)) as session:
+        async def post(update):
+            async with session.post(f"http://127.0.0.1:{port}/webhook", data=serialization.dumps(update),
+                                    headers={"Content-Type": "application/json"}) as response:
+                assert response.status == 200
+        # Telegram держит не больше max_connections одновременных запросов - отправляем пачками
+        for i in range(0, len(updates), 50):
+            await asyncio.gather(*(post(update) for update in updates[i:i + 50]))
+    await workers.join()
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+
+    sent = {}
+    for update in updates:
+        message = update.get("message")
+        if message:
+            sent.setdefault(message["chat"]["id"], []).append(message["message_id"])
+    assert seen == sent, "нарушен порядок обработки внутри чата"
+    print(f"обработчиков {workers_count:>3}: {len(updates) / elapsed:8.1f} обновлений/сек, "
+          f"p50 {workers.percentile(0.5) * 1000:7.1f} мс, p95 {workers.percentile(0.95) * 1000:7.1f} мс")
+
+async def main():
+    updates = load_updates(sys.argv[1] if len(sys.argv) > 1 else None)
+    delay = (float(sys.argv[2]) if len(sys.argv) > 2 else 20) / 1000
+    print(f"Обновлений: {len(updates)}, пауза обработчика: {delay * 1000:.0f} мс")
+    for workers_count in sorted({1, config.BOT_UPDATE_WORKERS, config.BOT_UPDATE_WORKERS * 4}):
+        await run(updates, workers_count, delay)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,21 +1,49 @@
 import os
 import asyncio
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
-from handlers import settings  # Импортируем обработчики настроек
-from utils import file_utils
+from handlers import settings, parsing  # Импортируем обработчики настроек и запуска парсинга
+from utils import file_utils, fsm_storage
+import database
+import config
 
 # Инициализация бота
 bot = Bot(token=os.getenv("TELEGRAM_BOT_TOKEN"))
-storage = MemoryStorage()
+# Состояния диалогов хранятся вне процесса и переживают перезапуск (config.FSM_STORAGE)
+storage = fsm_storage.create_storage()
 dp = Dispatcher(storage=storage)
 
 def setup_handlers():
+    dp.include_router(parsing.router)
     dp.include_router(settings.router)
 
+def enable_loop_debug():
+    """Режим отладки asyncio: в лог попадает каждый обратный вызов, занявший цикл дольше LOOP_SLOW_CALLBACK"""
+    import logging
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(name)s: %(message)s")
+    loop = asyncio.get_running_loop()
+    loop.set_debug(True)
+    loop.slow_callback_duration = config.LOOP_SLOW_CALLBACK
+    print(f"🐢 Отладка цикла событий: порог {config.LOOP_SLOW_CALLBACK * 1000:.0f} мс")
+
 async def main():
+    if config.LOOP_DEBUG:
+        enable_loop_debug()
+    # Инициализация БД выполняется явно при старте, а не при импорте
+    database.init_db()
+    file_utils.ensure_output_dir()
     setup_handlers()
-    await dp.start_polling(bot)
+    if config.BOT_MODE == "webhook":
+        # Обновления принимает локальный HTTP-сервер, чаты обрабатываются параллельно
+        from utils import webhook_server
+        await webhook_server.run_webhook(dp, bot)
+    else:
+        # Пока у бота зарегистрирован webhook, Telegram не отдает обновления через polling
+        await bot.delete_webhook()
+        try:
+            await dp.start_polling(bot)
+        finally:
+            # start_polling закрывает сессию бота, но не хранилище FSM
+            await dp.storage.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -3,6 +3,18 @@ from contextlib import closing
 
 DB_NAME = "cian_bot.db"
 
+# Настройки по умолчанию
+DEFAULT_SETTINGS = {
+    'region': 'Тюмень',
+    'region_id': '4827',
+    'rooms': '1,2,3,4',  # Комнаты по умолчанию
+    'min_floor': '',  # Пустое значение = все этажи
+    'max_floor': '',  # Пустое значение = все этажи
+    'min_price': '',  # Пустое значение = нет ограничений
+    'max_price': '',  # Пустое значение = нет ограничений
+    'author_types': 'developer,realtor,real_estate_agent,homeowner',  # Все типы по умолчанию
+}
+
 def init_db():
     with closing(sqlite3.connect(DB_NAME)) as conn:
         cursor = conn.cursor()
@@ -13,53 +25,12 @@ def init_db():
                 value TEXT NOT NULL
             )
         ''')
-        # Устанавливаем регион по умолчанию (Тюмень)
-        default_region = 'Тюмень'
-        default_region_id = '4827'
-        default_rooms = '1,2,3,4'  # Комнаты по умолчанию
-        default_min_floor = ''  # Пустое значение = все этажи
-        default_max_floor = ''  # Пустое значение = все этажи
-        default_min_price = ''  # Пустое значение = нет ограничений
-        default_max_price = ''  # Пустое значение = нет ограничений
-        default_author_types = 'developer,realtor,real_estate_agent,homeowner'  # Все типы по умолчанию
-        
         # Проверяем, есть ли уже настройки
         cursor.execute("SELECT value FROM settings WHERE key = 'region'")
         if not cursor.fetchone():
-            cursor.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('region', default_region)
-            )
-            cursor.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('region_id', default_region_id)
-            )
-            cursor.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('rooms', default_rooms)
-            )
-            # Добавляем настройки этажей
-            cursor.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('min_floor', default_min_floor)
-            )
-            cursor.execute(
+            cursor.executemany(
                 "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('max_floor', default_max_floor)
-            )
-            # Добавляем настройки цен
-            cursor.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('min_price', default_min_price)
-            )
-            cursor.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('max_price', default_max_price)
-            )
-            # Добавляем настройки типов авторов
-            cursor.execute(
-                "INSERT INTO settings (key, value) VALUES (?, ?)",
-                ('author_types', default_author_types)
+                DEFAULT_SETTINGS.items()
             )
         conn.commit()
 
@@ -79,5 +50,11 @@ def set_setting(key, value):
         )
         conn.commit()
 
-# Инициализация БД при импорте
-init_db()
\ No newline at end of file
+def set_settings(values):
+    """Записывает несколько настроек одной транзакцией"""
+    with closing(sqlite3.connect(DB_NAME)) as conn:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                values.items()
+            )
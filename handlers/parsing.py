@@ -0,0 +1,74 @@
+import os
+import asyncio
+from aiogram import Bot, Router, types, F
+from aiogram.types import FSInputFile
+from utils import file_utils, log_utils, profiling, async_settings
+from utils.telegram_progress import TelegramProgressReporter
+from handlers.settings import check_admin_access
+import config
+
+router = Router()
+
+# Одновременно в боте выполняется только одна задача парсинга
+_job_lock = asyncio.Lock()
+
+def run_parsing_job(log_callback):
+    """Полный цикл парсинга: объявления (если данные устарели) и телефоны. Возвращает файл с номерами"""
+    # Парсеры и их зависимости загружаются только при первом запуске задачи
+    from parser import ads_parser, phones_parser, pipeline
+    
+    region_file = file_utils.get_region_file()
+    
+    if file_utils.should_refresh_region_file(region_file):
+        if file_utils.is_parsing_in_progress():
+            log_utils.log_message(log_callback, "⏳ Парсинг объявлений уже выполняется. Ожидание завершения...")
+            if not file_utils.wait_for_parsing():
+                # Данные региона не обновились: телефоны по ним не парсим
+                hung = file_utils.describe_hung_parsing()
+                log_utils.log_message(log_callback, f"❌ Парсинг объявлений завис ({hung}). Завершите процесс и повторите запуск", level=log_utils.ERROR)
+                return None
+        elif config.PIPELINE_ENABLED:
+            # Объявления и телефоны обрабатываются одновременно, номера готовы сразу после обхода выдачи
+            with profiling.profile_stage("pipeline"):
+                return pipeline.run_pipeline(log_callback=log_callback)
+        else:
+            with profiling.profile_stage("ads"):
+                success, _ = ads_parser.parse_cian_ads(log_callback=log_callback)
+            if not success:
+                return None
+    
+    with profiling.profile_stage("phones"):
+        parser = phones_parser.CianPhoneParser(log_callback=log_callback)
+        return parser.parse()
+
+@router.message(F.text == "🚀 Парсить")
+async def start_parsing(message: types.Message, bot: Bot):
+    """Запуск парсинга с отчетом о ходе работы в одном статусном сообщении"""
+    if not await check_admin_access(message.from_user.id, message=message):
+        return
+    
+    if _job_lock.locked():
+        await message.answer("⏳ Парсинг уже выполняется, дождитесь завершения")
+        return
+    
+    async with _job_lock:
+        region_name = await async_settings.get_region_name()
+        reporter = TelegramProgressReporter(bot, message.chat.id, title=f"Парсинг: {region_name}")
+        await reporter.start()
+        result_file = None
+        success = False
+        try:
+            # Парсеры синхронные - запускаем их в отдельном потоке, чтобы не блокировать бота
+            result_file = await asyncio.to_thread(run_parsing_job, reporter)
+            # None - задача не дошла до файла с номерами (ошибка выдачи, зависшая блокировка, нет целей)
+            success = result_file is not None
+        except Exception as e:
+            await message.answer(f"❌ Ошибка парсинга: {str(e)}")
+        finally:
+            await reporter.finish(success)
+    
+    if result_file and os.path.exists(result_file):
+        await message.answer_document(
+            document=FSInputFile(result_file),
+            caption="📄 Результаты парсинга"
+        )
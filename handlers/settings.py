@@ -2,7 +2,6 @@ import os
 import json
 import re
 import asyncio
-import cianparser
 from datetime import datetime
 from aiogram import Router, types, F
 from aiogram.fsm.context import FSMContext
@@ -15,7 +14,7 @@ from aiogram.types import (
     KeyboardButton, 
     ReplyKeyboardRemove
 )
-from utils import file_utils, log_utils
+from utils import async_settings, log_utils
 from keyboards.settings import (
     create_main_keyboard,
     create_rooms_keyboard,
@@ -76,15 +75,16 @@ async def parsing_settings(message: types.Message):
     if not await check_admin_access(message.from_user.id, message=message):
         return
         
-    current_region = file_utils.get_region_name()
-    region_id = file_utils.get_region_id()
-    current_rooms = file_utils.get_rooms()
-    current_min_floor = file_utils.get_min_floor()
-    current_max_floor = file_utils.get_max_floor()
-    current_min_price = file_utils.get_min_price()
-    current_max_price = file_utils.get_max_price()
-    auto_parse_enabled = file_utils.get_setting('auto_parse_enabled', '0') == '1'
-    current_authors = file_utils.get_author_types()
+    settings = await async_settings.get_settings()
+    current_region = settings["region_name"]
+    region_id = settings["region_id"]
+    current_rooms = settings["rooms"]
+    current_min_floor = settings["min_floor"]
+    current_max_floor = settings["max_floor"]
+    current_min_price = settings["min_price"]
+    current_max_price = settings["max_price"]
+    auto_parse_enabled = settings["auto_parse_enabled"]
+    current_authors = settings["author_types"]
     
     # Форматируем этажи
     min_floor_text = "не задано" if not current_min_floor else ", ".join(map(str, current_min_floor))
@@ -147,7 +147,7 @@ async def author_types_settings(message: types.Message, state: FSMContext):
         return
     
     # Получаем текущие настройки
-    current_types = file_utils.get_author_types()
+    current_types = await async_settings.get_author_types()
     
     await state.set_state(AuthorTypesState.selecting)
     await message.answer(
@@ -163,7 +163,7 @@ async def toggle_author_type(callback: types.CallbackQuery, state: FSMContext):
         
     auth_type = callback.data.split("_")[-1]
     data = await state.get_data()
-    selected_types = data.get("selected_types", file_utils.get_author_types())
+    selected_types = data["selected_types"] if "selected_types" in data else await async_settings.get_author_types()
     
     if auth_type in selected_types:
         selected_types.remove(auth_type)
@@ -183,10 +183,10 @@ async def save_author_types(callback: types.CallbackQuery, state: FSMContext):
         return
         
     data = await state.get_data()
-    selected_types = data.get("selected_types", file_utils.get_author_types())
+    selected_types = data["selected_types"] if "selected_types" in data else await async_settings.get_author_types()
     
     # Сохраняем настройки
-    file_utils.set_author_types(selected_types)
+    await async_settings.set_author_types(selected_types)
     
     # Форматируем для сообщения
     author_names = {
@@ -243,16 +243,8 @@ async def send_regions_list(message: types.Message):
         return
         
     try:
-        # Генерируем файл со списком регионов
-        regions = cianparser.list_locations()
-        regions.sort(key=lambda x: x[0].lower())
-        
-        filename = "available_regions.txt"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write("Список доступных регионов для парсинга:\n")
-            f.write("=" * 50 + "\n\n")
-            for region in regions:
-                f.write(f"• {region[0]} (ID: {region[1]})\n")
+        # Генерируем файл со списком регионов (в потоке настроек, справочник кэшируется)
+        filename = await async_settings.write_locations_file()
         
         file = FSInputFile(filename)
         
@@ -265,7 +257,7 @@ async def send_regions_list(message: types.Message):
         )
         
         # Удаляем файл через 30 секунд
-        asyncio.create_task(file_utils.delete_file_after_delay(filename, 30))
+        asyncio.create_task(async_settings.delete_file_after_delay(filename, 30))
         
         # Предлагаем ввести регион
         await message.answer(
@@ -284,7 +276,7 @@ async def select_rooms(message: types.Message, state: FSMContext):
     if not await check_admin_access(message.from_user.id, message=message):
         return
         
-    current_rooms = file_utils.get_rooms()
+    current_rooms = await async_settings.get_rooms()
     keyboard = create_rooms_keyboard(current_rooms)
     
     await message.answer(
@@ -299,12 +291,31 @@ async def select_rooms(message: types.Message, state: FSMContext):
     await state.set_data({"selected_rooms": current_rooms})
     await state.set_state(RoomState.selecting_rooms)
 
+async def get_floor_draft(state: FSMContext):
+    """Этажи, которые пользователь редактирует: хранятся в состоянии FSM до сохранения"""
+    data = await state.get_data()
+    if "min_floors" not in data:
+        min_floors, max_floors = await async_settings.get_floors()
+        data = await state.update_data(min_floors=min_floors, max_floors=max_floors)
+    return data["min_floors"], data["max_floors"]
+
+async def get_price_draft(state: FSMContext):
+    """Цены, которые пользователь редактирует: хранятся в состоянии FSM до сохранения"""
+    data = await state.get_data()
+    if "min_price" not in data:
+        min_price, max_price = await async_settings.get_prices()
+        data = await state.update_data(min_price=min_price, max_price=max_price)
+    return data["min_price"], data["max_price"]
+
 @router.message(F.text.endswith("Настроить этажи"))
 async def setup_floors(message: types.Message, state: FSMContext):
     """Запуск настройки этажей"""
     if not await check_admin_access(message.from_user.id, message=message):
         return
         
+    # Выбор копится в состоянии и записывается в базу одним разом при сохранении
+    await state.set_data({})
+    await get_floor_draft(state)
     await state.set_state(MinFloorState.selecting_range)
     await message.answer(
         "Выберите диапазон для МИНИМАЛЬНОГО этажа:",
@@ -317,8 +328,14 @@ async def setup_prices(message: types.Message, state: FSMContext):
     if not await check_admin_access(message.from_user.id, message=message):
         return
         
-    current_min_price = file_utils.get_min_price()
-    current_max_price = file_utils.get_max_price()
+    # Цены копятся в состоянии и записываются в базу одним разом при сохранении
+    await state.set_data({})
+    await get_price_draft(state)
+    await show_prices(message, state)
+
+async def show_prices(message: types.Message, state: FSMContext):
+    """Показывает редактируемые цены и меню действий"""
+    current_min_price, current_max_price = await get_price_draft(state)
     
     min_price_text = "не задано" if not current_min_price else f"{current_min_price:,} ₽".replace(",", " ")
     max_price_text = "не задано" if not current_max_price else f"{current_max_price:,} ₽".replace(",", " ")
@@ -370,13 +387,12 @@ async def clear_price(callback: types.CallbackQuery, state: FSMContext):
         
     price_type = "min_price" if callback.data.startswith("min_price") else "max_price"
     
-    if price_type == "min_price":
-        file_utils.set_min_price(None)
-    else:
-        file_utils.set_max_price(None)
+    await get_price_draft(state)
+    await state.update_data({price_type: None})
+    await state.set_state(None)
     
     await callback.answer(f"✅ {price_type.replace('_', ' ').capitalize()} очищена")
-    await setup_prices(callback.message, state)
+    await show_prices(callback.message, state)
 
 @router.message(PriceState.min_price, F.text)
 async def process_min_price(message: types.Message, state: FSMContext):
@@ -384,19 +400,20 @@ async def process_min_price(message: types.Message, state: FSMContext):
     if not await check_admin_access(message.from_user.id, message=message):
         return
         
+    await get_price_draft(state)
     if message.text == "❌ Без ограничений":
-        file_utils.set_min_price(None)
+        await state.update_data(min_price=None)
         await message.answer("✅ Минимальная цена очищена")
     else:
         try:
             price = int(message.text)
-            file_utils.set_min_price(price)
+            await state.update_data(min_price=price)
             await message.answer(f"✅ Минимальная цена установлена: {price:,} ₽".replace(",", " "))
         except ValueError:
             await message.answer("❌ Неверный формат цены. Введите целое число (например: 5000000)")
     
-    await state.clear()
-    await setup_prices(message, state)
+    await state.set_state(None)
+    await show_prices(message, state)
 
 @router.message(PriceState.max_price, F.text)
 async def process_max_price(message: types.Message, state: FSMContext):
@@ -404,19 +421,20 @@ async def process_max_price(message: types.Message, state: FSMContext):
     if not await check_admin_access(message.from_user.id, message=message):
         return
         
+    await get_price_draft(state)
     if message.text == "❌ Без ограничений":
-        file_utils.set_max_price(None)
+        await state.update_data(max_price=None)
         await message.answer("✅ Максимальная цена очищена")
     else:
         try:
             price = int(message.text)
-            file_utils.set_max_price(price)
+            await state.update_data(max_price=price)
             await message.answer(f"✅ Максимальная цена установлена: {price:,} ₽".replace(",", " "))
         except ValueError:
             await message.answer("❌ Неверный формат цены. Введите целое число (например: 10000000)")
     
-    await state.clear()
-    await setup_prices(message, state)
+    await state.set_state(None)
+    await show_prices(message, state)
 
 @router.callback_query(F.data == "clear_prices")
 async def clear_all_prices(callback: types.CallbackQuery, state: FSMContext):
@@ -424,10 +442,9 @@ async def clear_all_prices(callback: types.CallbackQuery, state: FSMContext):
     if not await check_admin_access(callback.from_user.id, callback=callback):
         return
         
-    file_utils.set_min_price(None)
-    file_utils.set_max_price(None)
+    await state.update_data(min_price=None, max_price=None)
     await callback.answer("✅ Все цены очищены")
-    await setup_prices(callback.message, state)
+    await show_prices(callback.message, state)
 
 @router.callback_query(F.data == "save_prices")
 async def save_prices(callback: types.CallbackQuery, state: FSMContext):
@@ -435,6 +452,10 @@ async def save_prices(callback: types.CallbackQuery, state: FSMContext):
     if not await check_admin_access(callback.from_user.id, callback=callback):
         return
         
+    min_price, max_price = await get_price_draft(state)
+    await async_settings.set_prices(min_price, max_price)
+    await state.clear()
+    
     await callback.answer("✅ Настройки цен сохранены!")
     await parsing_settings(callback.message)
 
@@ -445,7 +466,7 @@ async def reset_settings(message: types.Message):
         return
         
     # Сбрасываем настройки
-    file_utils.reset_settings()
+    await async_settings.reset_settings()
     
     await message.answer(
         "✅ Все настройки сброшены к значениям по умолчанию:\n"
@@ -494,7 +515,7 @@ async def save_rooms(callback: types.CallbackQuery, state: FSMContext):
     selected_rooms = state_data.get("selected_rooms", [])
     
     # Сохраняем настройки
-    file_utils.set_rooms(selected_rooms)
+    await async_settings.set_rooms(selected_rooms)
     
     await callback.answer("✅ Настройки комнат сохранены!")
     await callback.message.delete()
@@ -510,9 +531,9 @@ async def min_floor_range_selected(callback: types.CallbackQuery, state: FSMCont
         return
         
     data = callback.data.split("_")
+    await get_floor_draft(state)
     if data[2] == "all":
-        await state.update_data(range_start=0, range_end=0, range_name="Все этажи")
-        file_utils.set_min_floor([])
+        await state.update_data(range_start=0, range_end=0, range_name="Все этажи", min_floors=[])
         await callback.answer("Минимальный этаж: без ограничений")
         await state.set_state(MaxFloorState.selecting_range)
         await callback.message.answer(
@@ -523,19 +544,16 @@ async def min_floor_range_selected(callback: types.CallbackQuery, state: FSMCont
     else:
         start = int(data[2])
         end = int(data[3])
-        await state.update_data(range_start=start, range_end=end, range_name=f"{start}-{end}")
+        state_data = await state.update_data(range_start=start, range_end=end, range_name=f"{start}-{end}")
     
     await state.set_state(MinFloorState.selecting_floors)
-    current_floors = file_utils.get_min_floor()
-    
-    state_data = await state.get_data()
     await callback.message.edit_text(
         f"Выберите МИНИМАЛЬНЫЕ этажи в диапазоне {state_data['range_name']}:\n"
         "(Нажмите на этаж, чтобы выбрать/отменить)",
         reply_markup=create_floor_selection_keyboard(
             state_data['range_start'],
             state_data['range_end'],
-            current_floors
+            state_data['min_floors']
         )
     )
 
@@ -547,19 +565,15 @@ async def min_floor_selected(callback: types.CallbackQuery, state: FSMContext):
         
     data_parts = callback.data.split("_")
     action = data_parts[1]
+    current_floors, _ = await get_floor_draft(state)
     state_data = await state.get_data()
-    current_floors = file_utils.get_min_floor()
     
     if action == "select":  # Выбрать все
-        new_floors = list(range(state_data['range_start'], state_data['range_end'] + 1))
-        file_utils.set_min_floor(new_floors)
+        current_floors = list(range(state_data['range_start'], state_data['range_end'] + 1))
         await callback.answer("Все этажи в диапазоне выбраны!") 
     elif action == "save":  # Сохранить
-        # Сохраняем минимальные этажи
-        current_min_floors = file_utils.get_min_floor()
-        
         # Вычисляем минимальное значение для максимального этажа
-        min_value_for_max = max(current_min_floors) if current_min_floors else 0
+        min_value_for_max = max(current_floors) if current_floors else 0
         
         await callback.answer("Выбор сохранён")
         await state.set_state(MaxFloorState.selecting_range)
@@ -581,17 +595,17 @@ async def min_floor_selected(callback: types.CallbackQuery, state: FSMContext):
             current_floors.remove(floor)
         else:
             current_floors.append(floor)
-        file_utils.set_min_floor(current_floors)
+        await callback.answer()
     
-    # Обновляем клавиатуру
+    # Выбор хранится только в состоянии, база не трогается до сохранения
+    await state.update_data(min_floors=current_floors)
     await callback.message.edit_reply_markup(
         reply_markup=create_floor_selection_keyboard(
             state_data['range_start'],
             state_data['range_end'],
-            file_utils.get_min_floor()
+            current_floors
         )
     )
-    await callback.answer()
 
 @router.callback_query(MaxFloorState.selecting_range, F.data.startswith("floor_range_"))
 async def max_floor_range_selected(callback: types.CallbackQuery, state: FSMContext):
@@ -600,32 +614,27 @@ async def max_floor_range_selected(callback: types.CallbackQuery, state: FSMCont
         return
         
     data = callback.data.split("_")
-    state_data = await state.get_data()
-    current_min_floors = file_utils.get_min_floor()
+    current_min_floors, _ = await get_floor_draft(state)
     min_value_for_max = max(current_min_floors) if current_min_floors else 0
     
     if data[2] == "all":
-        await state.update_data(range_start=0, range_end=0, range_name="Все этажи")
-        file_utils.set_max_floor([])
+        await state.update_data(range_start=0, range_end=0, range_name="Все этажи", max_floors=[])
         await callback.answer("Максимальный этаж: без ограничений")
         await save_floors_settings(callback.message, state)
         return
     else:
         start = int(data[2])
         end = int(data[3])
-        await state.update_data(range_start=start, range_end=end, range_name=f"{start}-{end}")
+        state_data = await state.update_data(range_start=start, range_end=end, range_name=f"{start}-{end}")
     
     await state.set_state(MaxFloorState.selecting_floors)
-    current_floors = file_utils.get_max_floor()
-    
-    state_data = await state.get_data()
     await callback.message.edit_text(
         f"Выберите МАКСИМАЛЬНЫЕ этажи в диапазоне {state_data['range_name']}:\n"
         "(Нажмите на этаж, чтобы выбрать/отменить)",
         reply_markup=create_floor_selection_keyboard(
             state_data['range_start'],
             state_data['range_end'],
-            current_floors,
+            state_data['max_floors'],
             min_value=min_value_for_max
         )
     )
@@ -638,18 +647,16 @@ async def max_floor_selected(callback: types.CallbackQuery, state: FSMContext):
         
     data_parts = callback.data.split("_")
     action = data_parts[1]
+    current_min_floors, current_floors = await get_floor_draft(state)
     state_data = await state.get_data()
-    current_floors = file_utils.get_max_floor()
-    current_min_floors = file_utils.get_min_floor()
     min_value_for_max = max(current_min_floors) if current_min_floors else 0
     
     if action == "select":  # Выбрать все
         # Фильтруем этажи по минимальному значению
-        new_floors = [
+        current_floors = [
             f for f in range(state_data['range_start'], state_data['range_end'] + 1) 
             if f >= min_value_for_max
         ]
-        file_utils.set_max_floor(new_floors)
         await callback.answer("Все этажи в диапазоне выбраны!")
     elif action == "save":  # Сохранить
         await save_floors_settings(callback.message, state)
@@ -672,26 +679,26 @@ async def max_floor_selected(callback: types.CallbackQuery, state: FSMContext):
             current_floors.remove(floor)
         else:
             current_floors.append(floor)
-        file_utils.set_max_floor(current_floors)
+        await callback.answer()
     
-    # Обновляем клавиатуру
+    # Выбор хранится только в состоянии, база не трогается до сохранения
+    await state.update_data(max_floors=current_floors)
     await callback.message.edit_reply_markup(
         reply_markup=create_floor_selection_keyboard(
             state_data['range_start'],
             state_data['range_end'],
-            file_utils.get_max_floor(),
+            current_floors,
             min_value=min_value_for_max
         )
     )
-    await callback.answer()
 
 async def save_floors_settings(message: types.Message, state: FSMContext):
-    """Сохранение настроек этажей и завершение"""
-    min_floors = file_utils.get_min_floor()
-    max_floors = file_utils.get_max_floor()
+    """Сохранение настроек этажей одной транзакцией и завершение"""
+    min_floors, max_floors = await get_floor_draft(state)
+    await async_settings.set_floors(min_floors, max_floors)
     
-    min_text = "не задано" if not min_floors else ", ".join(map(str, min_floors))
-    max_text = "не задано" if not max_floors else ", ".join(map(str, max_floors))
+    min_text = "не задано" if not min_floors else ", ".join(map(str, sorted(min_floors)))
+    max_text = "не задано" if not max_floors else ", ".join(map(str, sorted(max_floors)))
     
     await state.clear()
     await message.answer(
@@ -718,18 +725,13 @@ async def process_region_name(message: types.Message, state: FSMContext):
         return
         
     region_name = message.text.strip()
-    locations = cianparser.list_locations()
     
     # Ищем точное совпадение
-    found = None
-    for loc in locations:
-        if loc[0].lower() == region_name.lower():
-            found = loc
-            break
+    found = await async_settings.find_location(region_name)
     
     if found:
         region_id = found[1]
-        file_utils.set_region(region_name, region_id)
+        await async_settings.set_region(region_name, region_id)
         await state.clear()
         
         await message.answer(
@@ -742,12 +744,7 @@ async def process_region_name(message: types.Message, state: FSMContext):
         )
     else:
         # Попробуем найти похожие
-        similar = []
-        for loc in locations:
-            if region_name.lower() in loc[0].lower():
-                similar.append(loc[0])
-                if len(similar) >= 5:  # Ограничим 5 вариантами
-                    break
+        similar = await async_settings.suggest_locations(region_name, limit=5)  # Ограничим 5 вариантами
         
         if similar:
             suggestions = "\n".join([f"• {name}" for name in similar])
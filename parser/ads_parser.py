@@ -1,11 +1,9 @@
-import cianparser
-import json
 import re
 import time
-import requests
 from datetime import datetime
-from bs4 import BeautifulSoup
-from utils import file_utils, log_utils, format_utils
+from utils import file_utils, log_utils, format_utils, page_cache, http_client, storage, serialization
+from parser.models import OfferRecord, AuthorType
+import config
 
 def get_block_id_and_phone(url, author_type, log_callback=None):
     """Извлекает blockId и/или телефон из HTML страницы объявления в зависимости от типа автора"""
@@ -13,9 +11,7 @@ def get_block_id_and_phone(url, author_type, log_callback=None):
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        html_content = response.text
+        html_content = page_cache.fetch_page(url, headers=headers, timeout=15)
         
         block_id = None
         phone = None
@@ -27,19 +23,20 @@ def get_block_id_and_phone(url, author_type, log_callback=None):
             if match:
                 block_id = match.group(1)
                 msg = f"✅ Найден siteBlockId для застройщика: {block_id} для {url}"
-                log_utils.log_message(log_callback, msg)
+                log_utils.log_message(log_callback, msg, level=log_utils.DEBUG, stage="ads")
             else:
                 msg = f"❌ siteBlockId НЕ найден для застройщика на странице {url}"
-                log_utils.log_message(log_callback, msg)
+                log_utils.log_message(log_callback, msg, level=log_utils.WARNING, stage="ads")
         else:
             # ДЛЯ ОСТАЛЬНЫХ: ищем ТОЛЬКО offerPhone
             offer_match = re.search(r'"offerPhone":\s*"([^"]+)"', html_content)
             if offer_match:
                 phone = offer_match.group(1)
                 msg = f"✅ Найден готовый номер offerPhone: {phone} для {url}"
-                log_utils.log_message(log_callback, msg)
+                log_utils.log_message(log_callback, msg, level=log_utils.DEBUG, stage="ads")
             else:
                 # Если offerPhone не найден, пытаемся извлечь его напрямую из HTML
+                from bs4 import BeautifulSoup
                 soup = BeautifulSoup(html_content, 'html.parser')
                 phone_element = soup.select_one('[data-testid="PhoneLink"], .phone-number')
                 if phone_element:
@@ -47,18 +44,210 @@ def get_block_id_and_phone(url, author_type, log_callback=None):
                     # Очищаем номер от лишних символов
                     phone = re.sub(r'[^\d+]', '', phone)
                     msg = f"✅ Найден прямой телефон из HTML: {phone} для {url}"
-                    log_utils.log_message(log_callback, msg)
+                    log_utils.log_message(log_callback, msg, level=log_utils.DEBUG, stage="ads")
                 else:
                     msg = f"❌ offerPhone НЕ найден для НЕ-застройщика на странице {url}"
-                    log_utils.log_message(log_callback, msg)
+                    log_utils.log_message(log_callback, msg, level=log_utils.WARNING, stage="ads")
         
         return block_id, phone
     
     except Exception as e:
         msg = f"❌ Ошибка при получении данных: {str(e)}"
-        log_utils.log_message(log_callback, msg)
+        log_utils.log_message(log_callback, msg, level=log_utils.WARNING, stage="ads")
         return None, None
 
+def load_search_settings():
+    """Параметры поиска из настроек бота"""
+    return {
+        "region_name": file_utils.get_region_name(),
+        "region_id": file_utils.get_region_id(),
+        "rooms": file_utils.get_rooms(),
+        "min_floor": file_utils.get_min_floor(),
+        "max_floor": file_utils.get_max_floor(),
+        "min_price": file_utils.get_min_price(),
+        "max_price": file_utils.get_max_price(),
+        "author_types": file_utils.get_author_types()
+    }
+
+def log_search_settings(settings, log_callback=None):
+    log_utils.log_message(log_callback, f"👥 Выбранные типы авторов: {', '.join(settings['author_types'])}")
+    
+    log_utils.log_message(log_callback, f"📍 Парсинг объявлений для региона: {settings['region_name']} (ID: {settings['region_id']})")
+    log_utils.log_message(log_callback, f"🏠 Выбранные комнаты: {', '.join(map(str, settings['rooms']))}")
+    
+    if settings["min_floor"]:
+        log_utils.log_message(log_callback, f"⬇️ Мин. этаж: {settings['min_floor']}")
+    if settings["max_floor"]:
+        log_utils.log_message(log_callback, f"⬆️ Макс. этаж: {settings['max_floor']}")
+    if settings["min_price"]:
+        log_utils.log_message(log_callback, f"💰 Мин. цена: {format_utils.format_price(settings['min_price'])}")
+    if settings["max_price"]:
+        log_utils.log_message(log_callback, f"💰 Макс. цена: {format_utils.format_price(settings['max_price'])}")
+
+# Типы авторов, объявления которых CIAN публикует только в новостройках
+_NEW_BUILDING_AUTHOR_TYPES = {"developer", "representative_developer"}
+
+def build_author_filter(author_types):
+    """Серверный фильтр выдачи CIAN для выбранных типов авторов и его описание для лога.
+
+    CIAN фильтрует только собственников (is_by_homeowner) и тип жилья
+    (object_type), поэтому фильтр передается, лишь когда он не отсекает
+    выбранные типы; точная проверка типа автора все равно выполняется на
+    каждой странице.
+    """
+    selected = set(author_types)
+    if selected == {"homeowner"}:
+        return {"is_by_homeowner": True}, "только собственники"
+    if selected and selected <= _NEW_BUILDING_AUTHOR_TYPES:
+        return {"object_type": "new"}, "только новостройки"
+    return {}, None
+
+def build_additional_settings(settings, start_page=1, end_page=200):
+    """Дополнительные настройки запроса cianparser"""
+    additional_settings = {
+        "start_page": start_page,
+        "end_page": end_page,
+    }
+    
+    # Этажи хранятся списками выбранных значений, CIAN принимает границы диапазона
+    if settings["min_floor"]:
+        additional_settings["min_floor"] = min(settings["min_floor"])
+    if settings["max_floor"]:
+        additional_settings["max_floor"] = max(settings["max_floor"])
+    for key in ("min_price", "max_price"):
+        if settings[key]:
+            additional_settings[key] = settings[key]
+    
+    additional_settings.update(build_author_filter(settings["author_types"])[0])
+    return additional_settings
+
+class ListingStats:
+    """Статистика обхода выдачи: запросы страниц и отсев объявлений на странице"""
+
+    def __init__(self, settings):
+        self.region_id = str(settings["region_id"])
+        self.author_types = set(settings["author_types"])
+        self.server_filter = build_author_filter(settings["author_types"])[1]
+        self.pages = 0
+        self.kept = 0
+        self.dropped = 0
+        self.author_counts = {}
+
+    def count(self, author_type, kept):
+        self.author_counts[author_type] = self.author_counts.get(author_type, 0) + 1
+        if kept:
+            self.kept += 1
+        else:
+            self.dropped += 1
+
+    def _load_history(self):
+        path = file_utils.get_listing_stats_file()
+        try:
+            with open(path, "rb") as f:
+                return serialization.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Запоминает доли типов авторов в регионе по обходу без серверного фильтра"""
+        if self.server_filter or not self.author_counts:
+            return
+        history = self._load_history()
+        history[self.region_id] = self.author_counts
+        with open(file_utils.get_listing_stats_file(), "wb") as f:
+            f.write(serialization.dumps(history))
+
+    def estimate_saved_pages(self):
+        """Оценка запросов выдачи, сэкономленных серверным фильтром (None - нет данных)"""
+        if not self.server_filter:
+            return 0
+        counts = self._load_history().get(self.region_id)
+        if not counts:
+            return None
+        share = sum(n for t, n in counts.items() if t in self.author_types) / sum(counts.values())
+        if share <= 0:
+            return None
+        return max(round(self.pages / share) - self.pages, 0)
+
+    def format_stats(self):
+        """Форматирует статистику для итогового отчета"""
+        text = f"📄 Выдача: {self.pages} запросов страниц, подходящих {self.kept}, отброшено на странице {self.dropped}"
+        if self.server_filter:
+            saved = self.estimate_saved_pages()
+            estimate = f"≈{saved}" if saved is not None else "нет данных для оценки"
+            text += f"; фильтр на сервере: {self.server_filter}, сэкономлено запросов: {estimate}"
+        return text
+
+def iter_listing(settings, stats, log_callback=None, max_pages=None):
+    """Обходит выдачу постранично и отдает подходящие объявления по мере загрузки страниц.
+
+    Объявления неподходящих типов авторов отбрасываются сразу на своей
+    странице и дальше не хранятся и не обогащаются.
+    """
+    # Внимание: Для работы этой части нужен установленный пакет cianparser
+    # pip install cianparser
+    # Импортируем только при запуске этапа: cianparser тянет за собой тяжелые зависимости
+    import cianparser
+    parser = cianparser.CianParser(location=settings["region_name"])
+    author_types = set(settings["author_types"])
+    seen = set()
+    
+    for page in range(1, (max_pages or config.LISTING_MAX_PAGES) + 1):
+        additional_settings = build_additional_settings(settings, start_page=page, end_page=page)
+        listing = parser.get_flats(deal_type="sale", rooms=tuple(settings["rooms"]), additional_settings=additional_settings)
+        stats.pages += 1
+        file_utils.touch_parsing()
+        
+        new_urls = 0
+        for item in listing:
+            offer = OfferRecord.from_dict(item)
+            if not offer.url or offer.url in seen:
+                continue
+            seen.add(offer.url)
+            new_urls += 1
+            kept = item.get('author_type') in author_types
+            stats.count(item.get('author_type'), kept)
+            if kept:
+                yield offer
+        
+        # За последней страницей cianparser возвращает пустую выдачу или повторяет уже виденные объявления
+        if not new_urls:
+            break
+        log_utils.log_message(log_callback, f"📄 Страница {page}: {new_urls} объявлений, всего подходящих {stats.kept}", level=log_utils.DEBUG, stage="ads")
+    
+    stats.save()
+
+def enrich_offer(offer, log_callback=None):
+    """Дополняет объявление blockId (застройщики) или телефоном (остальные). Возвращает True, если что-то найдено"""
+    block_id, phone = get_block_id_and_phone(offer.url, offer.author_type, log_callback)
+    
+    if offer.author_type is AuthorType.DEVELOPER:
+        # Для застройщиков сохраняем blockId, phone остается None
+        offer.block_id = block_id
+    else:
+        # Для остальных сохраняем phone, blockId остается None
+        offer.direct_phone = phone
+    
+    return bool(block_id or phone)
+
+def save_region_data(region_file, settings, data):
+    """Сохраняет объявления региона вместе с параметрами поиска"""
+    result_data = {
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "region": {
+            "name": settings["region_name"],
+            "id": settings["region_id"]
+        },
+        "rooms": settings["rooms"],
+        "min_floor": settings["min_floor"],
+        "max_floor": settings["max_floor"],
+        "min_price": settings["min_price"],
+        "max_price": settings["max_price"],
+        "data": [offer.to_dict() for offer in data]
+    }
+    
+    storage.dump(result_data, region_file)
+
 def parse_cian_ads(log_callback=None):
     """Парсит объявления с CIAN и сохраняет в regions.json"""
     log_utils.log_message(log_callback, f"[{datetime.now()}] Начало парсинга объявлений...")
@@ -71,144 +260,83 @@ def parse_cian_ads(log_callback=None):
             log_utils.log_message(log_callback, "⚠️ Данные региона устарели (>1 дня). Удаляем и обновляем...")
             file_utils.remove_region_file(region_file)
         
-        # Создаем lock-файл
-        file_utils.start_parsing()
-        
-        # Получаем регион из настроек
-        region_name = file_utils.get_region_name()
-        region_id = file_utils.get_region_id()
-        rooms = file_utils.get_rooms()
-        min_floor = file_utils.get_min_floor()
-        max_floor = file_utils.get_max_floor()
-        min_price = file_utils.get_min_price()
-        max_price = file_utils.get_max_price()
-        
-        # Получаем выбранные типы авторов
-        author_types = file_utils.get_author_types()
-        log_utils.log_message(log_callback, f"👥 Выбранные типы авторов: {', '.join(author_types)}")
-        
-        log_utils.log_message(log_callback, f"📍 Парсинг объявлений для региона: {region_name} (ID: {region_id})")
-        log_utils.log_message(log_callback, f"🏠 Выбранные комнаты: {', '.join(map(str, rooms))}")
-        
-        if min_floor:
-            log_utils.log_message(log_callback, f"⬇️ Мин. этаж: {min_floor}")
-        if max_floor:
-            log_utils.log_message(log_callback, f"⬆️ Макс. этаж: {max_floor}")
-        if min_price:
-            log_utils.log_message(log_callback, f"💰 Мин. цена: {format_utils.format_price(min_price)}")
-        if max_price:
-            log_utils.log_message(log_callback, f"💰 Макс. цена: {format_utils.format_price(max_price)}")
-        
-        # Формируем дополнительные настройки
-        additional_settings = {
-            "start_page": 1,
-            "end_page": 200,
-        }
+        # Захватываем блокировку парсинга
+        if not file_utils.start_parsing():
+            hung = file_utils.describe_hung_parsing()
+            message = f"❌ Процесс парсинга объявлений завис: {hung}" if hung else "⏳ Парсинг объявлений уже выполняется другим процессом"
+            log_utils.log_message(log_callback, message, level=log_utils.ERROR)
+            return False, 0
         
-        if min_floor:
-            additional_settings["min_floor"] = min_floor
-        if max_floor:
-            additional_settings["max_floor"] = max_floor
-        if min_price:
-            additional_settings["min_price"] = min_price
-        if max_price:
-            additional_settings["max_price"] = max_price
-        
-        # Парсим данные
-        # Внимание: Для работы этой части нужен установленный пакет cianparser
-        # pip install cianparser
-        parser = cianparser.CianParser(location=region_name)
-        data = parser.get_flats(deal_type="sale", rooms=tuple(rooms), additional_settings=additional_settings)
-        
-        # Фильтруем данные по выбранным типам авторов
-        filtered_data = [item for item in data if item.get('author_type') in author_types]
-        data = filtered_data
-        
-        # Проверяем и корректируем URL
-        for item in data:
-            if 'url' in item and not item['url'].startswith('http'):
-                item['url'] = f"https://www.cian.ru{item['url']}"
-        
-        # Получаем blockId и телефон для ВСЕХ объявлений В ЗАВИСИМОСТИ ОТ ТИПА АВТОРА
-        for item in data:
-            url = item.get('url')
-            author_type = item.get('author_type')
-            
-            if url and author_type:
-                block_id, phone = get_block_id_and_phone(url, author_type, log_callback)
-                
-                if author_type == 'developer':
-                    # Для застройщиков сохраняем blockId, phone остается None
-                    item['blockId'] = block_id
-                    item['directPhone'] = None
-                else:
-                    # Для остальных сохраняем phone, blockId остается None
-                    item['blockId'] = None
-                    item['directPhone'] = phone
+        cache = page_cache.get_page_cache()
+        cache.reset_stats()
+        
+        # Получаем регион, фильтры и типы авторов из настроек
+        settings = load_search_settings()
+        log_search_settings(settings, log_callback)
+        stats = ListingStats(settings)
+        if stats.server_filter:
+            log_utils.log_message(log_callback, f"🔎 Фильтр по типам авторов передается CIAN: {stats.server_filter}")
+        
+        # Объявления приходят постранично и обогащаются сразу, не дожидаясь конца выдачи.
+        # Получаем blockId и телефон В ЗАВИСИМОСТИ ОТ ТИПА АВТОРА
+        data = []
+        enriched = 0
+        for offer in iter_listing(settings, stats, log_callback):
+            data.append(offer)
+            if offer.url:
+                if enrich_offer(offer, log_callback):
+                    enriched += 1
                 
                 # Задержка, чтобы не нагружать сервер
                 time.sleep(1.5)
-            else:
-                item['blockId'] = None
-                item['directPhone'] = None
-        
-        # Формируем данные для сохранения с метаданными
-        result_data = {
-            "created_at": datetime.utcnow().isoformat() + "Z",
-            "region": {
-                "name": region_name,
-                "id": region_id
-            },
-            "rooms": rooms,
-            "min_floor": min_floor,
-            "max_floor": max_floor,
-            "min_price": min_price,
-            "max_price": max_price,
-            "data": data
-        }
+            # Общее число объявлений растет по мере обхода выдачи
+            log_utils.report_progress(log_callback, "ads", len(data), stats.kept, enriched)
+            file_utils.touch_parsing()
         
-        # Сохраняем ВСЕ данные
-        with open(region_file, 'w', encoding='utf-8') as f:
-            json.dump(result_data, f, ensure_ascii=False, indent=2)
+        # Сохраняем ВСЕ данные с метаданными
+        save_region_data(region_file, settings, data)
         
         # Считаем статистику по типам авторов
         author_stats = {}
         phones_found = 0
         block_ids_found = 0
         
-        for item in data:
-            author_type = item.get('author_type', 'unknown')
+        for offer in data:
+            author_type = offer.author_type.value
             if author_type not in author_stats:
                 author_stats[author_type] = {'total': 0, 'with_phone': 0, 'with_blockid': 0}
             
             author_stats[author_type]['total'] += 1
             
-            if item.get('directPhone'):
+            if offer.direct_phone:
                 author_stats[author_type]['with_phone'] += 1
                 phones_found += 1
             
-            if item.get('blockId'):
+            if offer.block_id:
                 author_stats[author_type]['with_blockid'] += 1
                 block_ids_found += 1
         
         # Логируем статистику
-        log_utils.log_message(log_callback, f"[{datetime.now()}] Успешно! Сохранено {len(data)} объявлений в {region_file}")
+        log_utils.log_message(log_callback, f"[{datetime.now()}] Успешно! Сохранено {len(data)} объявлений в {region_file}", level=log_utils.SUMMARY)
         
-        log_utils.log_message(log_callback, "\n📊 СТАТИСТИКА ПО ТИПАМ АВТОРОВ:")
-        for author_type, stats in author_stats.items():
+        log_utils.log_message(log_callback, "\n📊 СТАТИСТИКА ПО ТИПАМ АВТОРОВ:", level=log_utils.SUMMARY)
+        for author_type, counts in author_stats.items():
             if author_type == 'developer':
-                log_utils.log_message(log_callback, f"  🏢 {author_type}: {stats['total']} объявлений, {stats['with_blockid']} с blockId (для API)")
+                log_utils.log_message(log_callback, f"  🏢 {author_type}: {counts['total']} объявлений, {counts['with_blockid']} с blockId (для API)", level=log_utils.SUMMARY)
             else:
-                log_utils.log_message(log_callback, f"  👤 {author_type}: {stats['total']} объявлений, {stats['with_phone']} с готовыми телефонами")
+                log_utils.log_message(log_callback, f"  👤 {author_type}: {counts['total']} объявлений, {counts['with_phone']} с готовыми телефонами", level=log_utils.SUMMARY)
         
-        log_utils.log_message(log_callback, f"\n📞 Всего найдено готовых номеров (НЕ застройщики): {phones_found}")
-        log_utils.log_message(log_callback, f"🔗 Всего найдено blockId (застройщики): {block_ids_found}")
+        log_utils.log_message(log_callback, f"\n📞 Всего найдено готовых номеров (НЕ застройщики): {phones_found}", level=log_utils.SUMMARY)
+        log_utils.log_message(log_callback, f"🔗 Всего найдено blockId (застройщики): {block_ids_found}", level=log_utils.SUMMARY)
+        log_utils.log_message(log_callback, stats.format_stats(), level=log_utils.SUMMARY)
+        log_utils.log_message(log_callback, cache.format_stats(), level=log_utils.SUMMARY)
+        log_utils.log_message(log_callback, http_client.get_client().format_stats(), level=log_utils.SUMMARY)
         
         return True, len(data)
     
     except Exception as e:
-        log_utils.log_message(log_callback, f"[{datetime.now()}] Ошибка парсинга: {str(e)}")
+        log_utils.log_message(log_callback, f"[{datetime.now()}] Ошибка парсинга: {str(e)}", level=log_utils.ERROR)
         return False, 0
     finally:
-        # Всегда удаляем lock-файл
+        # Всегда освобождаем блокировку
         file_utils.finish_parsing()
\ No newline at end of file
@@ -0,0 +1,192 @@
+"""Экспорт результатов парсинга телефонов.
+
+Записи перебираются потоково (без промежуточных списков) и пишутся через
+буфер config.EXPORT_BUFFER_SIZE во временный файл, который затем заменяет
+итоговый.
+
+Форматы:
+    txt      - текстовый отчет для Telegram (прежний формат)
+    csv      - одна строка на объявление, заголовок COLUMNS
+    jsonl    - один JSON-объект на строку с ключами COLUMNS
+    parquet  - колоночный формат группами по config.EXPORT_BATCH_SIZE строк (нужен пакет pyarrow)
+"""
+import csv
+import os
+from datetime import datetime
+from utils import serialization
+from parser.models import FAILED_PHONE, Source, AuthorType
+import config
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+FORMATS = ("txt", "csv", "jsonl", "parquet")
+
+COLUMNS = ("id", "phone", "not_formatted_phone", "source", "author_type", "site_block_id", "reason", "attempts", "next_retry_at")
+
+_SOURCE_EMOJI = {
+    Source.DIRECT: "📋",
+    Source.API: "🔗",
+    Source.HTML: "🌐",
+    Source.FAILED: "❌"
+}
+
+def _parse_values(enum, values, name):
+    """Множество значений перечисления; опечатка в фильтре - ValueError, а не тихий UNKNOWN"""
+    if not values:
+        return None
+    known = {member.value for member in enum}
+    unknown = [value for value in values if value not in known]
+    if unknown:
+        raise ValueError(f"Неизвестный {name} в фильтре экспорта: {', '.join(unknown)} (допустимо: {', '.join(sorted(known))})")
+    return {enum(value) for value in values}
+
+def check_settings(formats=None, sources=None, author_types=None):
+    """Проверяет настройки экспорта до начала парсинга, чтобы ошибка не проявилась в конце долгого запуска"""
+    formats = config.EXPORT_FORMATS if formats is None else formats
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown:
+        raise ValueError(f"Неизвестный формат экспорта: {', '.join(unknown)} (допустимо: {', '.join(FORMATS)})")
+    _parse_values(Source, config.EXPORT_SOURCES if sources is None else sources, "источник")
+    _parse_values(AuthorType, config.EXPORT_AUTHOR_TYPES if author_types is None else author_types, "тип автора")
+
+def select(parsed_data, sources=None, author_types=None):
+    """Перебирает пары (ID, PhoneRecord), подходящие под фильтры.
+
+    Пустой фильтр пропускает все записи; запись без типа автора
+    считается типом unknown. Неизвестное значение фильтра - ValueError.
+    """
+    sources = _parse_values(Source, sources, "источник")
+    author_types = _parse_values(AuthorType, author_types, "тип автора")
+    return _select(parsed_data, sources, author_types)
+
+def _select(parsed_data, sources, author_types):
+    for aid, record in parsed_data.items():
+        if sources is not None and record.source not in sources:
+            continue
+        if author_types is not None and (record.author_type or AuthorType.UNKNOWN) not in author_types:
+            continue
+        yield aid, record
+
+def count(records):
+    """Число записей и успешно полученных номеров"""
+    total = success = 0
+    for _, record in records:
+        total += 1
+        success += record.is_success
+    return total, success
+
+def _rows(records):
+    """Строки в порядке COLUMNS; отсутствующие значения - None"""
+    # _value_ вместо свойства value: на 100k записей дескриптор Enum заметно дороже
+    for aid, record in records:
+        yield (
+            aid,
+            record.phone or None,
+            record.not_formatted_phone or None,
+            record.source._value_,
+            record.author_type._value_ if record.author_type is not None else None,
+            record.site_block_id,
+            record.reason,
+            record.attempts,
+            datetime.fromtimestamp(record.next_retry_at).isoformat() if record.next_retry_at else None
+        )
+
+def _write_txt(path, records, header):
+    written = 0
+    with open(path, "w", encoding="utf-8", buffering=config.EXPORT_BUFFER_SIZE) as f:
+        f.write("📊 ОТЧЕТ О ПАРСИНГЕ ТЕЛЕФОННЫХ НОМЕРОВ\n")
+        f.write("="*60 + "\n\n")
+        for line in header or ():
+            f.write(f"{line}\n")
+        f.write("\n📞 СПАРСЕННЫЕ НОМЕРА:\n")
+        f.write("="*60 + "\n")
+        separator = "-"*50
+        for aid, record in records:
+            f.write(
+                f"🆔 ID: {aid}\n"
+                f"📞 Телефон: {record.phone or FAILED_PHONE}\n"
+                f"{_SOURCE_EMOJI.get(record.source, '❓')} Источник: {record.source.value}\n"
+                f"{separator}\n"
+            )
+            written += 1
+    return written
+
+def _write_csv(path, records):
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="", buffering=config.EXPORT_BUFFER_SIZE) as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writerow = writer.writerow
+        for row in _rows(records):
+            writerow(row)
+            written += 1
+    return written
+
+def _write_jsonl(path, records):
+    written = 0
+    with open(path, "wb", buffering=config.EXPORT_BUFFER_SIZE) as f:
+        dumps, write = serialization.dumps, f.write
+        for row in _rows(records):
+            write(dumps(dict(zip(COLUMNS, row))) + b"\n")
+            written += 1
+    return written
+
+def _parquet_schema():
+    return pyarrow.schema([
+        ("id", pyarrow.string()),
+        ("phone", pyarrow.string()),
+        ("not_formatted_phone", pyarrow.string()),
+        ("source", pyarrow.string()),
+        ("author_type", pyarrow.string()),
+        ("site_block_id", pyarrow.int64()),
+        ("reason", pyarrow.string()),
+        ("attempts", pyarrow.int32()),
+        ("next_retry_at", pyarrow.string())
+    ])
+
+def _write_parquet(path, records):
+    if pyarrow is None:
+        raise RuntimeError("Экспорт в parquet: установите пакет pyarrow")
+    schema = _parquet_schema()
+    written = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        columns = [[] for _ in COLUMNS]
+        for row in _rows(records):
+            for column, value in zip(columns, row):
+                column.append(value)
+            written += 1
+            # В памяти держится только текущая группа строк
+            if len(columns[0]) >= config.EXPORT_BATCH_SIZE:
+                writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+                columns = [[] for _ in COLUMNS]
+        if columns[0] or not written:
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+    return written
+
+def export(records, path, fmt, header=None):
+    """Записывает пары (ID, PhoneRecord) в файл формата fmt и возвращает число записей.
+
+    header - строки заголовка текстового отчета, для остальных форматов не используется.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+    tmp_path = f"{path}.tmp"
+    try:
+        if fmt == "txt":
+            written = _write_txt(tmp_path, records, header)
+        elif fmt == "csv":
+            written = _write_csv(tmp_path, records)
+        elif fmt == "jsonl":
+            written = _write_jsonl(tmp_path, records)
+        else:
+            written = _write_parquet(tmp_path, records)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return written
@@ -0,0 +1,161 @@
+from datetime import datetime
+from enum import Enum
+
+# Значение поля phone для неудачных записей в файле данных
+FAILED_PHONE = "не удалось получить"
+
+class Source(str, Enum):
+    """Источник номера телефона"""
+    DIRECT = "direct"
+    API = "api"
+    HTML = "html"
+    FAILED = "failed"
+    UNKNOWN = "unknown"
+
+    @classmethod
+    def parse(cls, value):
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.UNKNOWN
+
+class AuthorType(str, Enum):
+    """Тип автора объявления (значения cianparser)"""
+    DEVELOPER = "developer"
+    REAL_ESTATE_AGENT = "real_estate_agent"
+    HOMEOWNER = "homeowner"
+    REALTOR = "realtor"
+    OFFICIAL_REPRESENTATIVE = "official_representative"
+    REPRESENTATIVE_DEVELOPER = "representative_developer"
+    UNKNOWN = "unknown"
+
+    @classmethod
+    def parse(cls, value):
+        try:
+            return cls(value)
+        except ValueError:
+            return cls.UNKNOWN
+
+class PhoneRecord:
+    """Результат парсинга телефона для одного объявления.
+
+    Хранится в parsed_data вместо словаря; в формат файла data.json
+    преобразуется только при загрузке и сохранении.
+    """
+
+    __slots__ = (
+        "phone", "not_formatted_phone", "source", "site_block_id", "author_type",
+        "reason", "attempts", "next_retry_at"
+    )
+
+    def __init__(self, phone=None, not_formatted_phone="", source=Source.UNKNOWN, site_block_id=None, author_type=None,
+                 reason=None, attempts=0, next_retry_at=None):
+        self.phone = phone
+        self.not_formatted_phone = not_formatted_phone
+        self.source = source
+        self.site_block_id = site_block_id
+        self.author_type = author_type
+        # Только для неудачных записей: причина, число попыток и время следующей попытки (timestamp)
+        self.reason = reason
+        self.attempts = attempts
+        self.next_retry_at = next_retry_at
+
+    @classmethod
+    def failed(cls, site_block_id=None, author_type=None, reason=None):
+        return cls(None, "", Source.FAILED, site_block_id, author_type, reason, 1)
+
+    @property
+    def is_success(self):
+        return self.source is not Source.FAILED and bool(self.phone)
+
+    @classmethod
+    def from_dict(cls, data):
+        source = Source.parse(data.get("source", "unknown"))
+        phone = data.get("phone")
+        if phone == FAILED_PHONE:
+            phone = None
+        author_type = data.get("authorType")
+        next_retry_at = data.get("nextRetryAt")
+        return cls(
+            phone,
+            data.get("notFormattedPhone", ""),
+            source,
+            data.get("siteBlockId"),
+            AuthorType.parse(author_type) if author_type else None,
+            data.get("reason"),
+            # Старые записи о неудаче не содержат счетчика: считаем это одной попыткой
+            data.get("attempts", 1 if source is Source.FAILED else 0),
+            datetime.fromisoformat(next_retry_at).timestamp() if next_retry_at else None
+        )
+
+    def to_dict(self):
+        data = {
+            "phone": self.phone if self.phone else FAILED_PHONE,
+            "notFormattedPhone": self.not_formatted_phone,
+            "source": self.source.value
+        }
+        if self.site_block_id is not None:
+            data["siteBlockId"] = self.site_block_id
+        if self.author_type is not None:
+            data["authorType"] = self.author_type.value
+        if self.source is Source.FAILED:
+            data["reason"] = self.reason
+            data["attempts"] = self.attempts
+            data["nextRetryAt"] = datetime.fromtimestamp(self.next_retry_at).isoformat() if self.next_retry_at else None
+        return data
+
+# Общие кортежи имен полей: у всех объявлений cianparser одинаковый набор ключей
+_ATTR_SCHEMAS = {}
+
+def _intern_schema(keys):
+    keys = tuple(keys)
+    return _ATTR_SCHEMAS.setdefault(keys, keys)
+
+class OfferRecord:
+    """Объявление из выдачи cianparser.
+
+    Служебные поля вынесены в слоты, остальные данные объявления хранятся
+    кортежем значений с общей для всех объявлений схемой ключей.
+    """
+
+    __slots__ = ("url", "author_type", "block_id", "direct_phone", "_schema", "_values")
+
+    _CORE_KEYS = ("url", "author_type", "blockId", "directPhone")
+
+    def __init__(self, url, author_type, block_id=None, direct_phone=None, schema=(), values=()):
+        self.url = url
+        self.author_type = author_type
+        self.block_id = block_id
+        self.direct_phone = direct_phone
+        self._schema = schema
+        self._values = values
+
+    @classmethod
+    def from_dict(cls, data):
+        url = data.get("url")
+        if url and not url.startswith("http"):
+            url = f"https://www.cian.ru{url}"
+        schema = _intern_schema(k for k in data if k not in cls._CORE_KEYS)
+        return cls(
+            url,
+            AuthorType.parse(data.get("author_type")),
+            data.get("blockId"),
+            data.get("directPhone"),
+            schema,
+            tuple(data[k] for k in schema)
+        )
+
+    def get(self, key, default=None):
+        """Доступ к исходным полям объявления (price, floor, ...)"""
+        try:
+            return self._values[self._schema.index(key)]
+        except ValueError:
+            return default
+
+    def to_dict(self):
+        data = dict(zip(self._schema, self._values))
+        data["url"] = self.url
+        data["author_type"] = self.author_type.value
+        data["blockId"] = self.block_id
+        data["directPhone"] = self.direct_phone
+        return data
@@ -2,22 +2,39 @@ import json
 import time
 import os
 import re
-import requests
+import socket
 from datetime import datetime
 from requests.exceptions import RequestException
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-from utils import file_utils, log_utils, format_utils
+from utils import file_utils, log_utils, format_utils, page_cache, work_queue, browser_session, http_client, storage
+from utils.block_phone_cache import BlockPhoneCache
+from utils.api_sessions import ApiSessionPool, NoSessionsError, THROTTLE_STATUSES
+from utils.journal import Journal, journal_owner, is_orphaned
+from parser.models import PhoneRecord, Source, AuthorType
+from parser import export
 import config
 
 class CianPhoneParser:
     def __init__(self, max_phones=None, log_callback=None, clear_existing=False, is_scheduled=False):
+        # Ошибка в настройках экспорта обнаруживается до парсинга, а не после него
+        export.check_settings()
         file_utils.ensure_output_dir()
         self.parsed_data = {}
         self.max_phones = max_phones
         self.log_callback = log_callback
-        self.current_headers = config.HEADERS.copy()
-        self.current_payload_template = config.PAYLOAD_TEMPLATE.copy()
+        # Пул активированных сессий API создается только при наличии застройщиков
+        self.sessions = None
         self.is_scheduled = is_scheduled
+        self.block_phones = BlockPhoneCache()
+        self.retried_count = 0
+        self.gave_up_count = 0
+        # Браузерный пул для запасного пути создается при первой необходимости;
+        # если запустить его не удалось, до конца запуска используется синхронный путь
+        self.browser_pool = None
+        self.browser_pool_failed = False
+        self.pending_browser = {}
+        
+        # Результаты дописываются в журнал процесса сразу, основной файл переписывается при сжатии
+        self.journal = Journal(file_utils.get_phones_journal_file(journal_owner()))
         
         # Очистка старых файлов при необходимости
         if clear_existing:
@@ -56,99 +73,75 @@ class CianPhoneParser:
         # Выполняем активацию через браузер ТОЛЬКО если есть застройщики
         if 'developer' in self.author_types:
             self.log("🔧 Тип 'developer' присутствует - используем браузер + API")
-            self._activate_browser()
+            self.sessions = ApiSessionPool(self._activate_session, log=self.log)
+            self.sessions.start()
         else:
             self.log("🔧 Тип 'developer' отсутствует - используем только HTML парсинг")
 
-    def _activate_browser(self):
-        """Активирует парсер через браузер ТОЛЬКО если есть застройщики"""
+    def _activate_session(self, index=0):
+        """Активирует сессию API через браузер: возвращает (headers, payload_template) с cookies и analyticClientId.
+
+        RuntimeError - запрос к API перехватить не удалось (пул сессий учтет неудачную активацию).
+        """
         self.log("🌐 Запуск браузера для активации парсера...")
         
-        # Получаем список URL застройщиков для активации
+        # Каждая сессия активируется на своем объявлении застройщика
         urls = file_utils.extract_urls_from_regions(author_type='developer')
         if not urls:
             url = "https://tyumen.cian.ru/sale/flat/307997699/"  # дефолтный URL
             self.log(f"❌ Нет URL застройщиков, используем дефолтный URL: {url}")
         else:
-            url = urls[0]
-            self.log(f"✅ Используем первый URL застройщика для активации: {url}")
+            url = urls[index % len(urls)]
+            self.log(f"✅ Используем URL застройщика для активации: {url}")
         
+        headers = config.HEADERS.copy()
+        payload_template = config.PAYLOAD_TEMPLATE.copy()
         intercepted_headers = None
         intercepted_payload = None
         
         try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context()
-                page = context.new_page()
-                
-                # Перехватываем запросы к API
-                def handle_request(route, request):
-                    nonlocal intercepted_headers, intercepted_payload
-                    if request.url == config.API_URL and request.method == "POST":
-                        intercepted_headers = dict(request.headers)
-                        intercepted_payload = request.post_data_json
-                        self.log(f"📡 Перехвачен запрос на API: {request.url}")
-                    route.continue_()
-                
-                page.route("**/*", handle_request)
-                
-                # Переходим на страницу объявления
-                page.goto(url, wait_until="domcontentloaded", timeout=60000)
-                
-                # Кликаем кнопку контактов
-                try:
-                    page.wait_for_selector('[data-testid="contacts-button"]', state="visible", timeout=15000)
-                    page.click('[data-testid="contacts-button"]')
-                    self.log("✅ Кнопка контактов нажата")
-                except Exception as e:
-                    self.log(f"❌ Ошибка при клике на кнопку: {str(e)}")
-                
-                # Ждем появления номера
-                try:
-                    page.wait_for_selector('[data-testid="PhoneLink"], .phone-number', state="attached", timeout=10000)
-                    self.log("📞 Номер телефона появился на странице")
-                except:
-                    self.log("⏰ Таймаут ожидания номера телефона")
-                
-                # Дополнительное время для перехвата
-                page.wait_for_timeout(5000)
-                browser.close()
+            # Картинки, шрифты и счетчики не загружаются; ждем только запрос к API после клика
+            with browser_session.light_page() as page:
+                request = browser_session.capture_api_request(page, url)
+                intercepted_headers = dict(request.headers)
+                intercepted_payload = request.post_data_json
+                self.log(f"📡 Перехвачен запрос на API: {request.url}", level=log_utils.DEBUG)
         
         except Exception as e:
-            self.log(f"❌ Ошибка при активации через браузер: {str(e)}")
+            raise RuntimeError(f"ошибка браузера: {str(e)}") from e
+        
+        # Без перехваченных cookies и analyticClientId сессия не рабочая: пул учтет неудачу и отложит повтор
+        if not (intercepted_headers and intercepted_payload):
+            raise RuntimeError("не удалось перехватить запрос к API")
         
         # Обновляем данные на основе перехваченных значений
-        if intercepted_headers and intercepted_payload:
-            self.log("🔄 Обновляем заголовки и payload на основе перехваченных данных")
-            
-            # Обновляем заголовки
-            self.current_headers.update({
-                "Cookie": intercepted_headers.get("cookie", self.current_headers.get("Cookie", "")),
-                "Referer": intercepted_headers.get("referer", self.current_headers.get("Referer", "")),
-                "Origin": intercepted_headers.get("origin", self.current_headers.get("Origin", ""))
-            })
-            
-            # Обновляем payload
-            self.current_payload_template.update({
-                "blockId": intercepted_payload.get("blockId", self.current_payload_template.get("blockId", 0)),
-                "platformType": intercepted_payload.get("platformType", self.current_payload_template.get("platformType", "")),
-                "pageType": intercepted_payload.get("pageType", self.current_payload_template.get("pageType", "")),
-                "placeType": intercepted_payload.get("placeType", self.current_payload_template.get("placeType", "")),
-                "refererUrl": intercepted_payload.get("refererUrl", self.current_payload_template.get("refererUrl", "")),
-                "utm": intercepted_payload.get("utm", self.current_payload_template.get("utm", ""))
-            })
-            
-            self.log("✅ Данные успешно обновлены")
-        else:
-            self.log("⚠️ Не удалось перехватить данные, используем значения по умолчанию")
+        self.log("🔄 Обновляем заголовки и payload на основе перехваченных данных")
+        
+        # Обновляем заголовки
+        headers.update({
+            "Cookie": intercepted_headers.get("cookie", headers.get("Cookie", "")),
+            "Referer": intercepted_headers.get("referer", headers.get("Referer", "")),
+            "Origin": intercepted_headers.get("origin", headers.get("Origin", ""))
+        })
+        
+        # Обновляем payload
+        for key in ("blockId", "platformType", "pageType", "placeType", "refererUrl", "analyticClientId", "utm"):
+            if key in intercepted_payload:
+                payload_template[key] = intercepted_payload[key]
+        
+        self.log("✅ Данные успешно обновлены")
+        
+        return headers, payload_template
 
     def _clear_existing_files(self):
         """Удаляет существующие файлы данных, чтобы начать парсинг заново"""
         files_to_remove = [
             file_utils.get_phones_file(),  # data.json
+            self.journal.path,
             "output/phones.txt"       # файл экспорта
         ]
+        # Журналы работающих воркеров не удаляем: их записи пропали бы в удаленном файле
+        files_to_remove += [path for owner, path in file_utils.list_phones_journals() if is_orphaned(owner)]
         
         for file_path in files_to_remove:
             if os.path.exists(file_path):
@@ -156,10 +149,10 @@ class CianPhoneParser:
                     os.remove(file_path)
                     self.log(f"🗑️ Удален файл: {file_path}")
                 except Exception as e:
-                    self.log(f"❌ Ошибка при удалении файла {file_path}: {str(e)}")
+                    self.log(f"❌ Ошибка при удалении файла {file_path}: {str(e)}", level=log_utils.ERROR)
     
-    def log(self, message):
-        log_utils.log_message(self.log_callback, message)
+    def log(self, message, level=log_utils.INFO):
+        log_utils.log_message(self.log_callback, message, level=level, stage="phones")
     
     def extract_domain(self, url):
         """Извлекает региональный поддомен из URL"""
@@ -170,20 +163,52 @@ class CianPhoneParser:
         phones_file = file_utils.get_phones_file()
         try:
             if os.path.exists(phones_file):
-                with open(phones_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.parsed_data = data.get("data", {})
+                data = storage.load(phones_file)
+                # Словари из файла переводятся в компактные записи только здесь
+                self.parsed_data = {aid: PhoneRecord.from_dict(record) for aid, record in data.get("data", {}).items()}
                 self.log(f"📂 Загружено {len(self.parsed_data)} существующих номеров")
             else:
                 self.log("📂 Файл с номерами не найден, начинаем с чистого листа")
-        except (FileNotFoundError, json.JSONDecodeError):
-            self.log("❌ Файл с номерами не найден или поврежден, начинаем с чистого листа")
+        except storage.CodecUnavailableError as e:
+            # Файл цел, но не читается без пакета: откладываем его, чтобы следующее сохранение его не затерло
+            unreadable_file = f"{phones_file}.unreadable"
+            os.replace(phones_file, unreadable_file)
+            self.log(f"❌ {e}. Файл перенесен в {unreadable_file}, начинаем с чистого листа", level=log_utils.ERROR)
+            self.parsed_data = {}
+        except (OSError, ValueError):
+            self.log("❌ Файл с номерами не найден или поврежден, начинаем с чистого листа", level=log_utils.ERROR)
             self.parsed_data = {}
+        
+        # Результаты, полученные после последнего сжатия (в том числе до падения процесса),
+        # из журналов всех процессов. Журналы работающих воркеров только читаются: их сжимают владельцы
+        replayed = 0
+        orphaned = []
+        for owner, path in file_utils.list_phones_journals():
+            for aid, record in Journal(path).replay():
+                self.parsed_data[aid] = PhoneRecord.from_dict(record)
+                replayed += 1
+            if path != self.journal.path and is_orphaned(owner):
+                orphaned.append(path)
+        if replayed:
+            self.log(f"📒 Восстановлено из журналов: {replayed} записей")
+            self.save_data()
+        # Журналы завершившихся процессов удаляются только после того, как их записи попали в основной файл
+        for path in orphaned:
+            Journal(path).truncate()
     
+    def store_result(self, aid, record):
+        """Запоминает результат и сразу дописывает его в журнал"""
+        self.parsed_data[aid] = record
+        self.journal.append(aid, record.to_dict())
+
     def save_data(self):
-        with open(file_utils.get_phones_file(), 'w', encoding='utf-8') as f:
-            json.dump({"data": self.parsed_data}, f, ensure_ascii=False, indent=2)
-        self.log(f"💾 [{datetime.now()}] Сохранено {len(self.parsed_data)} номеров")
+        """Сжатие журнала: переписывает основной файл целиком и очищает журнал"""
+        phones_file = file_utils.get_phones_file()
+        # Воркеры очереди завершаются почти одновременно: записи основного файла идут по очереди
+        with storage.locked(phones_file):
+            storage.dump({"data": {aid: record.to_dict() for aid, record in self.parsed_data.items()}}, phones_file)
+            self.journal.truncate()
+        self.log(f"💾 [{datetime.now()}] Сохранено {len(self.parsed_data)} номеров", level=log_utils.DEBUG)
 
     def parse_html_for_data(self, url, author_type):
         """Парсит HTML страницы для получения нужных данных в зависимости от типа автора"""
@@ -191,22 +216,20 @@ class CianPhoneParser:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=15)
-            response.raise_for_status()
-            html_content = response.text
+            html_content = page_cache.fetch_page(url, headers=headers, timeout=15)
             
             if author_type == 'developer':
                 # Для застройщиков ищем siteBlockId
                 site_block_match = re.search(r'"siteBlockId":\s*(\d+)', html_content)
                 if site_block_match:
                     site_block_id = int(site_block_match.group(1))
-                    self.log(f"🏗️ Найден siteBlockId в HTML: {site_block_id}")
+                    self.log(f"🏗️ Найден siteBlockId в HTML: {site_block_id}", level=log_utils.DEBUG)
                     return {
                         "siteBlockId": site_block_id,
                         "type": "site_block"
                     }
                 
-                self.log(f"❌ siteBlockId не найден в HTML для {url}")
+                self.log(f"❌ siteBlockId не найден в HTML для {url}", level=log_utils.WARNING)
                 return None
             else:
                 # Для остальных типов ищем offerPhone
@@ -214,118 +237,116 @@ class CianPhoneParser:
                 if offer_match:
                     phone = offer_match.group(1)
                     formatted_phone = format_utils.format_phone(phone)
-                    self.log(f"📞 Найден offerPhone в HTML: {formatted_phone}")
+                    self.log(f"📞 Найден offerPhone в HTML: {formatted_phone}", level=log_utils.DEBUG)
                     return {
                         "phone": formatted_phone,
                         "notFormattedPhone": re.sub(r'\D', '', phone),
                         "type": "direct_phone"
                     }
                 
-                self.log(f"❌ offerPhone не найден в HTML для {url}")
+                self.log(f"❌ offerPhone не найден в HTML для {url}", level=log_utils.WARNING)
                 return None
             
         except Exception as e:
-            self.log(f"❌ Ошибка при парсинге HTML: {str(e)}")
+            self.log(f"❌ Ошибка при парсинге HTML: {str(e)}", level=log_utils.WARNING)
             return None
     
     def fetch_phone_with_retry(self, announcement_id, url, site_block_id=None):
-        """Получает телефонный номер через API с повторными попытками (ТОЛЬКО для застройщиков)"""
+        """Получает телефонный номер через API с повторными попытками, затем через браузер (ТОЛЬКО для застройщиков)"""
+        return self.fetch_phone_via_api(announcement_id, url, site_block_id) or self.fetch_phone_via_browser(announcement_id, url)
+
+    def fetch_phone_via_browser(self, announcement_id, url):
+        """Запасной путь: читает номер со страницы объявления в браузере"""
+        self.log(f"🌐 Все попытки API не удались. Пробуем Playwright для ID {announcement_id}", level=log_utils.DEBUG)
+        try:
+            with browser_session.light_page() as page:
+                return self._browser_phone(browser_session.read_phone(page, url))
+        except Exception as e:
+            self.log(f"❌ Ошибка при получении номера через браузер: {str(e)}", level=log_utils.WARNING)
+            return None
+
+    def _browser_phone(self, phone_text):
+        """Приводит номер, прочитанный со страницы, к формату ответа API"""
+        if not phone_text:
+            return None
+        
+        # Очищаем номер от лишних символов
+        phone_text = re.sub(r'[^\d+]', '', phone_text)
+        self.log(f"📞 Извлечен номер со страницы: {phone_text}", level=log_utils.DEBUG)
+        
+        # Форматируем телефон
+        return {
+            "phone": format_utils.format_phone(phone_text),
+            "notFormattedPhone": phone_text
+        }
+
+    def fetch_phone_via_api(self, announcement_id, url, site_block_id=None):
+        """Получает телефонный номер через API с повторными попытками"""
         domain = self.extract_domain(url)
         location_url = f"https://tyumen.cian.ru/sale/flat/{announcement_id}/"
         
-        headers = format_utils.sanitize_payload(self.current_headers)
-        payload = self.current_payload_template.copy()
-        payload = format_utils.sanitize_payload(payload)
+        if self.sessions is None:
+            self.sessions = ApiSessionPool(self._activate_session, log=self.log)
+            self.sessions.start()
         
         # Используем siteBlockId как blockId для API запроса
         if site_block_id is not None:
-            payload["blockId"] = int(site_block_id)
-            self.log(f"🔗 Используем siteBlockId как blockId: {site_block_id}")
-        
-        payload.update({
-            "announcementId": int(announcement_id),
-            "locationUrl": location_url,
-        })
+            self.log(f"🔗 Используем siteBlockId как blockId: {site_block_id}", level=log_utils.DEBUG)
         
         attempts = 0
         max_attempts = 6
         
         while attempts < max_attempts:
+            # Каждая попытка идет через очередную здоровую сессию пула
             try:
-                response = requests.post(
+                session = self.sessions.acquire()
+            except NoSessionsError as e:
+                # Активация не удается - номер получит запасной путь через браузер
+                self.log(f"⚠️ {str(e)}", level=log_utils.DEBUG)
+                return None
+            headers = format_utils.sanitize_payload(session.headers)
+            payload = format_utils.sanitize_payload(session.payload_template.copy())
+            if site_block_id is not None:
+                payload["blockId"] = int(site_block_id)
+            payload.update({
+                "announcementId": int(announcement_id),
+                "locationUrl": location_url,
+            })
+            
+            try:
+                response = http_client.post(
                     config.API_URL,
                     headers=headers,
                     json=payload,
                     timeout=15
                 )
+                if response.status_code in THROTTLE_STATUSES:
+                    self.sessions.report_failure(session, response.status_code)
+                    self.log(f"⛔ Попытка {attempts+1}/{max_attempts}: сессия #{session.id} ограничена ({response.status_code})", level=log_utils.DEBUG)
+                    attempts += 1
+                    continue
                 response.raise_for_status()
                 data = response.json()
+                self.sessions.report_success(session)
                 
                 if "phone" in data and data["phone"]:
                     # Форматируем телефон перед возвратом
                     data["phone"] = format_utils.format_phone(data["phone"])
                     return data
                 else:
-                    self.log(f"⚠️ Попытка {attempts+1}/{max_attempts}: Пустой ответ для ID {announcement_id}")
+                    self.log(f"⚠️ Попытка {attempts+1}/{max_attempts}: Пустой ответ для ID {announcement_id}", level=log_utils.DEBUG)
             
             except RequestException as e:
-                self.log(f"❌ Попытка {attempts+1}/{max_attempts}: Ошибка запроса для ID {announcement_id}: {str(e)}")
+                self.sessions.report_failure(session)
+                self.log(f"❌ Попытка {attempts+1}/{max_attempts}: Ошибка запроса для ID {announcement_id}: {str(e)}", level=log_utils.DEBUG)
             except json.JSONDecodeError:
-                self.log(f"❌ Попытка {attempts+1}/{max_attempts}: Невалидный JSON для ID {announcement_id}")
+                self.sessions.report_failure(session)
+                self.log(f"❌ Попытка {attempts+1}/{max_attempts}: Невалидный JSON для ID {announcement_id}", level=log_utils.DEBUG)
             
             attempts += 1
             if attempts < max_attempts:
                 time.sleep(2)
         
-        # Если все попытки не удались, пробуем получить номер через браузер
-        self.log(f"🌐 Все {max_attempts} попыток API не удались. Пробуем Playwright для ID {announcement_id}")
-        try:
-            with sync_playwright() as p:
-                browser = p.chromium.launch(headless=True)
-                context = browser.new_context()
-                page = context.new_page()
-                
-                # Переходим на страницу объявления
-                page.goto(url, wait_until="domcontentloaded", timeout=60000)
-                
-                # Кликаем кнопку контактов
-                try:
-                    page.wait_for_selector('[data-testid="contacts-button"]', state="visible", timeout=10000)
-                    page.click('[data-testid="contacts-button"]')
-                except:
-                    try:
-                        page.evaluate('''() => {
-                            const btn = document.querySelector('[data-testid="contacts-button"]');
-                            if (btn) btn.click();
-                        }''')
-                    except:
-                        pass
-                
-                # Ждем появления номера
-                try:
-                    page.wait_for_selector('[data-testid="PhoneLink"], .phone-number', state="attached", timeout=10000)
-                except:
-                    pass
-                
-                # Извлекаем номер
-                phone_element = page.query_selector('[data-testid="PhoneLink"], .phone-number')
-                if phone_element:
-                    phone_text = phone_element.inner_text()
-                    # Очищаем номер от лишних символов
-                    phone_text = re.sub(r'[^\d+]', '', phone_text)
-                    self.log(f"📞 Извлечен номер со страницы: {phone_text}")
-                    
-                    # Форматируем телефон
-                    formatted_phone = format_utils.format_phone(phone_text)
-                    return {
-                        "phone": formatted_phone,
-                        "notFormattedPhone": phone_text
-                    }
-                
-                browser.close()
-        except Exception as e:
-            self.log(f"❌ Ошибка при получении номера через браузер: {str(e)}")
-        
         return None
 
     def get_filename_suffix(self):
@@ -342,12 +363,14 @@ class CianPhoneParser:
         
         return f"_{region_id}_{author_display}_{timestamp}"
 
-    def export_phones_to_txt(self):
-        """Экспортирует номера в текстовый файл с улучшенным именованием"""
+    def export_phones(self, formats=None):
+        """Экспортирует номера во все форматы config.EXPORT_FORMATS с учетом фильтров экспорта.
+
+        Возвращает путь к файлу первого записанного формата (он отправляется в бот).
+        """
         suffix = self.get_filename_suffix()
-        txt_file = f"output/phones{suffix}.txt"
-        
-        success_count = sum(1 for v in self.parsed_data.values() if v.get("phone") and v["phone"] != "не удалось получить")
+        sources, author_filter = config.EXPORT_SOURCES, config.EXPORT_AUTHOR_TYPES
+        total, success_count = export.count(export.select(self.parsed_data, sources, author_filter))
         
         # Определяем название типа автора для отчета
         author_names = {
@@ -357,64 +380,207 @@ class CianPhoneParser:
             'realtor': 'Риелторы'
         }
         author_display = ", ".join([author_names.get(a, a) for a in self.author_types])
+        header = [
+            f"📅 Дата парсинга: {self.start_time.strftime('%d.%m.%Y %H:%M:%S')}",
+            f"🎯 Типы авторов: {author_display}",
+            f"🌍 Регион: {file_utils.get_region_name()} (ID: {file_utils.get_region_id()})",
+            f"📈 Обработано объявлений: {total}",
+            f"✅ Успешно полученных номеров: {success_count}",
+            f"⏱️ Время выполнения: {datetime.now() - self.start_time}",
+            f"🎯 Ограничение на количество: {'без ограничений' if self.max_phones is None else self.max_phones}"
+        ]
+        if sources or author_filter:
+            header.append(f"🔎 Фильтр экспорта: источники {', '.join(sources) or 'все'}, типы авторов {', '.join(author_filter) or 'все'}")
+        
+        exported = []
+        for fmt in formats or config.EXPORT_FORMATS:
+            if fmt not in export.FORMATS:
+                self.log(f"⚠️ Неизвестный формат экспорта {fmt} пропущен", level=log_utils.WARNING)
+                continue
+            path = f"output/phones{suffix}.{fmt}"
+            try:
+                export.export(export.select(self.parsed_data, sources, author_filter), path, fmt, header)
+            except (OSError, RuntimeError) as e:
+                self.log(f"⚠️ Экспорт в {fmt} не выполнен: {e}", level=log_utils.WARNING)
+                continue
+            exported.append(path)
         
-        with open(txt_file, 'w', encoding='utf-8') as f:
-            f.write("📊 ОТЧЕТ О ПАРСИНГЕ ТЕЛЕФОННЫХ НОМЕРОВ\n")
-            f.write("="*60 + "\n\n")
-            f.write(f"📅 Дата парсинга: {self.start_time.strftime('%d.%m.%Y %H:%M:%S')}\n")
-            f.write(f"🎯 Типы авторов: {author_display}\n")
-            f.write(f"🌍 Регион: {file_utils.get_region_name()} (ID: {file_utils.get_region_id()})\n")
-            f.write(f"📈 Обработано объявлений: {len(self.parsed_data)}\n")
-            f.write(f"✅ Успешно полученных номеров: {success_count}\n")
-            f.write(f"⏱️ Время выполнения: {datetime.now() - self.start_time}\n")
+        if exported:
+            self.log(f"📄 Номера экспортированы в {', '.join(exported)}", level=log_utils.SUMMARY)
+        self.log(f"✅ Успешных номеров: {success_count}/{total}", level=log_utils.SUMMARY)
+        return exported[0] if exported else None
+    
+    def _collect_targets(self):
+        """Собирает пары (URL, тип автора) для всех выбранных типов авторов"""
+        targets = []
+        for auth_type in self.author_types:
+            for url in file_utils.extract_urls_from_regions(author_type=auth_type):
+                targets.append((url, auth_type))
+        return targets
+
+    def _log_no_targets(self):
+        author_names = {
+            'developer': 'застройщики',
+            'real_estate_agent': 'агенства недвижимостей',
+            'homeowner': 'владельцы домов',
+            'realtor': 'риелторы'
+        }
+        selected_names = [author_names.get(a, a) for a in self.author_types]
+        self.log(f"❌ Нет URL для обработки! Не найдено объявлений от типов: {', '.join(selected_names)}", level=log_utils.ERROR)
+
+    def process_offer(self, aid, url, author_type, defer_browser=False):
+        """Получает номер для одного объявления. Возвращает (PhoneRecord, был ли выполнен API-запрос).
+
+        С defer_browser=True запасной путь через браузер выполняется в пуле
+        параллельно: вместо записи возвращается None, результат забирает
+        collect_browser_results.
+        """
+        author_type = AuthorType.parse(author_type)
+        
+        # ЛОГИКА ОБРАБОТКИ В ЗАВИСИМОСТИ ОТ ТИПА АВТОРА
+        if author_type == 'developer':
+            # Для застройщиков - парсим HTML чтобы получить siteBlockId, затем делаем API запрос
+            html_result = self.parse_html_for_data(url, author_type)
             
-            # Измененный вывод информации об ограничении
-            if self.max_phones is None:
-                f.write(f"🎯 Ограничение на количество: без ограничений\n\n")
-            else:
-                f.write(f"🎯 Ограничение на количество: {self.max_phones}\n\n")
+            if html_result and html_result.get("type") == "site_block":
+                site_block_id = html_result["siteBlockId"]
+                
+                # Номер блока уже получен ранее (в этом или предыдущем запуске)
+                cached = self.block_phones.get(site_block_id)
+                if cached:
+                    self.log(f"♻️ Номер из кэша siteBlockId={site_block_id}: {aid} => {cached['phone']}", level=log_utils.DEBUG)
+                    return PhoneRecord(cached["phone"], cached["notFormattedPhone"], Source.API, site_block_id, author_type), False
+                
+                # Теперь делаем API запрос с полученным siteBlockId
+                api_result = self.fetch_phone_via_api(aid, url, site_block_id)
+                if not api_result:
+                    # Все попытки API не удались - пробуем получить номер через браузер
+                    if defer_browser and self._defer_to_browser(aid, url, site_block_id, author_type):
+                        return None, True
+                    api_result = self.fetch_phone_via_browser(aid, url)
+                
+                if api_result and "phone" in api_result and api_result["phone"]:
+                    self.log(f"✅ Успешно через API (siteBlockId={site_block_id}): {aid} => {api_result['phone']}", level=log_utils.DEBUG)
+                    not_formatted_phone = api_result.get("notFormattedPhone", re.sub(r'\D', '', api_result["phone"]))
+                    self.block_phones.put(site_block_id, api_result["phone"], not_formatted_phone)
+                    return PhoneRecord(api_result["phone"], not_formatted_phone, Source.API, site_block_id, author_type), True
+                
+                self.log(f"❌ Не удалось получить номер через API для {aid} (siteBlockId={site_block_id})", level=log_utils.WARNING)
+                return PhoneRecord.failed(site_block_id, author_type, "API не вернул номер"), True
             
-            f.write("📞 СПАРСЕННЫЕ НОМЕРА:\n")
-            f.write("="*60 + "\n")
+            # Если не нашли siteBlockId в HTML
+            self.log(f"❌ Не найден siteBlockId в HTML для {aid}", level=log_utils.WARNING)
+            return PhoneRecord.failed(author_type=author_type, reason="siteBlockId не найден в HTML"), False
+        
+        # Для НЕ застройщиков - парсим HTML чтобы получить offerPhone напрямую
+        html_result = self.parse_html_for_data(url, author_type)
+        
+        if html_result and html_result.get("type") == "direct_phone":
+            self.log(f"✅ Успешно через HTML: {aid} => {html_result['phone']}", level=log_utils.DEBUG)
+            return PhoneRecord(html_result["phone"], html_result.get("notFormattedPhone", ""), Source.HTML, None, author_type), False
+        
+        self.log(f"❌ Не удалось получить номер из HTML для {aid}", level=log_utils.WARNING)
+        return PhoneRecord.failed(author_type=author_type, reason="offerPhone не найден в HTML"), False
+
+    def _defer_to_browser(self, aid, url, site_block_id, author_type):
+        """Передает объявление браузерному пулу. False - пул недоступен, нужен синхронный путь"""
+        if self.browser_pool_failed:
+            return False
+        if self.browser_pool is None:
+            try:
+                from utils.browser_pool import BrowserPool
+                self.browser_pool = BrowserPool()
+                self.log(f"🌐 Запущен браузерный пул: {self.browser_pool.size} контекстов")
+            except Exception as e:
+                self.browser_pool_failed = True
+                self.log(f"❌ Не удалось запустить браузерный пул, до конца запуска используется синхронный путь: {str(e)}", level=log_utils.WARNING)
+                return False
+        
+        try:
+            future = self.browser_pool.submit(url)
+        except RuntimeError as e:
+            self._disable_browser_pool(e)
+            return False
+        self.log(f"🌐 ID {aid} передан браузерному пулу (в очереди: {len(self.pending_browser) + 1})", level=log_utils.DEBUG)
+        self.pending_browser[aid] = (future, url, site_block_id, author_type)
+        return True
+
+    def _disable_browser_pool(self, error):
+        """Пул остановился: его невыполненные объявления уже завершены ошибкой, дальше - синхронный путь"""
+        self.browser_pool_failed = True
+        self.log(f"❌ {str(error)}. До конца запуска используется синхронный путь", level=log_utils.WARNING)
+        self._close_browser_pool()
+
+    def collect_browser_results(self, wait=False):
+        """Забирает готовые результаты браузерного пула (с wait=True - все). Возвращает [(aid, PhoneRecord)]"""
+        results = []
+        for aid, (future, url, site_block_id, author_type) in list(self.pending_browser.items()):
+            if not wait and not future.done():
+                continue
+            del self.pending_browser[aid]
             
-            for aid, data in self.parsed_data.items():
-                phone = data.get("phone", "не удалось получить")
-                source = data.get("source", "unknown")
-                source_emoji = {
-                    "direct": "📋",
-                    "api": "🔗",
-                    "html": "🌐",
-                    "failed": "❌"
-                }.get(source, "❓")
-                
-                f.write(f"🆔 ID: {aid}\n")
-                f.write(f"📞 Телефон: {phone}\n")
-                f.write(f"{source_emoji} Источник: {source}\n")
-                f.write("-"*50 + "\n")
-        
-        self.log(f"📄 Номера экспортированы в {txt_file}")
-        self.log(f"✅ Успешных номеров: {success_count}/{len(self.parsed_data)}")
-        return txt_file
-    
+            try:
+                data = self._browser_phone(future.result(timeout=config.BROWSER_POOL_RESULT_TIMEOUT))
+            except Exception as e:
+                if self.browser_pool is not None and self.browser_pool.stopped:
+                    self._disable_browser_pool(e)
+                if self.browser_pool_failed:
+                    # Объявление не обработано пулом - повторяем синхронно
+                    data = self.fetch_phone_via_browser(aid, url)
+                else:
+                    self.log(f"❌ Ошибка при получении номера через браузер: {str(e)}", level=log_utils.WARNING)
+                    data = None
+            
+            if data:
+                self.log(f"✅ Успешно через браузер (siteBlockId={site_block_id}): {aid} => {data['phone']}", level=log_utils.DEBUG)
+                self.block_phones.put(site_block_id, data["phone"], data["notFormattedPhone"])
+                results.append((aid, PhoneRecord(data["phone"], data["notFormattedPhone"], Source.API, site_block_id, author_type)))
+            else:
+                self.log(f"❌ Не удалось получить номер через API для {aid} (siteBlockId={site_block_id})", level=log_utils.WARNING)
+                results.append((aid, PhoneRecord.failed(site_block_id, author_type, "API не вернул номер")))
+        return results
+
+    def _close_browser_pool(self):
+        if self.browser_pool is not None:
+            self.browser_pool.close()
+            self.browser_pool = None
+
+    def is_retry_due(self, record, now):
+        """Нужно ли снова обрабатывать объявление, для которого уже есть запись"""
+        if record.source is not Source.FAILED:
+            return False
+        if record.attempts >= config.FAILED_MAX_ATTEMPTS:
+            return False
+        return record.next_retry_at is None or record.next_retry_at <= now
+
+    def schedule_retry(self, aid, record):
+        """Для неудачной записи увеличивает счетчик попыток и назначает время следующей (экспоненциально)"""
+        if record.source is not Source.FAILED:
+            return
+        previous = self.parsed_data.get(aid)
+        if previous is not None and previous.source is Source.FAILED:
+            record.attempts = previous.attempts + 1
+        
+        if record.attempts < config.FAILED_MAX_ATTEMPTS:
+            record.next_retry_at = time.time() + config.FAILED_RETRY_BASE_DELAY * 2 ** (record.attempts - 1)
+        else:
+            record.next_retry_at = None
+            self.gave_up_count += 1
+            self.log(f"🚫 ID {aid}: отказ после {record.attempts} попыток ({record.reason})", level=log_utils.WARNING)
+
+    def throttle(self):
+        """Небольшая задержка между объявлениями (паузы API-запросов выдерживает пул сессий)"""
+        time.sleep(1)
+
     def parse(self):
         # Собираем URL для всех выбранных типов авторов
-        urls = []
-        for auth_type in self.author_types:
-            type_urls = file_utils.extract_urls_from_regions(author_type=auth_type)
-            urls.extend(type_urls)
+        targets = self._collect_targets()
         
-        if not urls:
-            author_names = {
-                'developer': 'застройщики',
-                'real_estate_agent': 'агенства недвижимостей',
-                'homeowner': 'владельцы домов',
-                'realtor': 'риелторы'
-            }
-            selected_names = [author_names.get(a, a) for a in self.author_types]
-            self.log(f"❌ Нет URL для обработки! Не найдено объявлений от типов: {', '.join(selected_names)}")
+        if not targets:
+            self._log_no_targets()
             return None
         
-        total_urls = len(urls)
+        total_urls = len(targets)
         request_count = 0
         success_count = 0
         processed_count = 0
@@ -436,123 +602,158 @@ class CianPhoneParser:
         else:
             self.log(f"📈 Ограничение на количество номеров: {self.max_phones}")
         
-        for idx, url in enumerate(urls, 1):
+        cache = page_cache.get_page_cache()
+        cache.reset_stats()
+        now = time.time()
+        
+        for idx, (url, author_type) in enumerate(targets, 1):
             # Проверяем ограничение ТОЛЬКО если max_phones задан
-            if self.max_phones is not None and processed_count >= self.max_phones:
+            if self.max_phones is not None and processed_count + len(self.pending_browser) >= self.max_phones:
                 self.log(f"\n🎯 Достигнуто ограничение в {self.max_phones} номеров. Парсинг остановлен.")
                 break
             
             aid = file_utils.extract_id_from_url(url)
             if not aid:
-                self.log(f"❌ Не удалось извлечь ID из URL: {url}")
+                self.log(f"❌ Не удалось извлечь ID из URL: {url}", level=log_utils.WARNING)
                 continue
             
-            if aid in self.parsed_data:
-                self.log(f"⏭️ [{idx}/{total_urls}] Пропуск существующего ID: {aid}")
-                continue
-            
-            # Определяем тип автора для текущего URL
-            author_type = None
-            for a_type in self.author_types:
-                if any(a_type in u for u in [url]):  # Упрощенная проверка
-                    author_type = a_type
-                    break
+            existing = self.parsed_data.get(aid)
+            if existing is not None:
+                # Успешные и окончательно неудачные пропускаем, неудачные - только до наступления времени повтора
+                if not self.is_retry_due(existing, now):
+                    self.log(f"⏭️ [{idx}/{total_urls}] Пропуск существующего ID: {aid}", level=log_utils.DEBUG)
+                    continue
+                self.retried_count += 1
+                self.log(f"🔁 [{idx}/{total_urls}] Повторная попытка {existing.attempts + 1} для ID {aid} ({existing.reason})", level=log_utils.DEBUG)
             
-            if not author_type:
-                self.log(f"⚠️ Не удалось определить тип автора для URL: {url}")
-                author_type = 'unknown'
+            self.log(f"🔍 [{idx}/{total_urls}] Запрос для ID: {aid} (Тип: {author_type})", level=log_utils.DEBUG)
             
-            self.log(f"🔍 [{idx}/{total_urls}] Запрос для ID: {aid} (Тип: {author_type})")
+            record, api_called = self.process_offer(aid, url, author_type, defer_browser=config.BROWSER_CONTEXTS > 1)
+            if api_called:
+                request_count += 1
             
-            # ЛОГИКА ОБРАБОТКИ В ЗАВИСИМОСТИ ОТ ТИПА АВТОРА
-            if author_type == 'developer':
-                # Для застройщиков - парсим HTML чтобы получить siteBlockId, затем делаем API запрос
-                html_result = self.parse_html_for_data(url, author_type)
-                
-                if html_result and html_result.get("type") == "site_block":
-                    site_block_id = html_result["siteBlockId"]
-                    
-                    # Теперь делаем API запрос с полученным siteBlockId
-                    api_result = self.fetch_phone_with_retry(aid, url, site_block_id)
-                    request_count += 1
-                    processed_count += 1
-                    
-                    if api_result and "phone" in api_result and api_result["phone"]:
-                        self.parsed_data[aid] = {
-                            "phone": api_result["phone"],
-                            "notFormattedPhone": api_result.get("notFormattedPhone", re.sub(r'\D', '', api_result["phone"])),
-                            "source": "api",
-                            "siteBlockId": site_block_id
-                        }
-                        success_count += 1
-                        self.log(f"✅ Успешно через API (siteBlockId={site_block_id}): {aid} => {api_result['phone']}")
-                    else:
-                        self.parsed_data[aid] = {
-                            "phone": "не удалось получить",
-                            "notFormattedPhone": "",
-                            "source": "failed",
-                            "siteBlockId": site_block_id
-                        }
-                        self.log(f"❌ Не удалось получить номер через API для {aid} (siteBlockId={site_block_id})")
-                else:
-                    # Если не нашли siteBlockId в HTML
-                    processed_count += 1
-                    self.parsed_data[aid] = {
-                        "phone": "не удалось получить",
-                        "notFormattedPhone": "",
-                        "source": "failed"
-                    }
-                    self.log(f"❌ Не найден siteBlockId в HTML для {aid}")
-            else:
-                # Для НЕ застройщиков - парсим HTML чтобы получить offerPhone напрямую
-                html_result = self.parse_html_for_data(url, author_type)
+            # Номер объявления, переданного браузерному пулу, будет забран позже вместе с другими готовыми
+            results = [(aid, record)] if record is not None else []
+            results.extend(self.collect_browser_results())
+            for done_aid, done_record in results:
+                self.schedule_retry(done_aid, done_record)
+                self.store_result(done_aid, done_record)
                 processed_count += 1
-                
-                if html_result and html_result.get("type") == "direct_phone":
-                    self.parsed_data[aid] = {
-                        "phone": html_result["phone"],
-                        "notFormattedPhone": html_result.get("notFormattedPhone", ""),
-                        "source": "html"
-                    }
+                if done_record.is_success:
                     success_count += 1
-                    self.log(f"✅ Успешно через HTML: {aid} => {html_result['phone']}")
-                else:
-                    self.parsed_data[aid] = {
-                        "phone": "не удалось получить",
-                        "notFormattedPhone": "",
-                        "source": "failed"
-                    }
-                    self.log(f"❌ Не удалось получить номер из HTML для {aid}")
+            log_utils.report_progress(self.log_callback, "phones", idx, total_urls, success_count)
             
-            # Сохраняем прогресс
-            if idx % 5 == 0:
-                self.save_data()
+            self.throttle()
+        
+        # Дожидаемся объявлений, которые еще обрабатывает браузерный пул
+        if self.pending_browser:
+            self.log(f"⏳ Ожидание браузерного пула: {len(self.pending_browser)} объявлений")
+        for done_aid, done_record in self.collect_browser_results(wait=True):
+            self.schedule_retry(done_aid, done_record)
+            self.store_result(done_aid, done_record)
+            processed_count += 1
+            if done_record.is_success:
+                success_count += 1
+        self._close_browser_pool()
+        
+        self.save_data()
+        self.log_summary(processed_count, success_count, request_count, cache)
+        
+        return self.export_phones()
+
+    def parse_queue(self, worker_id=None):
+        """Обрабатывает объявления из общей очереди задач: несколько воркеров делят один регион"""
+        queue = work_queue.WorkQueue()
+        worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        
+        started_at = time.time()
+        targets = []
+        for url, author_type in self._collect_targets():
+            aid = file_utils.extract_id_from_url(url)
+            existing = self.parsed_data.get(aid)
+            if aid and (existing is None or self.is_retry_due(existing, started_at)):
+                targets.append((aid, url, author_type))
+                if existing is not None:
+                    self.retried_count += 1
+        
+        run_id, added = queue.start_run(targets)
+        # Прогресс воркера - доля оставшихся задач этого запуска, завершенные до его старта не считаются
+        counts = queue.counts(run_id)
+        total = counts.get("pending", 0) + counts.get("leased", 0)
+        self.log(f"📥 Воркер {worker_id}: запуск {run_id[:8]}, добавлено в очередь {added} объявлений, состояние очереди: {queue.counts(run_id)}")
+        
+        request_count = 0
+        success_count = 0
+        processed_count = 0
+        
+        cache = page_cache.get_page_cache()
+        cache.reset_stats()
+        
+        while self.max_phones is None or processed_count < self.max_phones:
+            task = queue.claim(worker_id)
+            if task is None:
+                # Свободных задач нет, но аренды других воркеров могут истечь и вернуться в очередь
+                if not queue.has_active_leases():
+                    break
+                time.sleep(config.WORK_QUEUE_IDLE_WAIT)
+                continue
             
-            # Задержка между запросами
-            if author_type == 'developer' and request_count % 50 == 0:
-                self.log(f"⏸️ Выполнено {request_count} запросов. Ожидание 15 секунд...")
-                time.sleep(15)
-            else:
-                time.sleep(1)  # Небольшая задержка для HTML парсинга
+            self.log(f"🔍 [{worker_id}] Запрос для ID: {task.offer_id} (Тип: {task.author_type}, попытка {task.attempts})", level=log_utils.DEBUG)
+            
+            try:
+                record, api_called = self.process_offer(task.offer_id, task.url, task.author_type)
+            except Exception as e:
+                self.log(f"❌ Ошибка обработки ID {task.offer_id}: {str(e)}", level=log_utils.WARNING)
+                queue.fail(task.offer_id, worker_id, e)
+                continue
+            
+            self.schedule_retry(task.offer_id, record)
+            if not queue.complete(task.offer_id, worker_id, record.to_dict()):
+                self.log(f"⚠️ Аренда ID {task.offer_id} истекла, результат отброшен", level=log_utils.WARNING)
+                continue
+            
+            self.store_result(task.offer_id, record)
+            processed_count += 1
+            if api_called:
+                request_count += 1
+            if record.is_success:
+                success_count += 1
+            log_utils.report_progress(self.log_callback, "phones", processed_count, total, success_count)
+            
+            self.throttle()
         
+        # Объединяем результаты всех воркеров этого запуска, включая завершенные до старта этого воркера
+        for aid, record in queue.results(run_id).items():
+            self.parsed_data[aid] = PhoneRecord.from_dict(record)
         self.save_data()
+        self.log(f"📊 Состояние очереди: {queue.counts(run_id)}", level=log_utils.SUMMARY)
+        self.log_summary(processed_count, success_count, request_count, cache)
         
+        return self.export_phones()
+
+    def log_summary(self, processed_count, success_count, request_count, cache):
+        """Итоги парсинга телефонов (используется и конвейером)"""
         end_time = datetime.now()
         duration = end_time - self.start_time
         
-        self.log("\n" + "="*60)
-        self.log(f"🏁 Парсинг завершен: {end_time.strftime('%d.%m.%Y %H:%M:%S')}")
-        self.log(f"⏱️ Общее время выполнения: {duration}")
+        self.log("\n" + "="*60, level=log_utils.SUMMARY)
+        self.log(f"🏁 Парсинг завершен: {end_time.strftime('%d.%m.%Y %H:%M:%S')}", level=log_utils.SUMMARY)
+        self.log(f"⏱️ Общее время выполнения: {duration}", level=log_utils.SUMMARY)
         
         # Измененный вывод информации об обработанных номерах
         if self.max_phones is None:
-            self.log(f"📊 Обработано номеров: {processed_count}")
+            self.log(f"📊 Обработано номеров: {processed_count}", level=log_utils.SUMMARY)
         else:
-            self.log(f"📊 Обработано номеров: {processed_count}/{self.max_phones}")
+            self.log(f"📊 Обработано номеров: {processed_count}/{self.max_phones}", level=log_utils.SUMMARY)
         
-        self.log(f"✅ Успешных номеров: {success_count}/{processed_count}")
+        self.log(f"✅ Успешных номеров: {success_count}/{processed_count}", level=log_utils.SUMMARY)
+        if self.retried_count or self.gave_up_count:
+            self.log(f"🔁 Повторных попыток: {self.retried_count}, окончательных отказов: {self.gave_up_count}", level=log_utils.SUMMARY)
         if 'developer' in self.author_types:
-            self.log(f"🔗 API запросов выполнено: {request_count}")
-        self.log("="*60 + "\n")
-        
-        return self.export_phones_to_txt()
\ No newline at end of file
+            self.log(f"🔗 API запросов выполнено: {request_count}", level=log_utils.SUMMARY)
+            self.log(self.block_phones.format_stats(), level=log_utils.SUMMARY)
+            if self.sessions is not None:
+                self.log(self.sessions.format_stats(), level=log_utils.SUMMARY)
+        self.log(cache.format_stats(), level=log_utils.SUMMARY)
+        self.log(http_client.get_client().format_stats(), level=log_utils.SUMMARY)
+        self.log("="*60 + "\n", level=log_utils.SUMMARY)
@@ -0,0 +1,249 @@
+import queue
+import threading
+import time
+from datetime import datetime
+from utils import file_utils, log_utils, page_cache, profiling
+from parser import ads_parser
+import config
+
+# Признак конца потока объявлений, передается по очередям от этапа к этапу
+_DONE = object()
+
+class _Stopped(Exception):
+    """Конвейер остановлен из-за ошибки в одном из этапов"""
+
+class StageQueue:
+    """Ограниченная очередь между этапами конвейера со статистикой заполненности.
+
+    put блокируется, пока следующий этап не освободит место: медленный
+    этап притормаживает предыдущие (backpressure), а объявления не
+    накапливаются в памяти.
+    """
+
+    def __init__(self, name, maxsize, stop_event):
+        self.name = name
+        self.maxsize = maxsize
+        self._queue = queue.Queue(maxsize)
+        self._stop = stop_event
+        self.passed = 0
+        self.max_depth = 0
+        self.blocked_time = 0.0
+
+    def put(self, item):
+        started = time.monotonic()
+        while True:
+            try:
+                self._queue.put(item, timeout=0.5)
+                break
+            except queue.Full:
+                if self._stop.is_set():
+                    raise _Stopped()
+        self.blocked_time += time.monotonic() - started
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+        if item is not _DONE:
+            self.passed += 1
+            # Любое объявление, прошедшее этап, - продвижение работы под блокировкой парсинга
+            file_utils.touch_parsing()
+
+    def get(self):
+        while True:
+            try:
+                return self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise _Stopped()
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def format_depth(self):
+        return f"{self.name}: {self.depth()}/{self.maxsize}"
+
+    def format_stats(self):
+        return (f"  {self.name}: передано {self.passed}, макс. заполненность {self.max_depth}/{self.maxsize}, "
+                f"ожидание места {self.blocked_time:.1f} сек")
+
+class OfferPipeline:
+    """Конвейерный парсинг: выдача → обогащение → телефоны → сохранение.
+
+    Каждый этап работает в своем потоке и передает объявления следующему
+    через ограниченную очередь, поэтому первые номера появляются через
+    несколько секунд после старта, а не после обхода всей выдачи.
+    """
+
+    def __init__(self, log_callback=None, queue_size=None):
+        self.log_callback = log_callback
+        self.queue_size = queue_size or config.PIPELINE_QUEUE_SIZE
+        self._stop = threading.Event()
+        self._finished = threading.Event()
+        self._errors = []
+
+        self.listed = 0
+        self.offers = []
+        self.enriched = 0
+        self.processed = 0
+        self.success = 0
+        self.request_count = 0
+
+    def log(self, message, level=log_utils.INFO):
+        log_utils.log_message(self.log_callback, message, level=level, stage="pipeline")
+
+    def run(self):
+        """Выполняет все этапы. Возвращает путь к txt-файлу с номерами или None при ошибке"""
+        # Телефонный парсер тянет за собой requests и Playwright - загружаем только при запуске
+        from parser.phones_parser import CianPhoneParser
+
+        file_utils.ensure_output_dir()
+        if not file_utils.start_parsing():
+            hung = file_utils.describe_hung_parsing()
+            message = f"❌ Процесс парсинга объявлений завис: {hung}" if hung else "⏳ Парсинг объявлений уже выполняется другим процессом"
+            self.log(message, level=log_utils.ERROR)
+            return None
+
+        try:
+            self.log(f"[{datetime.now()}] Начало конвейерного парсинга...")
+            self.settings = ads_parser.load_search_settings()
+            ads_parser.log_search_settings(self.settings, self.log_callback)
+
+            self.listing_stats = ads_parser.ListingStats(self.settings)
+            if self.listing_stats.server_filter:
+                self.log(f"🔎 Фильтр по типам авторов передается CIAN: {self.listing_stats.server_filter}")
+
+            self.phone_parser = CianPhoneParser(log_callback=self.log_callback)
+            cache = page_cache.get_page_cache()
+            cache.reset_stats()
+
+            self.queues = [
+                StageQueue("выдача → обогащение", self.queue_size, self._stop),
+                StageQueue("обогащение → телефоны", self.queue_size, self._stop),
+                StageQueue("телефоны → сохранение", self.queue_size, self._stop),
+            ]
+            listed_q, enriched_q, phones_q = self.queues
+
+            threads = [
+                self._start("listing", self._listing_stage, listed_q),
+                self._start("enrichment", self._enrichment_stage, listed_q, enriched_q),
+                self._start("phones", self._phone_stage, enriched_q, phones_q),
+                self._start("store", self._store_stage, phones_q),
+            ]
+            monitor = threading.Thread(target=self._monitor, name="pipeline-monitor", daemon=True)
+            monitor.start()
+
+            for thread in threads:
+                thread.join()
+            self._finished.set()
+            monitor.join()
+
+            # Сохраняем то, что успели обработать, даже если конвейер остановлен ошибкой
+            self.phone_parser.save_data()
+            if self.offers:
+                ads_parser.save_region_data(file_utils.get_region_file(), self.settings, self.offers)
+
+            if self._errors:
+                for stage, error in self._errors:
+                    self.log(f"❌ Этап {stage} остановлен ошибкой: {error}", level=log_utils.ERROR)
+                return None
+
+            self._log_summary(cache)
+            return self.phone_parser.export_phones()
+        finally:
+            file_utils.finish_parsing()
+
+    def _start(self, name, target, *args):
+        thread = threading.Thread(target=self._run_stage, args=(name, target) + args, name=f"pipeline-{name}", daemon=True)
+        thread.start()
+        return thread
+
+    def _run_stage(self, name, target, *args):
+        try:
+            # При профилировании конвейера каждый этап профилируется в своем потоке
+            with profiling.profile_thread(name):
+                target(*args)
+        except _Stopped:
+            pass
+        except Exception as e:
+            self._errors.append((name, e))
+            self._stop.set()
+
+    def _listing_stage(self, out):
+        """Обходит выдачу постранично и сразу передает объявления дальше"""
+        for offer in ads_parser.iter_listing(self.settings, self.listing_stats, self.log_callback):
+            self.listed += 1
+            out.put(offer)
+        out.put(_DONE)
+
+    def _enrichment_stage(self, source, out):
+        """Дополняет объявления blockId или телефоном со страницы объявления"""
+        while True:
+            offer = source.get()
+            if offer is _DONE:
+                break
+            if ads_parser.enrich_offer(offer, self.log_callback):
+                self.enriched += 1
+            self.offers.append(offer)
+            out.put(offer)
+            # Задержка, чтобы не нагружать сервер
+            time.sleep(1.5)
+        out.put(_DONE)
+
+    def _phone_stage(self, source, out):
+        """Получает номер для каждого объявления (страница уже в общем кэше после обогащения)"""
+        parser = self.phone_parser
+        now = time.time()
+        while True:
+            offer = source.get()
+            if offer is _DONE:
+                break
+
+            aid = file_utils.extract_id_from_url(offer.url)
+            if not aid:
+                parser.log(f"❌ Не удалось извлечь ID из URL: {offer.url}", level=log_utils.WARNING)
+                continue
+
+            existing = parser.parsed_data.get(aid)
+            if existing is not None:
+                if not parser.is_retry_due(existing, now):
+                    parser.log(f"⏭️ Пропуск существующего ID: {aid}", level=log_utils.DEBUG)
+                    continue
+                parser.retried_count += 1
+
+            record, api_called = parser.process_offer(aid, offer.url, offer.author_type)
+            parser.schedule_retry(aid, record)
+            out.put((aid, record))
+            if api_called:
+                self.request_count += 1
+            parser.throttle()
+        out.put(_DONE)
+
+    def _store_stage(self, source):
+        """Единственный поток, изменяющий parsed_data: дописывает результаты в журнал"""
+        parser = self.phone_parser
+        while True:
+            item = source.get()
+            if item is _DONE:
+                break
+            aid, record = item
+            parser.store_result(aid, record)
+            self.processed += 1
+            if record.is_success:
+                self.success += 1
+            # Общее число объявлений растет по мере обхода выдачи
+            log_utils.report_progress(self.log_callback, "pipeline", self.processed, self.listed, self.success)
+
+    def _monitor(self):
+        """Периодически выводит заполненность очередей"""
+        while not self._finished.wait(config.PIPELINE_STATS_INTERVAL):
+            depths = ", ".join(q.format_depth() for q in self.queues)
+            self.log(f"📦 Очереди: {depths}")
+
+    def _log_summary(self, cache):
+        self.log(f"[{datetime.now()}] Конвейер завершен: {self.listed} объявлений, обогащено {self.enriched}", level=log_utils.SUMMARY)
+        self.log(self.listing_stats.format_stats(), level=log_utils.SUMMARY)
+        self.log("📦 Очереди конвейера:", level=log_utils.SUMMARY)
+        for stage_queue in self.queues:
+            self.log(stage_queue.format_stats(), level=log_utils.SUMMARY)
+        self.phone_parser.log_summary(self.processed, self.success, self.request_count, cache)
+
+def run_pipeline(log_callback=None):
+    """Запускает конвейерный парсинг объявлений и телефонов"""
+    return OfferPipeline(log_callback=log_callback).run()
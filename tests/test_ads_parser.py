@@ -0,0 +1,60 @@
+"""Этап объявлений целиком (parser.ads_parser.parse_cian_ads) с подмененным cianparser.
+
+Запуск из корня проекта: python -m pytest -q tests
+"""
+import sys
+import types
+import pytest
+import config
+import database
+from parser import ads_parser
+from utils import page_cache, storage
+
+# Две страницы выдачи; третья повторяет вторую - так cianparser отдает конец выдачи
+_PAGES = [
+    [
+        {"url": "https://tyumen.cian.ru/sale/flat/1/", "author_type": "developer"},
+        {"url": "https://tyumen.cian.ru/sale/flat/2/", "author_type": "homeowner"},
+    ],
+    [
+        {"url": "https://tyumen.cian.ru/sale/flat/3/", "author_type": "realtor"},
+        {"url": "https://tyumen.cian.ru/sale/flat/4/", "author_type": "unknown"},
+    ],
+]
+
+class _StubCianParser:
+    def __init__(self, location):
+        self.location = location
+
+    def get_flats(self, deal_type, rooms, additional_settings):
+        page = additional_settings["start_page"]
+        return _PAGES[min(page, len(_PAGES)) - 1]
+
+def _stub_page(url, author_type, log_callback=None):
+    if author_type == "developer":
+        return "12345", None
+    return None, "+79990000000"
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Рабочая директория с базой настроек; кэш страниц и cianparser подменены"""
+    monkeypatch.chdir(tmp_path)
+    database.init_db()
+    monkeypatch.setattr(config, "PAGE_CACHE_FILE", str(tmp_path / "page_cache.db"))
+    monkeypatch.setattr(page_cache, "_shared_cache", None)
+    monkeypatch.setitem(sys.modules, "cianparser", types.SimpleNamespace(CianParser=_StubCianParser))
+    monkeypatch.setattr(ads_parser, "get_block_id_and_phone", _stub_page)
+    monkeypatch.setattr(ads_parser.time, "sleep", lambda seconds: None)
+    return tmp_path
+
+def test_parse_cian_ads_saves_region_and_reports_success(workdir):
+    messages = []
+    success, count = ads_parser.parse_cian_ads(messages.append)
+
+    assert (success, count) == (True, 3)
+    data = storage.load(str(workdir / "output" / "region_data.json"))["data"]
+    assert [item["url"] for item in data] == [item["url"] for item in _PAGES[0] + _PAGES[1][:1]]
+    assert data[0]["blockId"] == "12345"
+    assert data[1]["directPhone"] == "+79990000000"
+    assert not any("Ошибка парсинга" in str(message) for message in messages)
+    assert not ads_parser.file_utils.is_parsing_in_progress()
@@ -0,0 +1,113 @@
+"""Распределение запросов по точкам выхода через локальные прокси (utils.local_proxy).
+
+Запуск из корня проекта: python -m pytest -q tests
+"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+import config
+from utils.http_client import HttpClient
+from utils.local_proxy import LocalProxy
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    """Целевой сайт: /ok отвечает 200, /fail - 503"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        status = 503 if self.path.startswith("/fail") else 200
+        body = b"ok" if status == 200 else b"unavailable"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _UpstreamHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def proxies():
+    started = [LocalProxy().start(), LocalProxy().start()]
+    yield started
+    for proxy in started:
+        proxy.stop()
+
+@pytest.fixture
+def dead_proxy_url():
+    """Адрес, на котором никто не слушает: соединение через такой прокси сразу отклоняется"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+@pytest.fixture
+def fast_health(monkeypatch):
+    monkeypatch.setattr(config, "EGRESS_HEALTH_ALPHA", 0.5)
+    monkeypatch.setattr(config, "EGRESS_MIN_HEALTH", 0.3)
+    monkeypatch.setattr(config, "EGRESS_PENALTY", 60)
+
+def test_requests_spread_across_egresses(upstream, proxies):
+    client = HttpClient([proxy.url for proxy in proxies], budget=100)
+    for _ in range(10):
+        assert client.get(f"{upstream}/ok", timeout=5).status_code == 200
+
+    assert [proxy.requests for proxy in proxies] == [5, 5]
+    assert [egress.total for egress in client.egresses] == [5, 5]
+
+def test_exhausted_budget_skips_egress_until_next_minute(upstream, proxies):
+    client = HttpClient([proxy.url for proxy in proxies], budget=2)
+    for _ in range(4):
+        client.get(f"{upstream}/ok", timeout=5)
+
+    now = time.monotonic()
+    assert [proxy.requests for proxy in proxies] == [2, 2]
+    assert not any(egress.available(now) for egress in client.egresses)
+    assert all(egress.window_reset_at() > now + 50 for egress in client.egresses)
+
+def test_unhealthy_responses_lower_health(upstream, proxies, fast_health):
+    client = HttpClient([proxies[0].url], budget=100)
+    egress = client.egresses[0]
+    client.get(f"{upstream}/fail", timeout=5)
+
+    assert egress.failures == 1
+    assert egress.health == pytest.approx(0.5)
+    client.get(f"{upstream}/ok", timeout=5)
+    assert egress.health == pytest.approx(0.75)
+
+def test_failing_egress_is_penalized_and_traffic_moves(upstream, proxies, dead_proxy_url, fast_health):
+    client = HttpClient([dead_proxy_url, proxies[0].url], budget=100)
+    dead, alive = client.egresses
+
+    for _ in range(6):
+        try:
+            client.get(f"{upstream}/ok", timeout=5)
+        except requests.RequestException:
+            pass
+    assert dead.penalized_until > time.monotonic() + 50
+    assert not dead.available(time.monotonic())
+
+    before = proxies[0].requests
+    for _ in range(5):
+        assert client.get(f"{upstream}/ok", timeout=5).status_code == 200
+    assert proxies[0].requests == before + 5
+    assert alive.penalized_until == 0
+
+def test_single_egress_is_never_penalized(upstream, dead_proxy_url, fast_health):
+    client = HttpClient([dead_proxy_url], budget=100)
+    egress = client.egresses[0]
+    for _ in range(5):
+        with pytest.raises(requests.RequestException):
+            client.get(f"{upstream}/ok", timeout=5)
+
+    assert egress.failures == 5
+    assert egress.penalized_until == 0
+    assert egress.available(time.monotonic())
@@ -0,0 +1,64 @@
+"""Блокировка задачи парсинга (utils.job_lock): heartbeat по продвижению и проверка владельца через flock.
+
+Запуск из корня проекта: python -m pytest -q tests
+"""
+import json
+import os
+import socket
+import threading
+import time
+import pytest
+import config
+from utils import job_lock
+
+pytestmark = pytest.mark.skipif(job_lock.fcntl is None, reason="нужен flock")
+
+@pytest.fixture
+def lock_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOB_LOCK_STALE_AFTER", 0.3)
+    monkeypatch.setattr(config, "JOB_LOCK_POLL_INTERVAL", 0.05)
+    return str(tmp_path / "parsing.lock")
+
+@pytest.fixture
+def held(lock_file):
+    lock = job_lock.JobLock(lock_file, heartbeat_interval=0.05)
+    assert lock.acquire()
+    yield lock
+    lock.release()
+
+def test_owner_without_progress_is_hung(lock_file, held):
+    time.sleep(0.5)
+
+    assert job_lock.is_locked(lock_file)
+    assert job_lock.hung_owner(lock_file)["pid"] == os.getpid()
+    assert not job_lock.wait_for_release(lock_file, timeout=5)
+
+def test_touch_keeps_owner_alive(lock_file, held):
+    for _ in range(10):
+        held.touch()
+        time.sleep(0.05)
+
+    assert job_lock.hung_owner(lock_file) is None
+    assert not job_lock.wait_for_release(lock_file, timeout=0.2)
+
+def test_exited_owner_with_reused_pid_is_not_locked(lock_file):
+    # Владелец завершился, не очистив файл, а его PID теперь у живого процесса
+    with open(lock_file, "w", encoding="utf-8") as f:
+        json.dump({"pid": os.getpid(), "host": socket.gethostname(), "started_at": "", "heartbeat": time.time()}, f)
+
+    assert not job_lock.is_locked(lock_file)
+    assert job_lock.hung_owner(lock_file) is None
+    assert job_lock.wait_for_release(lock_file, timeout=1)
+    lock = job_lock.JobLock(lock_file)
+    assert lock.acquire()
+    lock.release()
+
+def test_wait_returns_on_release_without_leaking_threads(lock_file, held):
+    threads_before = threading.active_count()
+    assert not job_lock.wait_for_release(lock_file, timeout=0.1)
+    assert threading.active_count() == threads_before
+
+    threading.Timer(0.1, held.release).start()
+    started = time.monotonic()
+    assert job_lock.wait_for_release(lock_file, timeout=5)
+    assert time.monotonic() - started < 1
@@ -0,0 +1,168 @@
+import itertools
+import threading
+import time
+import config
+
+# Ответы API, означающие, что сессию ограничили
+THROTTLE_STATUSES = (403, 429)
+
+class NoSessionsError(RuntimeError):
+    """В пуле нет сессий, а повторная активация отложена после неудач"""
+
+class ApiSession:
+    """Активированная сессия API телефонов: cookies и analyticClientId одного браузера"""
+
+    def __init__(self, session_id, headers, payload_template):
+        self.id = session_id
+        self.headers = headers
+        self.payload_template = payload_template
+        self.requests = 0           # Запросов с последней паузы
+        self.total = 0
+        self.failures = 0           # Неудач подряд
+        self.cooldown_until = 0.0
+
+class ApiSessionPool:
+    """Пул независимо активированных сессий API телефонов.
+
+    Запросы распределяются по здоровым сессиям, наименее загруженная
+    выбирается первой. После requests_per_session запросов сессия отдыхает
+    cooldown секунд, остальные в это время продолжают работать. Сессия,
+    получившая 429/403 или несколько неудач подряд, выводится из пула
+    и активируется заново в фоновом потоке.
+
+    activate(index) должна возвращать (headers, payload_template) или
+    выбрасывать исключение, если активировать сессию не удалось. После
+    неудачной активации следующая откладывается (пауза удваивается до
+    config.API_SESSION_ACTIVATION_MAX_BACKOFF); пока в пуле нет сессий,
+    acquire выбрасывает NoSessionsError, а не ждет.
+    """
+
+    def __init__(self, activate, size=None, requests_per_session=None, cooldown=None, max_failures=None, log=None):
+        self.activate = activate
+        self.size = size or config.API_SESSIONS
+        self.requests_per_session = requests_per_session or config.API_SESSION_REQUESTS
+        self.cooldown = config.REQUEST_DELAY if cooldown is None else cooldown
+        self.max_failures = max_failures or config.API_SESSION_MAX_FAILURES
+        self.log = log or print
+
+        self._cond = threading.Condition()
+        self._sessions = []
+        self._activating = 0
+        self._counter = itertools.count(1)
+        self._retry_activation_at = 0.0
+        self.activation_failures = 0    # Неудачных активаций подряд
+        self.retired = 0
+
+    def start(self):
+        """Первая сессия активируется сразу, остальные - в фоне"""
+        try:
+            session = self._activate(next(self._counter))
+        except Exception as e:
+            with self._cond:
+                self._activation_failed(e)
+        else:
+            self._add_session(session)
+        for _ in range(self.size - 1):
+            self._activate_in_background()
+
+    def _activate(self, session_id):
+        headers, payload_template = self.activate(session_id - 1)
+        return ApiSession(session_id, headers, payload_template)
+
+    def _add_session(self, session):
+        with self._cond:
+            self._sessions.append(session)
+            self._cond.notify_all()
+
+    def _activate_in_background(self):
+        with self._cond:
+            self._activating += 1
+        threading.Thread(target=self._background_activation, name="api-session-activation", daemon=True).start()
+
+    def _activation_failed(self, error):
+        """Откладывает следующую активацию (вызывается под self._cond)"""
+        self.activation_failures += 1
+        delay = min(config.API_SESSION_ACTIVATION_BACKOFF * 2 ** (self.activation_failures - 1),
+                    config.API_SESSION_ACTIVATION_MAX_BACKOFF)
+        self._retry_activation_at = time.monotonic() + delay
+        self.log(f"❌ Ошибка активации сессии API: {str(error)}. Следующая попытка через {delay:.0f} сек")
+
+    def _background_activation(self):
+        # После неудачной активации браузер не запускается снова раньше паузы
+        with self._cond:
+            delay = self._retry_activation_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            session = self._activate(next(self._counter))
+            error = None
+        except Exception as e:
+            session = None
+            error = e
+        with self._cond:
+            self._activating -= 1
+            if session is not None:
+                self._sessions.append(session)
+                self.activation_failures = 0
+            else:
+                self._activation_failed(error)
+            self._cond.notify_all()
+        if session is not None:
+            self.log(f"🔑 Сессия API #{session.id} активирована")
+
+    def acquire(self):
+        """Возвращает сессию для очередного запроса; если все сессии на паузе - ждет ближайшую"""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [s for s in self._sessions if s.cooldown_until <= now]
+                if ready:
+                    session = min(ready, key=lambda s: s.requests)
+                    session.requests += 1
+                    session.total += 1
+                    if session.requests >= self.requests_per_session:
+                        session.cooldown_until = now + self.cooldown
+                        session.requests = 0
+                    return session
+
+                if self._sessions:
+                    wait = min(s.cooldown_until for s in self._sessions) - now
+                    if wait >= 1:
+                        self.log(f"⏸️ Все сессии API на паузе. Ожидание {wait:.0f} секунд...")
+                else:
+                    # Все сессии выведены из пула - ждем фоновую активацию, если она не отложена
+                    if now < self._retry_activation_at:
+                        raise NoSessionsError(f"Нет активированных сессий API, повторная активация через "
+                                              f"{self._retry_activation_at - now:.0f} сек")
+                    if not self._activating:
+                        self._activate_in_background()
+                    wait = None
+                self._cond.wait(timeout=wait)
+
+    def report_success(self, session):
+        session.failures = 0
+
+    def report_failure(self, session, status=None):
+        """Учитывает неудачный запрос; ограниченная сессия выводится из пула"""
+        session.failures += 1
+        if status in THROTTLE_STATUSES:
+            self.retire(session, f"ответ {status}")
+        elif session.failures >= self.max_failures:
+            self.retire(session, f"{session.failures} неудач подряд")
+
+    def retire(self, session, reason):
+        with self._cond:
+            if session not in self._sessions:
+                return
+            self._sessions.remove(session)
+            self.retired += 1
+        self.log(f"🔄 Сессия API #{session.id} выведена из пула ({reason}), активируем новую")
+        self._activate_in_background()
+
+    def format_stats(self):
+        """Форматирует статистику для итогового отчета"""
+        with self._cond:
+            active = len(self._sessions)
+            requests = sum(s.total for s in self._sessions)
+        return (f"🔑 Сессии API: активно {active}, выведено из пула {self.retired}, "
+                f"запросов через активные сессии {requests}")
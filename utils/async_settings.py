@@ -0,0 +1,114 @@
+"""Асинхронный доступ к настройкам и справочнику регионов для обработчиков бота.
+
+Все обращения к SQLite и файлам выполняются в одном выделенном потоке,
+поэтому обработчики не блокируют цикл событий, а запросы к базе настроек
+из бота выполняются последовательно.
+"""
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from utils import file_utils
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="settings-io")
+_locations = None
+
+async def run(func, *args, **kwargs):
+    """Выполняет синхронную функцию в потоке настроек"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+def _snapshot():
+    return {
+        "region_name": file_utils.get_region_name(),
+        "region_id": file_utils.get_region_id(),
+        "rooms": file_utils.get_rooms(),
+        "min_floor": file_utils.get_min_floor(),
+        "max_floor": file_utils.get_max_floor(),
+        "min_price": file_utils.get_min_price(),
+        "max_price": file_utils.get_max_price(),
+        "auto_parse_enabled": file_utils.get_setting('auto_parse_enabled', '0') == '1',
+        "author_types": file_utils.get_author_types()
+    }
+
+async def get_settings():
+    """Все настройки парсинга за одно обращение к потоку"""
+    return await run(_snapshot)
+
+async def get_region_name():
+    return await run(file_utils.get_region_name)
+
+async def get_rooms():
+    return await run(file_utils.get_rooms)
+
+async def get_floors():
+    return await run(lambda: (file_utils.get_min_floor(), file_utils.get_max_floor()))
+
+async def get_prices():
+    return await run(lambda: (file_utils.get_min_price(), file_utils.get_max_price()))
+
+async def get_author_types():
+    return await run(file_utils.get_author_types)
+
+async def set_author_types(author_types):
+    await run(file_utils.set_author_types, author_types)
+
+async def set_rooms(rooms):
+    await run(file_utils.set_rooms, rooms)
+
+async def set_floors(min_floors, max_floors):
+    await run(file_utils.set_floors, min_floors, max_floors)
+
+async def set_prices(min_price, max_price):
+    await run(file_utils.set_prices, min_price, max_price)
+
+async def set_region(region_name, region_id):
+    await run(file_utils.set_region, region_name, region_id)
+
+async def reset_settings():
+    await run(file_utils.reset_settings)
+
+def _load_locations():
+    global _locations
+    if _locations is None:
+        # cianparser тянет за собой тяжелые зависимости - загружаем при первом обращении
+        import cianparser
+        _locations = sorted(cianparser.list_locations(), key=lambda x: x[0].lower())
+    return _locations
+
+async def list_locations():
+    """Справочник регионов cianparser [(название, id), ...], отсортированный по названию"""
+    return await run(_load_locations)
+
+async def find_location(region_name):
+    """Регион с точным совпадением названия (без учета регистра) или None"""
+    name = region_name.lower()
+    for location in await list_locations():
+        if location[0].lower() == name:
+            return location
+    return None
+
+async def suggest_locations(region_name, limit=5):
+    """Названия регионов, содержащие введенную строку"""
+    name = region_name.lower()
+    return [location[0] for location in await list_locations() if name in location[0].lower()][:limit]
+
+def _write_locations_file(filename):
+    with open(filename, 'w', encoding='utf-8') as f:
+        f.write("Список доступных регионов для парсинга:\n")
+        f.write("=" * 50 + "\n\n")
+        for region in _load_locations():
+            f.write(f"• {region[0]} (ID: {region[1]})\n")
+    return filename
+
+async def write_locations_file(filename="available_regions.txt"):
+    """Записывает справочник регионов в текстовый файл для отправки в чат"""
+    return await run(_write_locations_file, filename)
+
+async def delete_file_after_delay(path, delay):
+    """Удаляет файл через delay секунд, не блокируя цикл событий"""
+    await asyncio.sleep(delay)
+    try:
+        await run(os.remove, path)
+    except OSError:
+        pass
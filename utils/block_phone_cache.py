@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import config
+
+class BlockPhoneCache:
+    """Кэш телефонов застройщиков по siteBlockId, сохраняемый между запусками.
+
+    Объявления одного корпуса имеют общий siteBlockId и общий номер, поэтому
+    первый успешный API-ответ обслуживает все соседние объявления.
+    """
+
+    def __init__(self, db_path=None, ttl=None):
+        self.db_path = db_path or config.BLOCK_PHONE_CACHE_FILE
+        self.ttl = config.BLOCK_PHONE_CACHE_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS block_phones (
+                    site_block_id INTEGER PRIMARY KEY,
+                    phone TEXT NOT NULL,
+                    not_formatted_phone TEXT NOT NULL,
+                    fetched_at REAL NOT NULL
+                )
+            ''')
+            conn.commit()
+
+    def get(self, site_block_id):
+        """Возвращает {"phone", "notFormattedPhone"} для блока или None, если записи нет или она устарела"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT phone, not_formatted_phone, fetched_at FROM block_phones WHERE site_block_id = ?",
+                (int(site_block_id),)
+            ).fetchone()
+
+        with self._lock:
+            if row and time.time() - row[2] < self.ttl:
+                self.hits += 1
+                return {"phone": row[0], "notFormattedPhone": row[1]}
+            self.misses += 1
+            return None
+
+    def put(self, site_block_id, phone, not_formatted_phone):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO block_phones (site_block_id, phone, not_formatted_phone, fetched_at) "
+                "VALUES (?, ?, ?, ?)",
+                (int(site_block_id), phone, not_formatted_phone, time.time())
+            )
+            conn.commit()
+
+    def format_stats(self):
+        """Форматирует статистику для итогового отчета"""
+        total = self.hits + self.misses
+        share = self.hits / total if total else 0.0
+        return f"♻️ Кэш siteBlockId: сэкономлено {self.hits} API запросов из {total} ({share:.0%})"
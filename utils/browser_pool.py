@@ -0,0 +1,146 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from utils import browser_session
+import config
+
+class BrowserPool:
+    """Пул изолированных контекстов async Playwright для запасного пути получения номера.
+
+    Браузер работает в фоновом потоке со своим event loop. Объявления
+    подаются через submit и распределяются из общей очереди между
+    size контекстами; у каждого контекста свои cookies и свой лимит
+    частоты (не чаще одной страницы в min_interval секунд). Если поток
+    браузера завершится с ошибкой, все невыполненные Future сразу
+    получают RuntimeError, а submit перестает принимать объявления.
+    """
+
+    def __init__(self, size=None, min_interval=None):
+        self.size = size or config.BROWSER_CONTEXTS
+        self.min_interval = config.BROWSER_CONTEXT_MIN_INTERVAL if min_interval is None else min_interval
+        self._loop = asyncio.new_event_loop()
+        self._queue = None
+        self._ready = threading.Event()
+        self._startup_error = None
+        self._futures = set()
+        self._futures_lock = threading.Lock()
+        self._stopped = False
+        self.error = None
+        self._thread = threading.Thread(target=self._run, name="browser-pool", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._main())
+        except Exception as e:
+            self.error = e
+        finally:
+            self._loop.close()
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """Завершает ошибкой Future, которые уже не будут обработаны"""
+        with self._futures_lock:
+            self._stopped = True
+            futures, self._futures = self._futures, set()
+        reason = f"Браузерный пул остановлен: {self.error}" if self.error else "Браузерный пул остановлен"
+        for future in futures:
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
+
+    async def _main(self):
+        try:
+            from playwright.async_api import async_playwright
+            async with async_playwright() as p:
+                browser = await p.chromium.launch(headless=True)
+                try:
+                    contexts = []
+                    for _ in range(self.size):
+                        context = await browser.new_context()
+                        await browser_session.install_resource_blocking_async(context)
+                        contexts.append(context)
+                    self._queue = asyncio.Queue()
+                    self._ready.set()
+                    await asyncio.gather(*(self._worker(context) for context in contexts))
+                finally:
+                    await browser.close()
+        except Exception as e:
+            if not self._ready.is_set():
+                self._startup_error = e
+                self._ready.set()
+            else:
+                raise
+
+    async def _worker(self, context):
+        last_started = float("-inf")
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                break
+            url, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            # Лимит частоты контекста
+            delay = last_started + self.min_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            last_started = time.monotonic()
+
+            page = None
+            try:
+                page = await context.new_page()
+                future.set_result(await browser_session.read_phone_async(page, url))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                if page is not None:
+                    try:
+                        await page.close()
+                    except Exception:
+                        pass
+
+    def submit(self, url):
+        """Ставит объявление в очередь. Возвращает Future с текстом номера (или None).
+
+        RuntimeError - пул остановлен и объявление не принято.
+        """
+        future = Future()
+        with self._futures_lock:
+            if self._stopped:
+                raise RuntimeError(f"Браузерный пул остановлен: {self.error}" if self.error else "Браузерный пул остановлен")
+            self._futures.add(future)
+        future.add_done_callback(self._forget)
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, (url, future))
+        except RuntimeError:
+            # Цикл закрылся между проверкой и постановкой в очередь
+            self._forget(future)
+            raise
+        return future
+
+    def _forget(self, future):
+        with self._futures_lock:
+            self._futures.discard(future)
+
+    @property
+    def stopped(self):
+        """Поток браузера завершился: новые объявления не принимаются"""
+        return self._stopped
+
+    def close(self):
+        """Дожидается обработки очереди и закрывает браузер"""
+        if not self._thread.is_alive():
+            return
+        try:
+            for _ in range(self.size):
+                self._loop.call_soon_threadsafe(self._queue.put_nowait, None)
+        except RuntimeError:
+            # Цикл уже завершился с ошибкой
+            pass
+        self._thread.join()
@@ -0,0 +1,111 @@
+import re
+from contextlib import contextmanager
+import config
+
+# Шаблоны маршрутов передаются в браузер: через Python проходят только
+# совпавшие запросы (и сразу отменяются), остальные грузятся без перехвата
+_BLOCKED_FILES = re.compile(
+    r"\.(" + "|".join(config.BROWSER_BLOCKED_EXTENSIONS) + r")(\?[^/]*)?$", re.IGNORECASE
+)
+_BLOCKED_HOSTS = re.compile(
+    r"^https?://([^/]+\.)?(" + "|".join(re.escape(host) for host in config.BROWSER_BLOCKED_HOSTS) + r")(:\d+)?/"
+)
+
+CONTACTS_BUTTON = '[data-testid="contacts-button"]'
+PHONE_SELECTOR = '[data-testid="PhoneLink"], .phone-number'
+
+def _abort(route):
+    route.abort()
+
+def install_resource_blocking(context):
+    """Отменяет загрузку картинок, медиа, шрифтов и счетчиков аналитики во всех страницах контекста"""
+    context.route(_BLOCKED_FILES, _abort)
+    context.route(_BLOCKED_HOSTS, _abort)
+
+@contextmanager
+def light_page(block_resources=True):
+    """Страница headless-браузера в облегченном контексте; браузер закрывается при выходе"""
+    from playwright.sync_api import sync_playwright
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        try:
+            context = browser.new_context()
+            if block_resources:
+                install_resource_blocking(context)
+            yield context.new_page()
+        finally:
+            browser.close()
+
+def is_api_request(request):
+    return request.url == config.API_URL and request.method == "POST"
+
+def click_contacts(page, timeout=15000):
+    """Нажимает кнопку контактов. Возвращает False, если кнопку нажать не удалось"""
+    try:
+        page.wait_for_selector(CONTACTS_BUTTON, state="visible", timeout=timeout)
+        page.click(CONTACTS_BUTTON)
+        return True
+    except Exception:
+        # Кнопка может быть перекрыта баннером - пробуем кликнуть через JS
+        try:
+            return page.evaluate(f'''() => {{
+                const btn = document.querySelector('{CONTACTS_BUTTON}');
+                if (btn) btn.click();
+                return !!btn;
+            }}''')
+        except Exception:
+            return False
+
+def capture_api_request(page, url, timeout=None):
+    """Открывает объявление, нажимает кнопку контактов и возвращает запрос к API телефонов.
+
+    Ожидание заканчивается, как только браузер отправил запрос. Если запрос
+    не появился за timeout мс, Playwright выбрасывает TimeoutError.
+    """
+    page.goto(url, wait_until="domcontentloaded", timeout=60000)
+    with page.expect_request(is_api_request, timeout=timeout or config.BROWSER_API_CAPTURE_TIMEOUT) as request_info:
+        click_contacts(page)
+    return request_info.value
+
+def read_phone(page, url, timeout=None):
+    """Открывает объявление, нажимает кнопку контактов и возвращает текст номера со страницы (или None)"""
+    page.goto(url, wait_until="domcontentloaded", timeout=60000)
+    click_contacts(page, timeout=10000)
+    try:
+        element = page.wait_for_selector(PHONE_SELECTOR, state="attached", timeout=timeout or config.BROWSER_PHONE_TIMEOUT)
+    except Exception:
+        return None
+    return element.inner_text() if element else None
+
+# --- Варианты для async Playwright (браузерный пул) ---
+
+async def _abort_async(route):
+    await route.abort()
+
+async def install_resource_blocking_async(context):
+    await context.route(_BLOCKED_FILES, _abort_async)
+    await context.route(_BLOCKED_HOSTS, _abort_async)
+
+async def click_contacts_async(page, timeout=15000):
+    try:
+        await page.wait_for_selector(CONTACTS_BUTTON, state="visible", timeout=timeout)
+        await page.click(CONTACTS_BUTTON)
+        return True
+    except Exception:
+        try:
+            return await page.evaluate(f'''() => {{
+                const btn = document.querySelector('{CONTACTS_BUTTON}');
+                if (btn) btn.click();
+                return !!btn;
+            }}''')
+        except Exception:
+            return False
+
+async def read_phone_async(page, url, timeout=None):
+    await page.goto(url, wait_until="domcontentloaded", timeout=60000)
+    await click_contacts_async(page, timeout=10000)
+    try:
+        element = await page.wait_for_selector(PHONE_SELECTOR, state="attached", timeout=timeout or config.BROWSER_PHONE_TIMEOUT)
+    except Exception:
+        return None
+    return await element.inner_text() if element else None
@@ -1,8 +1,11 @@
 import os
 import re
-import json
 from datetime import datetime, timedelta
 import database
+from utils import job_lock, storage
+
+# Блокировки, захваченные текущим процессом
+_held_locks = {}
 
 def ensure_output_dir(output_dir="output"):
     """Создает директорию для выходных файлов, если её нет."""
@@ -30,25 +33,61 @@ def remove_region_file(region_file):
     return False
 
 def start_parsing(lock_file="parsing.lock"):
-    """Создает lock-файл, указывающий на выполнение парсинга."""
-    with open(lock_file, 'w') as f:
-        f.write(datetime.now().isoformat())
+    """Захватывает блокировку парсинга. Возвращает False, если парсинг уже выполняется."""
+    lock = job_lock.JobLock(lock_file)
+    if not lock.acquire():
+        return False
+    _held_locks[lock_file] = lock
+    return True
 
 def finish_parsing(lock_file="parsing.lock"):
-    """Удаляет lock-файл."""
-    try:
-        if os.path.exists(lock_file):
-            os.remove(lock_file)
-    except:
-        pass
+    """Освобождает блокировку парсинга, захваченную этим процессом."""
+    lock = _held_locks.pop(lock_file, None)
+    if lock:
+        lock.release()
+
+def touch_parsing(lock_file="parsing.lock"):
+    """Отмечает продвижение парсинга: без этого блокировка через JOB_LOCK_STALE_AFTER считается зависшей."""
+    lock = _held_locks.get(lock_file)
+    if lock:
+        lock.touch()
 
 def is_parsing_in_progress(lock_file="parsing.lock"):
-    """Проверяет, выполняется ли парсинг (существует lock-файл)."""
-    return os.path.exists(lock_file)
+    """Проверяет, выполняется ли парсинг (блокировка удерживается живым процессом)."""
+    return job_lock.is_locked(lock_file)
+
+def wait_for_parsing(lock_file="parsing.lock", timeout=None):
+    """Блокирует до завершения парсинга объявлений в другом процессе.
+
+    Возвращает False по таймауту или если процесс парсинга завис.
+    """
+    return job_lock.wait_for_release(lock_file, timeout)
+
+def describe_hung_parsing(lock_file="parsing.lock"):
+    """Описание зависшего процесса парсинга (PID, хост, возраст heartbeat) или None"""
+    info = job_lock.hung_owner(lock_file)
+    return job_lock.format_owner(info) if info else None
 
 def get_phones_file(output_dir="output"):
     return os.path.join(output_dir, "data.json")
 
+def get_phones_journal_file(owner, output_dir="output"):
+    """Журнал номеров процесса owner (см. journal.journal_owner)"""
+    return os.path.join(output_dir, f"data.{owner}.journal")
+
+def list_phones_journals(output_dir="output"):
+    """Журналы номеров всех процессов: [(владелец, путь)], включая общий журнал прежних версий"""
+    journals = []
+    for name in sorted(os.listdir(output_dir)) if os.path.isdir(output_dir) else ():
+        if name == "data.journal":
+            journals.append(("", os.path.join(output_dir, name)))
+        elif name.startswith("data.") and name.endswith(".journal"):
+            journals.append((name[len("data."):-len(".journal")], os.path.join(output_dir, name)))
+    return journals
+
+def get_listing_stats_file(output_dir="output"):
+    return os.path.join(output_dir, "listing_stats.json")
+
 def extract_urls_from_regions(region_file=None, author_type=None):
     """Извлекает URL объявлений из файла региона, с фильтром по типу автора."""
     if region_file is None:
@@ -57,11 +96,9 @@ def extract_urls_from_regions(region_file=None, author_type=None):
     if not os.path.exists(region_file):
         return []
     
-    with open(region_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
     urls = []
-    for item in data.get("data", []):
+    # Бинарный формат читается потоково, JSON - целиком
+    for item in storage.iter_data(region_file):
         if author_type is None or item.get("author_type") == author_type:
             url = item.get("url")
             if url:
@@ -76,6 +113,9 @@ def extract_id_from_url(url):
         return match.group(1)
     return None
 
+def get_setting(key, default=None):
+    return database.get_setting(key, default)
+
 def get_region_name():
     return database.get_setting('region', 'Тюмень')
 
@@ -109,4 +149,40 @@ def get_author_types():
 
 def set_author_types(author_types: list):
     """Устанавливает выбранные типы авторов."""
-    database.set_setting('author_types', ','.join(author_types))
\ No newline at end of file
+    database.set_setting('author_types', ','.join(author_types))
+
+def _format_floors(floors):
+    return ','.join(map(str, sorted(floors))) if floors else ''
+
+def _format_price(price):
+    return str(price) if price else ''
+
+def set_region(region_name, region_id):
+    database.set_settings({'region': region_name, 'region_id': str(region_id)})
+
+def set_rooms(rooms: list):
+    database.set_setting('rooms', ','.join(map(str, sorted(rooms))))
+
+def set_min_floor(floors: list):
+    database.set_setting('min_floor', _format_floors(floors))
+
+def set_max_floor(floors: list):
+    database.set_setting('max_floor', _format_floors(floors))
+
+def set_floors(min_floors: list, max_floors: list):
+    """Сохраняет минимальные и максимальные этажи одной транзакцией."""
+    database.set_settings({'min_floor': _format_floors(min_floors), 'max_floor': _format_floors(max_floors)})
+
+def set_min_price(price):
+    database.set_setting('min_price', _format_price(price))
+
+def set_max_price(price):
+    database.set_setting('max_price', _format_price(price))
+
+def set_prices(min_price, max_price):
+    """Сохраняет минимальную и максимальную цену одной транзакцией."""
+    database.set_settings({'min_price': _format_price(min_price), 'max_price': _format_price(max_price)})
+
+def reset_settings():
+    """Возвращает настройки парсинга к значениям по умолчанию."""
+    database.set_settings(dict(database.DEFAULT_SETTINGS, auto_parse_enabled='0'))
@@ -0,0 +1,176 @@
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+from aiogram import Bot
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from utils import serialization
+import config
+
+class SQLiteStorage(BaseStorage):
+    """Хранилище состояний FSM в SQLite (WAL): переживает перезапуск бота.
+
+    Файл могут одновременно использовать несколько процессов бота.
+    Запросы выполняются на одном постоянном соединении в отдельном потоке
+    хранилища: при конкуренции процессов запись может ждать блокировку
+    базы до 30 секунд, и это ожидание не должно останавливать цикл событий.
+    Записи без активности дольше ttl секунд не читаются и периодически
+    удаляются.
+    """
+
+    def __init__(self, db_path=None, ttl=None, evict_interval=None):
+        self.db_path = db_path or config.FSM_STORAGE_FILE
+        self.ttl = config.FSM_STATE_TTL if ttl is None else ttl
+        self.evict_interval = config.FSM_EVICT_INTERVAL if evict_interval is None else evict_interval
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-io")
+
+    async def _run(self, func, *args, **kwargs):
+        """Выполняет синхронную функцию в потоке хранилища"""
+        if self._executor is None:
+            # Хранилище снова используется после close
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm-io")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    def _connect(self):
+        """Открывает соединение при первом обращении, а не при создании хранилища"""
+        if self._conn is not None:
+            return self._conn
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        # isolation_level=None: транзакциями управляем вручную через BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS fsm (
+                bot_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                destiny TEXT NOT NULL,
+                state TEXT,
+                data TEXT NOT NULL DEFAULT '{}',
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (bot_id, chat_id, user_id, destiny)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fsm_updated_at ON fsm (updated_at)")
+        self._conn = conn
+        self._evict()
+        return conn
+
+    @staticmethod
+    def _key(key: StorageKey):
+        return (key.bot_id, key.chat_id, key.user_id, key.destiny)
+
+    def _fresh_after(self):
+        return time.time() - self.ttl
+
+    def _read(self, key: StorageKey):
+        row = self._connect().execute(
+            "SELECT state, data FROM fsm WHERE bot_id = ? AND chat_id = ? AND user_id = ? AND destiny = ? "
+            "AND updated_at >= ?",
+            self._key(key) + (self._fresh_after(),)
+        ).fetchone()
+        return row if row else (None, "{}")
+
+    def _write(self, key: StorageKey, state, data):
+        if state is None and data == "{}":
+            # Пустой диалог не храним
+            self._conn.execute(
+                "DELETE FROM fsm WHERE bot_id = ? AND chat_id = ? AND user_id = ? AND destiny = ?",
+                self._key(key)
+            )
+        else:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fsm (bot_id, chat_id, user_id, destiny, state, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._key(key) + (state, data, time.time())
+            )
+
+    def _modify(self, key: StorageKey, state=None, data=None, update=None, set_state=False):
+        """Читает и перезаписывает запись одной транзакцией (безопасно для нескольких процессов)"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                current_state, current_data = self._read(key)
+                if set_state:
+                    current_state = state
+                if data is not None:
+                    current_data = serialization.dumps_str(data)
+                if update is not None:
+                    merged = serialization.loads(current_data)
+                    merged.update(update)
+                    current_data = serialization.dumps_str(merged)
+                self._write(key, current_state, current_data)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if time.monotonic() - self._last_evict >= self.evict_interval:
+                self._evict()
+        return current_data
+
+    def _evict(self):
+        self._last_evict = time.monotonic()
+        return self._connect().execute("DELETE FROM fsm WHERE updated_at < ?", (self._fresh_after(),)).rowcount
+
+    def evict(self):
+        """Удаляет просроченные состояния. Возвращает число удаленных записей"""
+        with self._lock:
+            return self._evict()
+
+    def _get(self, key: StorageKey, index):
+        with self._lock:
+            return self._read(key)[index]
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def set_state(self, bot: Bot, key: StorageKey, state: StateType = None) -> None:
+        await self._run(self._modify, key, state=state.state if isinstance(state, State) else state, set_state=True)
+
+    async def get_state(self, bot: Bot, key: StorageKey) -> Optional[str]:
+        return await self._run(self._get, key, 0)
+
+    async def set_data(self, bot: Bot, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._run(self._modify, key, data=data)
+
+    async def get_data(self, bot: Bot, key: StorageKey) -> Dict[str, Any]:
+        return serialization.loads(await self._run(self._get, key, 1))
+
+    async def update_data(self, bot: Bot, key: StorageKey, data: Dict[str, Any]) -> Dict[str, Any]:
+        return serialization.loads(await self._run(self._modify, key, update=data))
+
+    async def close(self) -> None:
+        await self._run(self._close)
+        # Соединение закрыто последней задачей потока, поэтому shutdown не ждет
+        executor, self._executor = self._executor, None
+        executor.shutdown(wait=True)
+
+def create_storage(spec=None):
+    """Хранилище FSM по настройке config.FSM_STORAGE"""
+    spec = spec or config.FSM_STORAGE
+    if spec == "memory":
+        from aiogram.fsm.storage.memory import MemoryStorage
+        return MemoryStorage()
+    if spec.startswith(("redis://", "rediss://")):
+        # Внимание: нужен установленный пакет redis (pip install redis)
+        from aiogram.fsm.storage.redis import RedisStorage
+        return RedisStorage.from_url(spec, state_ttl=config.FSM_STATE_TTL, data_ttl=config.FSM_STATE_TTL)
+    if spec == "sqlite":
+        return SQLiteStorage()
+    raise ValueError(f"Неизвестное хранилище FSM: {spec}")
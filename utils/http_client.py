@@ -0,0 +1,161 @@
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+import config
+
+# Ответы, снижающие оценку здоровья точки выхода
+_UNHEALTHY_STATUSES = (403, 429, 500, 502, 503, 504)
+
+class _SourceAddressAdapter(HTTPAdapter):
+    """Адаптер requests, открывающий соединения с заданного локального адреса"""
+
+    def __init__(self, source_address, **kwargs):
+        self.source_address = source_address
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["source_address"] = (self.source_address, 0)
+        super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs["source_address"] = (self.source_address, 0)
+        return super().proxy_manager_for(*args, **kwargs)
+
+class Egress:
+    """Точка выхода исходящих запросов: напрямую, через HTTP/SOCKS-прокси или с локального адреса.
+
+    У каждой точки свой пул соединений (requests.Session), бюджет
+    запросов в минуту и оценка здоровья (скользящая доля успешных ответов).
+    """
+
+    def __init__(self, spec, pool_size=None, budget=None):
+        self.spec = spec
+        self.budget = budget or config.EGRESS_BUDGET_PER_MINUTE
+        pool_size = pool_size or config.EGRESS_POOL_SIZE
+
+        self.session = requests.Session()
+        if spec.startswith("source:"):
+            self.name = spec
+            adapter = _SourceAddressAdapter(spec[len("source:"):], pool_connections=pool_size, pool_maxsize=pool_size)
+        else:
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            if spec != "direct":
+                if urlsplit(spec).scheme.startswith("socks"):
+                    try:
+                        import socks  # noqa: F401
+                    except ImportError:
+                        raise RuntimeError(f"Для SOCKS-прокси {spec} установите пакет: pip install requests[socks]")
+                self.session.proxies = {"http": spec, "https": spec}
+            # Пароль прокси в логи не попадает
+            parts = urlsplit(spec)
+            self.name = f"{parts.scheme}://{parts.hostname}:{parts.port}" if parts.hostname else spec
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.in_flight = 0
+        self.total = 0
+        self.failures = 0
+        self.health = 1.0
+        self.penalized_until = 0.0
+        self._window_start = time.monotonic()
+        self._window_requests = 0
+
+    def _roll_window(self, now):
+        if now - self._window_start >= 60:
+            self._window_start = now
+            self._window_requests = 0
+
+    def load(self, now):
+        """Загрузка точки: запросы в работе плюс использованная доля минутного бюджета"""
+        self._roll_window(now)
+        return self.in_flight + self._window_requests / self.budget
+
+    def available(self, now):
+        self._roll_window(now)
+        return now >= self.penalized_until and self._window_requests < self.budget
+
+    def window_reset_at(self):
+        return max(self._window_start + 60, self.penalized_until)
+
+class HttpClient:
+    """Исходящие HTTP-запросы парсеров с распределением по точкам выхода.
+
+    Запрос уходит через наименее загруженную здоровую точку. Точка,
+    исчерпавшая минутный бюджет, пропускается до начала следующей минуты;
+    точка с оценкой здоровья ниже EGRESS_MIN_HEALTH отстраняется на
+    EGRESS_PENALTY секунд. Если доступных точек нет, запрос ждет.
+    """
+
+    def __init__(self, endpoints=None, pool_size=None, budget=None):
+        endpoints = endpoints or config.EGRESS_ENDPOINTS or ["direct"]
+        self.egresses = [Egress(spec, pool_size, budget) for spec in endpoints]
+        self._cond = threading.Condition()
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                candidates = [e for e in self.egresses if e.available(now)]
+                if candidates:
+                    egress = min(candidates, key=lambda e: e.load(now))
+                    egress.in_flight += 1
+                    egress.total += 1
+                    egress._window_requests += 1
+                    return egress
+                wait = min(e.window_reset_at() for e in self.egresses) - now
+                self._cond.wait(timeout=max(wait, 0.1))
+
+    def _release(self, egress, success):
+        with self._cond:
+            egress.in_flight -= 1
+            if not success:
+                egress.failures += 1
+            egress.health = egress.health * (1 - config.EGRESS_HEALTH_ALPHA) + (config.EGRESS_HEALTH_ALPHA if success else 0)
+            if egress.health < config.EGRESS_MIN_HEALTH:
+                # Отстраняем точку, только если трафик есть куда перенаправить; после паузы она получает новый шанс
+                now = time.monotonic()
+                if any(e is not egress and now >= e.penalized_until for e in self.egresses):
+                    egress.penalized_until = now + config.EGRESS_PENALTY
+                egress.health = config.EGRESS_MIN_HEALTH + config.EGRESS_HEALTH_ALPHA
+            self._cond.notify_all()
+
+    def request(self, method, url, **kwargs):
+        egress = self._acquire()
+        success = False
+        try:
+            response = egress.session.request(method, url, **kwargs)
+            success = response.status_code not in _UNHEALTHY_STATUSES
+            return response
+        finally:
+            self._release(egress, success)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def format_stats(self):
+        """Форматирует статистику для итогового отчета"""
+        with self._cond:
+            parts = [f"{e.name}: {e.total} запросов, ошибок {e.failures}, здоровье {e.health:.2f}" for e in self.egresses]
+        return "🌍 Точки выхода: " + "; ".join(parts)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Общий клиент процесса (точки выхода из config.EGRESS_ENDPOINTS)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+def post(url, **kwargs):
+    return get_client().post(url, **kwargs)
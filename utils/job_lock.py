@@ -0,0 +1,227 @@
+import os
+import json
+import socket
+import threading
+import time
+from datetime import datetime
+import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: блокировки ядра недоступны, работаем по PID/heartbeat
+    fcntl = None
+
+def pid_alive(pid):
+    """Проверяет, жив ли процесс (только POSIX: на Windows os.kill завершает процесс)"""
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def read_lock_info(lock_file):
+    """Читает сведения о владельце блокировки (None, если файл пуст или в старом формате)"""
+    try:
+        with open(lock_file, 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        return info if isinstance(info, dict) and "pid" in info else None
+    except (OSError, ValueError):
+        return None
+
+def _heartbeat_expired(info, stale_after=None):
+    """Владелец давно не сообщал о продвижении работы (см. JobLock.touch)"""
+    if stale_after is None:
+        stale_after = config.JOB_LOCK_STALE_AFTER
+    return time.time() - info.get("heartbeat", 0) > stale_after
+
+def is_stale(info, stale_after=None):
+    """Блокировка устарела: heartbeat давно не обновлялся или процесс-владелец умер"""
+    if info is None:
+        return True
+    if _heartbeat_expired(info, stale_after):
+        return True
+    if info.get("host") == socket.gethostname() and not pid_alive(info["pid"]):
+        return True
+    return False
+
+def _flock_held(lock_file):
+    """Flock на файле держит другой открытый дескриптор (пробный LOCK_SH без ожидания).
+
+    Не зависит от PID в файле сведений, поэтому не ошибается, если PID
+    завершившегося владельца уже занят другим процессом.
+    """
+    try:
+        fd = os.open(lock_file, os.O_RDONLY)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except OSError:
+        return True
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return False
+    finally:
+        os.close(fd)
+
+class JobLock:
+    """Межпроцессная advisory-блокировка задачи с PID владельца и heartbeat.
+
+    На POSIX держит flock на файле всё время работы, поэтому упавший процесс
+    освобождает блокировку автоматически, а ожидающие просыпаются сразу.
+    Heartbeat отражает продвижение работы: владелец вызывает touch() по ходу
+    обхода, а фоновый поток лишь переносит время последнего touch() в файл.
+    Зависшая задача перестает обновлять heartbeat, даже если процесс жив.
+    """
+
+    def __init__(self, lock_file, heartbeat_interval=None):
+        self.lock_file = lock_file
+        self.heartbeat_interval = heartbeat_interval or config.JOB_LOCK_HEARTBEAT
+        self._fd = None
+        self._started_at = None
+        self._progress_at = None
+        self._written_at = None
+        self._stop = threading.Event()
+        self._heartbeat_thread = None
+
+    def acquire(self):
+        """Захватывает блокировку. Возвращает False, если её держит другой живой процесс"""
+        fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            acquired = self._try_flock(fd)
+        else:
+            acquired = is_stale(read_lock_info(self.lock_file))
+        if not acquired:
+            os.close(fd)
+            return False
+
+        self._fd = fd
+        self._started_at = datetime.now().isoformat()
+        self._progress_at = time.time()
+        self._write_info()
+
+        self._stop.clear()
+        self._heartbeat_thread = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        self._heartbeat_thread.start()
+        return True
+
+    def _try_flock(self, fd, attempts=3):
+        """LOCK_EX без ожидания.
+
+        Занятый flock перепроверяется несколько раз: ожидающие процессы
+        (is_locked, wait_for_release) берут пробный LOCK_SH на мгновение.
+        """
+        for attempt in range(attempts):
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                if attempt == attempts - 1:
+                    return False
+                time.sleep(0.05)
+        return False
+
+    def touch(self):
+        """Отмечает продвижение работы; в файл попадает с ближайшим heartbeat"""
+        self._progress_at = time.time()
+
+    def _write_info(self):
+        progress_at = self._progress_at
+        info = {
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "started_at": self._started_at,
+            "heartbeat": progress_at
+        }
+        data = json.dumps(info).encode('utf-8')
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, data)
+        self._written_at = progress_at
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            if self._progress_at == self._written_at:
+                continue
+            try:
+                self._write_info()
+            except OSError:
+                break
+
+    def release(self):
+        """Освобождает блокировку и будит ожидающие процессы"""
+        if self._fd is None:
+            return
+        self._stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        try:
+            # Файл не удаляем: иначе ожидающий может захватить flock на удаленном inode
+            os.ftruncate(self._fd, 0)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise RuntimeError(f"Блокировка {self.lock_file} уже захвачена")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+def is_locked(lock_file):
+    """Проверяет, удерживается ли блокировка.
+
+    С flock - пробным LOCK_SH без ожидания: блокировку держит процесс,
+    пока он жив, даже с устаревшим heartbeat (см. hung_owner). Без flock -
+    по сведениям о владельце; устаревшую блокировку можно перехватить.
+    """
+    if fcntl is not None:
+        return _flock_held(lock_file)
+    # release очищает файл
+    return not is_stale(read_lock_info(lock_file))
+
+def hung_owner(lock_file):
+    """Сведения о владельце, который держит flock, но давно не продвигался в работе (иначе None).
+
+    С flock такую блокировку нельзя захватить, пока процесс не завершат;
+    без flock ее перехватывает acquire, поэтому зависшего владельца нет.
+    """
+    if fcntl is None:
+        return None
+    info = read_lock_info(lock_file)
+    if info is None or not _heartbeat_expired(info) or not _flock_held(lock_file):
+        return None
+    return info
+
+def format_owner(info):
+    heartbeat_age = int(time.time() - info.get("heartbeat", 0))
+    return f"PID {info['pid']} на {info.get('host', '?')}, последний heartbeat {heartbeat_age} сек назад"
+
+def wait_for_release(lock_file, timeout=None):
+    """Ждет освобождения блокировки, опрашивая ее с интервалом config.JOB_LOCK_POLL_INTERVAL.
+
+    Возвращает True, если она освобождена, и False по таймауту или если
+    владелец завис (hung_owner): ждать его бесполезно, а данные не обновятся.
+    Без flock устаревшая блокировка считается освобожденной.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while is_locked(lock_file):
+        if hung_owner(lock_file) is not None:
+            return False
+        wait_time = config.JOB_LOCK_POLL_INTERVAL
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            wait_time = min(wait_time, remaining)
+        time.sleep(wait_time)
+    return True
@@ -0,0 +1,80 @@
+import os
+import socket
+import time
+from utils import serialization
+from utils.job_lock import pid_alive
+import config
+
+def journal_owner():
+    """Владелец журнала: хост и PID процесса (часть имени файла журнала)"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def is_orphaned(owner):
+    """Журнал процесса этого хоста, который уже завершился; журналы других хостов не трогаем"""
+    host, _, pid = owner.rpartition("-")
+    if not pid.isdigit():
+        # Журнал прежнего формата (общий для всех процессов)
+        return True
+    return host == socket.gethostname() and not pid_alive(int(pid))
+
+class Journal:
+    """Журнал результатов только на добавление рядом с файлом данных.
+
+    Каждая запись - строка JSON [ключ, значение], дописываемая одним
+    системным вызовом сразу после получения результата, поэтому при
+    падении процесса теряется только обрабатываемое объявление. fsync
+    выполняется пачками: каждые fsync_every записей или fsync_interval
+    секунд. Основной файл переписывается только при сжатии журнала.
+
+    У каждого процесса свой файл журнала: сжатие удаляет только его, и
+    журналы работающих параллельно воркеров не теряются.
+    """
+
+    def __init__(self, path, fsync_every=None, fsync_interval=None):
+        self.path = path
+        self.fsync_every = fsync_every or config.JOURNAL_FSYNC_EVERY
+        self.fsync_interval = config.JOURNAL_FSYNC_INTERVAL if fsync_interval is None else fsync_interval
+        self._fd = None
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, key, value):
+        if self._fd is None:
+            # O_APPEND: строки нескольких процессов не перемешиваются
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        os.write(self._fd, serialization.dumps([key, value]) + b"\n")
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._fd is not None and self._pending:
+            os.fsync(self._fd)
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def replay(self):
+        """Перебирает записи журнала (ключ, значение); недописанная последняя строка пропускается"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    key, value = serialization.loads(line)
+                except ValueError:
+                    continue
+                yield key, value
+
+    def truncate(self):
+        """Очищает журнал после того, как его записи попали в основной файл"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self._fd is not None:
+            self.sync()
+            os.close(self._fd)
+            self._fd = None
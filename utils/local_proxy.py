@@ -0,0 +1,136 @@
+"""Локальный HTTP-прокси для проверки точек выхода без внешних прокси.
+
+Поддерживает обычные запросы с абсолютным URL (http://) и туннели CONNECT
+(https://). Запуск отдельно: python -m utils.local_proxy [порт]
+"""
+import http.client
+import select
+import socket
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+# Заголовки одного соединения, которые прокси не пересылает
+_HOP_HEADERS = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "proxy-connection", "te", "trailers", "transfer-encoding", "upgrade"
+}
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_CONNECT(self):
+        self.server.count()
+        host, _, port = self.path.rpartition(":")
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=15)
+        except OSError as e:
+            self.send_error(502, str(e))
+            return
+
+        self.send_response(200, "Connection Established")
+        self.end_headers()
+        self.close_connection = True
+
+        # Перекачиваем байты в обе стороны, пока одна из сторон не закроет соединение
+        sockets = [self.connection, upstream]
+        try:
+            while True:
+                readable, _, errored = select.select(sockets, [], sockets, 60)
+                if errored or not readable:
+                    break
+                for sock in readable:
+                    data = sock.recv(65536)
+                    if not data:
+                        return
+                    (upstream if sock is self.connection else self.connection).sendall(data)
+        finally:
+            upstream.close()
+
+    def _forward(self):
+        self.server.count()
+        url = urlsplit(self.path)
+        if not url.hostname:
+            self.send_error(400, "Нужен абсолютный URL")
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else None
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in _HOP_HEADERS}
+        path = url.path or "/"
+        if url.query:
+            path += "?" + url.query
+
+        connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        upstream = connection_class(url.hostname, url.port, timeout=15)
+        try:
+            upstream.request(self.command, path, body=body, headers=headers)
+            response = upstream.getresponse()
+            data = response.read()
+        except OSError as e:
+            self.send_error(502, str(e))
+            return
+        finally:
+            upstream.close()
+
+        self.send_response(response.status, response.reason)
+        for key, value in response.getheaders():
+            if key.lower() not in _HOP_HEADERS and key.lower() != "content-length":
+                self.send_header(key, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PUT = do_DELETE = do_HEAD = _forward
+
+class _ProxyServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _ProxyHandler)
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+class LocalProxy:
+    """Прокси в фоновом потоке: LocalProxy().start().url - адрес для CIAN_EGRESS"""
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self._server = _ProxyServer((host, port))
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self):
+        return self._server.requests
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="local-proxy", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+if __name__ == "__main__":
+    proxy = LocalProxy(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8899)
+    print(f"Локальный прокси: {proxy.url}")
+    try:
+        proxy._server.serve_forever()
+    except KeyboardInterrupt:
+        proxy.stop()
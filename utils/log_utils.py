@@ -1,6 +1,114 @@
-def log_message(log_callback, message):
+import itertools
+import queue
+import threading
+import time
+import config
+
+# Уровни сообщений
+DEBUG = 10      # Подробности по каждому объявлению
+INFO = 20       # Ход работы этапа
+WARNING = 30    # Неудача по отдельному объявлению
+SUMMARY = 40    # Итоги этапа
+ERROR = 50      # Ошибки этапа целиком
+
+_STOP = object()
+
+def log_message(log_callback, message, level=INFO, stage=None):
     """Логирует сообщение через callback или стандартный вывод"""
-    if log_callback:
+    # Конвейер (и другие callback с методом submit) сам решает, что и когда выводить
+    submit = getattr(log_callback, "submit", None)
+    if submit is not None:
+        submit(message, level, stage)
+    elif log_callback:
         log_callback(message)
     else:
-        print(message)
\ No newline at end of file
+        print(message)
+
+def report_progress(log_callback, stage, processed, total, success):
+    """Передает счетчики прогресса callback'у, если он их принимает (например, отчет в Telegram)"""
+    progress = getattr(log_callback, "progress", None)
+    if progress is not None:
+        progress(stage, processed, total, success)
+
+class LogPipeline:
+    """Асинхронный конвейер логов парсеров.
+
+    Фильтрует сообщения по уровню, прореживает подробные сообщения по этапам
+    и отправляет их в sink пачками из фонового потока, поэтому горячие
+    циклы парсеров никогда не ждут вывода.
+    """
+
+    def __init__(self, sink=None, min_level=None, quiet=None, sample_rates=None,
+                 batch_size=None, flush_interval=None, max_queue=None):
+        self.sink = sink or print
+        quiet = config.LOG_QUIET if quiet is None else quiet
+        # В тихом режиме остаются только итоги и ошибки
+        self.min_level = SUMMARY if quiet else (config.LOG_MIN_LEVEL if min_level is None else min_level)
+        self.sample_rates = config.LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+        self.batch_size = batch_size or config.LOG_BATCH_SIZE
+        self.flush_interval = config.LOG_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self._queue = queue.Queue(max_queue or config.LOG_MAX_QUEUE)
+        self._counters = {}
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="log-pipeline", daemon=True)
+        self._thread.start()
+
+    def submit(self, message, level=INFO, stage=None):
+        """Ставит сообщение в очередь без блокировки"""
+        if level < self.min_level:
+            return
+        # Итоги и ошибки не прореживаются
+        rate = self.sample_rates.get(stage, 1)
+        if level < SUMMARY and rate > 1:
+            counter = self._counters.setdefault(stage, itertools.count())
+            if next(counter) % rate:
+                return
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def __call__(self, message):
+        self.submit(message)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._emit(batch)
+
+    def _emit(self, batch):
+        try:
+            self.sink("\n".join(batch))
+        except Exception:
+            # Ошибка вывода не должна останавливать конвейер
+            pass
+
+    def close(self):
+        """Дописывает накопленные сообщения и останавливает фоновый поток"""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.dropped:
+            self.sink(f"⚠️ Пропущено {self.dropped} сообщений лога (переполнение очереди)")
+
+def create_pipeline(sink=None, **kwargs):
+    """Создает конвейер логов с настройками из config"""
+    return LogPipeline(sink, **kwargs)
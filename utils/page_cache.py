@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+import config
+from utils import http_client
+
+class PageCache:
+    """Кэш HTML-страниц объявлений с TTL, LRU-вытеснением и условной ревалидацией.
+
+    Хранится в SQLite, поэтому переживает перезапуски и общий для этапа
+    объявлений и этапа телефонов.
+    """
+
+    def __init__(self, db_path=None, ttl=None, max_entries=None, max_bytes=None):
+        self.db_path = db_path or config.PAGE_CACHE_FILE
+        self.ttl = config.PAGE_CACHE_TTL if ttl is None else ttl
+        self.max_entries = config.PAGE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.max_bytes = config.PAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+        self._init_db()
+        self.reset_stats()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_db(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    body TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages (last_access)")
+            conn.commit()
+
+    def reset_stats(self):
+        """Обнуляет статистику (вызывается в начале каждого этапа)"""
+        with self._lock:
+            self.stats = {
+                "requests": 0,
+                "hits": 0,
+                "revalidated": 0,
+                "misses": 0,
+                "bytes_saved": 0,
+                "bytes_downloaded": 0,
+            }
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def fetch(self, url, headers=None, timeout=15):
+        """Возвращает HTML страницы из кэша или из сети"""
+        self._count("requests")
+        now = time.time()
+
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT body, size, etag, last_modified, fetched_at FROM pages WHERE url = ?",
+                (url,)
+            ).fetchone()
+
+            # Свежая запись - отдаем без запроса
+            if row and now - row[4] < self.ttl:
+                conn.execute("UPDATE pages SET last_access = ? WHERE url = ?", (now, url))
+                conn.commit()
+                self._count("hits")
+                self._count("bytes_saved", row[1])
+                return row[0]
+
+        request_headers = dict(headers or {})
+        if row:
+            # Запись устарела - пробуем условный запрос
+            if row[2]:
+                request_headers["If-None-Match"] = row[2]
+            if row[3]:
+                request_headers["If-Modified-Since"] = row[3]
+
+        response = http_client.get(url, headers=request_headers, timeout=timeout)
+
+        if row and response.status_code == 304:
+            with closing(self._connect()) as conn:
+                conn.execute(
+                    "UPDATE pages SET fetched_at = ?, last_access = ? WHERE url = ?",
+                    (now, now, url)
+                )
+                conn.commit()
+            self._count("revalidated")
+            self._count("bytes_saved", row[1])
+            return row[0]
+
+        response.raise_for_status()
+        body = response.text
+        size = len(response.content)
+        self._count("misses")
+        self._count("bytes_downloaded", size)
+
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, size, etag, last_modified, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, size, response.headers.get("ETag"), response.headers.get("Last-Modified"), now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+
+        return body
+
+    def _evict(self, conn):
+        """Вытесняет давно не использованные страницы при превышении лимитов"""
+        count, total_size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        if count <= self.max_entries and total_size <= self.max_bytes:
+            return
+
+        rows = conn.execute("SELECT url, size FROM pages ORDER BY last_access ASC").fetchall()
+        to_delete = []
+        for url, size in rows:
+            if count <= self.max_entries and total_size <= self.max_bytes:
+                break
+            to_delete.append((url,))
+            count -= 1
+            total_size -= size
+        conn.executemany("DELETE FROM pages WHERE url = ?", to_delete)
+
+    def hit_ratio(self):
+        with self._lock:
+            requests_count = self.stats["requests"]
+            served = self.stats["hits"] + self.stats["revalidated"]
+        return served / requests_count if requests_count else 0.0
+
+    def format_stats(self):
+        """Форматирует статистику кэша для логов"""
+        stats = dict(self.stats)
+        return (
+            f"🗄️ Кэш страниц: {stats['hits']} попаданий, {stats['revalidated']} ревалидировано (304), "
+            f"{stats['misses']} загружено из {stats['requests']} запросов "
+            f"(hit ratio {self.hit_ratio():.0%}), сэкономлено {stats['bytes_saved'] / 1024 / 1024:.1f} МБ"
+        )
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+def get_page_cache():
+    """Возвращает общий для обоих этапов экземпляр кэша"""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = PageCache()
+        return _shared_cache
+
+def fetch_page(url, headers=None, timeout=15):
+    """Загружает HTML страницы объявления через общий кэш"""
+    return get_page_cache().fetch(url, headers=headers, timeout=timeout)
@@ -0,0 +1,106 @@
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import threading
+import tracemalloc
+from datetime import datetime
+import config
+
+# Профилировщики рабочих потоков открытого этапа: cProfile видит только поток, в котором включен
+_thread_profilers = None
+_thread_profilers_lock = threading.Lock()
+
+def profile_stage(stage, output_dir="output"):
+    """Профилирует этап парсинга (cProfile + tracemalloc), если включен режим профилирования.
+
+    При выключенном режиме возвращает пустой контекстный менеджер без накладных расходов.
+    """
+    if not config.PROFILE_ENABLED:
+        return contextlib.nullcontext()
+    return _profile(stage, output_dir)
+
+def profile_thread(name):
+    """Профилирует рабочий поток этапа (например, этап конвейера).
+
+    Результат объединяется с отчетом этапа, открытого profile_stage;
+    вне профилируемого этапа возвращает пустой контекстный менеджер.
+    """
+    if _thread_profilers is None:
+        return contextlib.nullcontext()
+    return _profile_thread(name)
+
+@contextlib.contextmanager
+def _profile_thread(name):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _thread_profilers_lock:
+            if _thread_profilers is not None:
+                _thread_profilers.append((name, profiler))
+
+@contextlib.contextmanager
+def _profile(stage, output_dir):
+    global _thread_profilers
+    os.makedirs(output_dir, exist_ok=True)
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(config.PROFILE_TRACEMALLOC_FRAMES)
+    snapshot_before = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    started_at = datetime.now()
+    with _thread_profilers_lock:
+        _thread_profilers = []
+
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _thread_profilers_lock:
+            threads, _thread_profilers = _thread_profilers, None
+        stats = pstats.Stats(profiler)
+        for _, thread_profiler in threads:
+            # Поток без единого вызова под профилировщиком нечего объединять
+            if thread_profiler.getstats():
+                stats.add(thread_profiler)
+        snapshot_after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+
+        base = os.path.join(output_dir, f"profile_{stage}_{started_at.strftime('%d.%m.%Y-%H-%M-%S')}")
+        stats.dump_stats(f"{base}.prof")
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            f.write(_build_report(stage, started_at, stats, [name for name, _ in threads], snapshot_before, snapshot_after, peak))
+
+def _build_report(stage, started_at, stats, threads, snapshot_before, snapshot_after, peak):
+    top_n = config.PROFILE_TOP_N
+    duration = datetime.now() - started_at
+    out = io.StringIO()
+
+    out.write(f"ПРОФИЛЬ ЭТАПА: {stage}\n")
+    out.write("=" * 60 + "\n")
+    out.write(f"Начало: {started_at.strftime('%d.%m.%Y %H:%M:%S')}\n")
+    out.write(f"Длительность: {duration}\n")
+    out.write(f"Пик памяти (tracemalloc): {peak / 1024 / 1024:.1f} МБ\n")
+    if threads:
+        out.write(f"Рабочие потоки (объединены с основным): {', '.join(threads)}\n")
+    out.write("\n")
+
+    for title, sort_key in (("ГОРЯЧИЕ ФУНКЦИИ (cumulative)", "cumulative"), ("ГОРЯЧИЕ ФУНКЦИИ (tottime)", "tottime")):
+        out.write(f"{title}:\n")
+        out.write("-" * 60 + "\n")
+        stats.stream = out
+        stats.strip_dirs().sort_stats(sort_key).print_stats(top_n)
+
+    out.write(f"МЕСТА АЛЛОКАЦИЙ ЭТАПА (top {top_n}):\n")
+    out.write("-" * 60 + "\n")
+    for diff in snapshot_after.compare_to(snapshot_before, "lineno")[:top_n]:
+        out.write(f"{diff}\n")
+
+    return out.getvalue()
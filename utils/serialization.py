@@ -0,0 +1,45 @@
+import json
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Используемая реализация: orjson, если установлен и не отключен в config, иначе stdlib json
+BACKEND = "orjson" if orjson is not None and config.JSON_BACKEND != "json" else "json"
+
+def _dumps_stdlib(obj, indent=False):
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps(obj, indent=False):
+    """Кодирует объект в UTF-8 JSON (bytes): компактно или с отступом 2.
+
+    Совместимость с json.dumps(ensure_ascii=False) - на уровне разбора:
+    loads дает те же значения при любой реализации (кроме NaN/Infinity:
+    orjson пишет их как null). Побайтно вывод может отличаться записью
+    чисел с плавающей точкой: orjson пишет 1e16, 1.5e-7 и 0.00001, stdlib -
+    1e+16, 1.5e-07 и 1e-05.
+    """
+    if BACKEND == "orjson":
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0))
+        except TypeError:
+            # Числа вне диапазона 64 бит и прочие типы, которые orjson не кодирует
+            pass
+    return _dumps_stdlib(obj, indent)
+
+def dumps_str(obj, indent=False):
+    return dumps(obj, indent).decode("utf-8")
+
+def loads(data):
+    """Декодирует JSON из bytes или str"""
+    if BACKEND == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity и другие расширения stdlib json
+            pass
+    return json.loads(data)
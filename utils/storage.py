@@ -0,0 +1,186 @@
+"""Форматы хранения файлов региона и телефонов.
+
+Кодек выбирается при записи (config.STORAGE_CODEC) и определяется
+автоматически при чтении по первым байтам файла, поэтому файлы,
+записанные в прежнем формате (JSON с отступами), читаются без изменений.
+
+Кодеки:
+    json     - JSON с отступами (прежний формат)
+    compact  - JSON без пробелов
+    gzip     - compact, сжатый gzip
+    zstd     - compact, сжатый zstd (нужен пакет zstandard, иначе пишется gzip)
+    records  - бинарные записи: заголовок CIANREC1, затем записи с префиксом длины
+"""
+import gzip
+import itertools
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+from utils import serialization
+import config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import fcntl
+except ImportError:  # Windows: запись несколькими процессами не сериализуется
+    fcntl = None
+
+CODECS = ("json", "compact", "gzip", "zstd", "records")
+
+class CodecUnavailableError(ValueError):
+    """Файл записан кодеком, для которого не установлен пакет"""
+
+RECORDS_MAGIC = b"CIANREC1"
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_LENGTH = struct.Struct("<I")
+
+def _encode(obj, indent=False):
+    return serialization.dumps(obj, indent=indent)
+
+def _decode(data):
+    return serialization.loads(data)
+
+def resolve_codec(codec=None):
+    codec = codec or config.STORAGE_CODEC
+    if codec not in CODECS:
+        raise ValueError(f"Неизвестный кодек хранения: {codec}")
+    if codec == "zstd" and zstandard is None:
+        return "gzip"
+    return codec
+
+def detect_codec(path):
+    """Определяет кодек файла по первым байтам"""
+    with open(path, "rb") as f:
+        head = f.read(len(RECORDS_MAGIC))
+    if head.startswith(RECORDS_MAGIC):
+        return "records"
+    if head.startswith(_GZIP_MAGIC):
+        return "gzip"
+    if head.startswith(_ZSTD_MAGIC):
+        return "zstd"
+    return "json"
+
+def _split(obj):
+    """Разделяет документ на метаданные и коллекцию "data" для бинарного формата"""
+    meta = {k: v for k, v in obj.items() if k != "data"}
+    data = obj.get("data")
+    if isinstance(data, dict):
+        return meta, "dict", ([key, value] for key, value in data.items())
+    if isinstance(data, list):
+        return meta, "list", iter(data)
+    return obj, "none", iter(())
+
+def _write_records(f, obj):
+    meta, kind, items = _split(obj)
+    f.write(RECORDS_MAGIC)
+    header = {"meta": meta, "kind": kind}
+    for item in itertools.chain([header], items):
+        payload = _encode(item)
+        f.write(_LENGTH.pack(len(payload)))
+        f.write(payload)
+
+def _read_records(f):
+    """Читает записи после магической строки: первая - заголовок, остальные - элементы data"""
+    f.read(len(RECORDS_MAGIC))
+    while True:
+        prefix = f.read(_LENGTH.size)
+        if not prefix:
+            return
+        if len(prefix) < _LENGTH.size:
+            raise ValueError("Файл записей обрезан")
+        (length,) = _LENGTH.unpack(prefix)
+        payload = f.read(length)
+        if len(payload) < length:
+            raise ValueError("Файл записей обрезан")
+        yield _decode(payload)
+
+@contextmanager
+def locked(path):
+    """Монопольная блокировка записи файла path между процессами (flock на path.lock).
+
+    Сам файл для flock не подходит: dump заменяет его новым inode.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(f"{path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+def dump(obj, path, codec=None):
+    """Записывает документ атомарно: через временный файл и замену.
+
+    Временный файл у каждого вызова свой, поэтому одновременные записи не
+    смешивают байты; итоговым остается файл последней замены.
+    """
+    codec = resolve_codec(codec)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f"{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if codec == "json":
+                f.write(_encode(obj, indent=True))
+            elif codec == "compact":
+                f.write(_encode(obj))
+            elif codec == "gzip":
+                f.write(gzip.compress(_encode(obj), compresslevel=config.STORAGE_GZIP_LEVEL))
+            elif codec == "zstd":
+                f.write(zstandard.ZstdCompressor(level=config.STORAGE_ZSTD_LEVEL).compress(_encode(obj)))
+            else:
+                _write_records(f, obj)
+        # mkstemp создает файл с правами 0600
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def load(path):
+    """Читает документ любого поддерживаемого формата"""
+    codec = detect_codec(path)
+    with open(path, "rb") as f:
+        if codec == "records":
+            records = _read_records(f)
+            header = next(records)
+            if header["kind"] == "none":
+                return header["meta"]
+            obj = dict(header["meta"])
+            obj["data"] = dict(records) if header["kind"] == "dict" else list(records)
+            return obj
+
+        data = f.read()
+    if codec == "gzip":
+        data = gzip.decompress(data)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise CodecUnavailableError(f"{path} сжат zstd: установите пакет zstandard")
+        data = zstandard.ZstdDecompressor().decompress(data, max_output_size=config.STORAGE_MAX_DECOMPRESSED)
+    return _decode(data)
+
+def iter_data(path):
+    """Перебирает элементы коллекции "data" (для словаря - пары [ключ, значение]).
+
+    Бинарный формат читается потоково, без загрузки всего файла.
+    """
+    if detect_codec(path) == "records":
+        with open(path, "rb") as f:
+            records = _read_records(f)
+            header = next(records)
+            if header["kind"] != "none":
+                yield from records
+        return
+
+    data = load(path).get("data", [])
+    if isinstance(data, dict):
+        yield from ([key, value] for key, value in data.items())
+    else:
+        yield from data
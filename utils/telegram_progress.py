@@ -0,0 +1,180 @@
+import asyncio
+import html
+import threading
+import time
+from datetime import timedelta
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from utils import log_utils
+import config
+
+# Ограничение Telegram на длину сообщения
+MAX_MESSAGE_LENGTH = 4096
+
+STAGE_NAMES = {
+    "ads": "объявления",
+    "phones": "телефоны",
+    "pipeline": "конвейер (объявления и телефоны)"
+}
+
+def _chunks(lines, limit=MAX_MESSAGE_LENGTH):
+    """Склеивает строки в сообщения не длиннее limit"""
+    chunk = ""
+    for line in lines:
+        line = line[:limit]
+        if chunk and len(chunk) + len(line) + 1 > limit:
+            yield chunk
+            chunk = ""
+        chunk = f"{chunk}\n{line}" if chunk else line
+    if chunk:
+        yield chunk
+
+class TelegramProgressReporter:
+    """Отчет о ходе парсинга в Telegram.
+
+    Подключается как log_callback к parse_cian_ads и CianPhoneParser.
+    Вместо сообщения на каждую строку лога держит одно статусное сообщение
+    и редактирует его не чаще edit_interval секунд; ошибки отправляются
+    пачками-дайджестами, итоги - одним сообщением в конце.
+    """
+
+    def __init__(self, bot, chat_id, title="Парсинг", edit_interval=None, digest_interval=None, digest_size=None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.title = title
+        self.edit_interval = edit_interval or config.TELEGRAM_PROGRESS_INTERVAL
+        self.digest_interval = digest_interval or config.TELEGRAM_ERROR_DIGEST_INTERVAL
+        self.digest_size = digest_size or config.TELEGRAM_ERROR_DIGEST_SIZE
+
+        self._lock = threading.Lock()
+        self._stage = None
+        self._stage_started = time.monotonic()
+        self._processed = 0
+        self._total = 0
+        self._success = 0
+        self._last_line = ""
+        self._errors = []
+        self._summary = []
+        self._dirty = False
+        self._last_digest = time.monotonic()
+        self._message_id = None
+        self._task = None
+        self._finished = False
+        self._failed = False
+
+    # --- Вызывается из потока парсера ---
+
+    def submit(self, message, level=log_utils.INFO, stage=None):
+        with self._lock:
+            if level == log_utils.SUMMARY:
+                self._summary.append(message.strip())
+            elif level >= log_utils.WARNING:
+                self._errors.append(message.strip())
+            else:
+                self._last_line = message.strip()
+            self._dirty = True
+
+    def __call__(self, message):
+        self.submit(message)
+
+    def progress(self, stage, processed, total, success):
+        with self._lock:
+            if stage != self._stage:
+                self._stage = stage
+                self._stage_started = time.monotonic()
+            self._processed = processed
+            self._total = total
+            self._success = success
+            self._dirty = True
+
+    # --- Работает в event loop бота ---
+
+    def _render(self):
+        status = "⏳" if not self._finished else "❌" if self._failed else "✅"
+        lines = [f"{status} <b>{html.escape(self.title)}</b>"]
+        if self._stage:
+            lines.append(f"Этап: {STAGE_NAMES.get(self._stage, self._stage)}")
+
+        if self._total:
+            percent = self._processed / self._total
+            lines.append(f"Обработано: {self._processed}/{self._total} ({percent:.0%})")
+        if self._processed:
+            lines.append(f"Успешно: {self._success} ({self._success / self._processed:.0%})")
+
+            elapsed = time.monotonic() - self._stage_started
+            rate = self._processed / elapsed if elapsed > 0 else 0
+            lines.append(f"Скорость: {rate * 60:.1f} объявл./мин")
+            if rate > 0 and self._total > self._processed:
+                eta = timedelta(seconds=int((self._total - self._processed) / rate))
+                lines.append(f"Осталось: ~{eta}")
+
+        if self._errors:
+            lines.append(f"Ошибок в очереди дайджеста: {len(self._errors)}")
+        if self._last_line:
+            lines.append(f"\n<i>{html.escape(self._last_line[:300])}</i>")
+        return "\n".join(lines)
+
+    async def _call(self, method, *args, **kwargs):
+        """Вызывает метод Bot API с учетом flood-ограничений"""
+        try:
+            return await method(*args, **kwargs)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            return await method(*args, **kwargs)
+
+    async def start(self):
+        message = await self._call(self.bot.send_message, self.chat_id, self._render(), parse_mode="HTML")
+        self._message_id = message.message_id
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.edit_interval)
+            await self._flush()
+
+    async def _flush(self, force_digest=False):
+        with self._lock:
+            text = self._render() if self._dirty else None
+            self._dirty = False
+            errors = []
+            digest_due = time.monotonic() - self._last_digest >= self.digest_interval
+            if self._errors and (force_digest or digest_due or len(self._errors) >= self.digest_size):
+                errors, self._errors = self._errors, []
+                self._last_digest = time.monotonic()
+
+        try:
+            if text and self._message_id:
+                try:
+                    await self._call(
+                        self.bot.edit_message_text, text,
+                        chat_id=self.chat_id, message_id=self._message_id, parse_mode="HTML"
+                    )
+                except TelegramBadRequest:
+                    # "message is not modified" и подобные - не повод прерывать отчет
+                    pass
+
+            if errors:
+                header = f"⚠️ Дайджест ошибок ({len(errors)}):"
+                for chunk in _chunks([header] + errors):
+                    await self._call(self.bot.send_message, self.chat_id, chunk)
+        except Exception:
+            # Сбой отчета не должен влиять на парсинг
+            pass
+
+    async def finish(self, success=True):
+        """Последнее обновление статуса (✅ или ❌ при success=False), остаток ошибок и итоговое сообщение"""
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        with self._lock:
+            self._finished = True
+            self._failed = not success
+            self._dirty = True
+        await self._flush(force_digest=True)
+
+        with self._lock:
+            summary, self._summary = self._summary, []
+        for chunk in _chunks(summary):
+            try:
+                await self._call(self.bot.send_message, self.chat_id, chunk)
+            except Exception:
+                pass
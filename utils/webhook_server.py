@@ -0,0 +1,168 @@
+"""Режим webhook: обновления принимает локальный HTTP-сервер aiohttp.
+
+Сервер сразу отвечает Telegram 200 и передает обновление пулу
+обработчиков: обновления разных чатов обрабатываются параллельно,
+обновления одного чата - строго по очереди.
+"""
+import asyncio
+import time
+from collections import deque
+from urllib.parse import urlsplit
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import setup_application
+from utils import serialization
+import config
+
+def chat_key(update):
+    """Ключ очередности обновления: чат, иначе отправитель, иначе само обновление"""
+    for name, event in update.items():
+        if name == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        sender = event.get("from") or event.get("user")
+        if sender:
+            return sender["id"]
+    return ("update", update.get("update_id"))
+
+class ChatOrderedWorkers:
+    """Пул обработчиков обновлений с сохранением порядка внутри чата.
+
+    У каждого чата своя очередь; в пул готовых попадает чат, а не
+    отдельное обновление, поэтому следующее обновление чата берется
+    только после завершения предыдущего. Обработчик, работающий дольше
+    release_after секунд (например, запуск парсинга), продолжает работу в
+    фоне и больше не занимает ни место в пуле, ни очередь своего чата.
+    """
+
+    def __init__(self, handle, workers=None, release_after=None, latency_window=10000):
+        self.handle = handle
+        self.workers = workers or config.BOT_UPDATE_WORKERS
+        self.release_after = config.BOT_CHAT_RELEASE_AFTER if release_after is None else release_after
+        self._chats = {}
+        self._ready = asyncio.Queue()
+        self._tasks = []
+        self._background = set()
+        self.received = 0
+        self.processed = 0
+        self.errors = 0
+        self.released = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    def submit(self, update):
+        self.received += 1
+        key = chat_key(update)
+        item = (update, time.perf_counter())
+        pending = self._chats.get(key)
+        if pending is not None:
+            # Чат уже обрабатывается или ждет в пуле: обновление встанет за предыдущими
+            pending.append(item)
+        else:
+            self._chats[key] = deque([item])
+            self._ready.put_nowait(key)
+
+    def pending(self):
+        return sum(len(items) for items in self._chats.values())
+
+    async def _run(self, update, received_at):
+        try:
+            await self.handle(update)
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Ошибка обработки обновления {update.get('update_id')}: {e}")
+        finally:
+            self.processed += 1
+            self.latencies.append(time.perf_counter() - received_at)
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            items = self._chats[key]
+            update, received_at = items.popleft()
+            task = asyncio.create_task(self._run(update, received_at))
+            done, _ = await asyncio.wait({task}, timeout=self.release_after or None)
+            if not done:
+                self.released += 1
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
+            if items:
+                self._ready.put_nowait(key)
+            else:
+                del self._chats[key]
+
+    async def join(self):
+        """Ждет обработки всех принятых обновлений"""
+        while self._chats or self._background:
+            await asyncio.sleep(0.01)
+
+    async def stop(self):
+        await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def percentile(self, fraction):
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+    def format_stats(self):
+        return (f"📨 Обновления: принято {self.received}, обработано {self.processed}, ошибок {self.errors}, "
+                f"в фоне {self.released}; p50 {self.percentile(0.5) * 1000:.1f} мс, p95 {self.percentile(0.95) * 1000:.1f} мс")
+
+def create_app(dp, bot, workers, path=None, secret=None):
+    """Приложение aiohttp, принимающее обновления по пути path"""
+    path = path or urlsplit(config.WEBHOOK_URL).path or "/webhook"
+    secret = config.WEBHOOK_SECRET if secret is None else secret
+
+    async def receive(request):
+        if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+            return web.Response(status=401)
+        workers.submit(await request.json(loads=serialization.loads))
+        return web.Response()
+
+    async def on_startup(app):
+        workers.start()
+
+    async def on_shutdown(app):
+        await workers.stop()
+
+    app = web.Application()
+    app.router.add_post(path, receive)
+    app.on_startup.append(on_startup)
+    # Сначала дорабатывают обработчики, затем срабатывают обработчики остановки диспетчера.
+    # Хранилище FSM и сессию бота закрывает run_webhook
+    app.on_shutdown.append(on_shutdown)
+    setup_application(app, dp, bot=bot)
+    return app
+
+async def run_webhook(dp, bot):
+    """Регистрирует webhook в Telegram и обслуживает обновления до остановки процесса"""
+    if not config.WEBHOOK_URL:
+        raise RuntimeError("Для режима webhook задайте CIAN_WEBHOOK_URL")
+
+    workers = ChatOrderedWorkers(lambda update: dp.feed_raw_update(bot, update))
+    app = create_app(dp, bot, workers)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+    await bot.set_webhook(config.WEBHOOK_URL, secret_token=config.WEBHOOK_SECRET or None,
+                          allowed_updates=dp.resolve_used_update_types())
+    print(f"🌐 Webhook: {config.WEBHOOK_URL} → {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        print(workers.format_stats())
+        # setup_application только вызывает обработчики остановки диспетчера: ресурсы закрываем сами
+        try:
+            await dp.storage.close()
+        finally:
+            await bot.session.close()
@@ -0,0 +1,195 @@
+import os
+import sqlite3
+import time
+import uuid
+from collections import namedtuple
+from contextlib import closing
+from utils import serialization
+import config
+
+Task = namedtuple("Task", ["offer_id", "url", "author_type", "attempts"])
+
+class WorkQueue:
+    """Персистентная очередь объявлений для нескольких воркеров парсинга телефонов.
+
+    Каждая задача выдается воркеру в аренду (lease) на ограниченное время.
+    Просроченные аренды автоматически возвращаются в очередь, после
+    max_attempts неудачных попыток задача помечается как failed.
+
+    Воркеры, запущенные на один регион одновременно, работают в одном
+    запуске (run): start_run присоединяет воркера к текущему запуску, пока
+    в нем есть задачи или активность в пределах времени аренды, иначе
+    начинает новый.
+    """
+
+    def __init__(self, db_path=None, lease_timeout=None, max_attempts=None):
+        self.db_path = db_path or config.WORK_QUEUE_FILE
+        self.lease_timeout = lease_timeout or config.WORK_QUEUE_LEASE_TIMEOUT
+        self.max_attempts = max_attempts or config.WORK_QUEUE_MAX_ATTEMPTS
+        self._init_db()
+
+    def _connect(self):
+        # isolation_level=None: транзакциями управляем вручную через BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.execute(f"PRAGMA journal_mode={config.WORK_QUEUE_JOURNAL_MODE}")
+        return conn
+
+    def _init_db(self):
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    offer_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    author_type TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    updated_at REAL,
+                    run_id TEXT
+                )
+            ''')
+            # Файлы очереди прежних версий: задачи без запуска относятся к прошлым запускам
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+            if "run_id" not in columns:
+                conn.execute("ALTER TABLE tasks ADD COLUMN run_id TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_run ON tasks (run_id, status)")
+            conn.execute("CREATE TABLE IF NOT EXISTS runs (run_id TEXT PRIMARY KEY, started_at REAL NOT NULL)")
+
+    def _current_run(self, conn, now):
+        """Текущий запуск, если он еще активен: есть невыполненные задачи или недавние изменения"""
+        row = conn.execute("SELECT run_id, started_at FROM runs ORDER BY started_at DESC LIMIT 1").fetchone()
+        if row is None:
+            return None
+        run_id, started_at = row
+        active = conn.execute(
+            "SELECT 1 FROM tasks WHERE run_id = ? AND (status IN ('pending', 'leased') OR updated_at >= ?) LIMIT 1",
+            (run_id, now - self.lease_timeout)
+        ).fetchone()
+        return run_id if active or started_at >= now - self.lease_timeout else None
+
+    def start_run(self, tasks):
+        """Присоединяется к текущему запуску (или начинает новый) и добавляет задачи (offer_id, url, author_type).
+
+        Задачи текущего запуска не дублируются и не сбрасываются; завершенные
+        задачи прошлых запусков возвращаются в очередь - так повторяются
+        неудачные объявления, у которых подошло время повтора. Невыполненные
+        задачи прошлых запусков переходят в текущий.
+        Возвращает (run_id, число добавленных или перенесенных задач).
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                run_id = self._current_run(conn, now)
+                if run_id is None:
+                    run_id = uuid.uuid4().hex
+                    conn.execute("INSERT INTO runs (run_id, started_at) VALUES (?, ?)", (run_id, now))
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT INTO tasks (offer_id, url, author_type, updated_at, run_id) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(offer_id) DO UPDATE SET run_id = excluded.run_id, updated_at = excluded.updated_at, "
+                    "attempts = CASE WHEN tasks.status IN ('done', 'failed') THEN 0 ELSE tasks.attempts END, "
+                    "result = CASE WHEN tasks.status IN ('done', 'failed') THEN NULL ELSE tasks.result END, "
+                    "error = CASE WHEN tasks.status IN ('done', 'failed') THEN NULL ELSE tasks.error END, "
+                    "status = CASE WHEN tasks.status IN ('done', 'failed') THEN 'pending' ELSE tasks.status END "
+                    "WHERE tasks.run_id IS NOT excluded.run_id",
+                    ((offer_id, url, author_type, now, run_id) for offer_id, url, author_type in tasks)
+                )
+                added = conn.total_changes - before
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return run_id, added
+
+    def _requeue_expired(self, conn, now):
+        conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "lease_owner = NULL, lease_expires = NULL, error = 'lease expired', updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ?",
+            (self.max_attempts, now, now)
+        )
+
+    def claim(self, worker_id):
+        """Атомарно выдает воркеру следующую задачу в аренду. None - свободных задач нет"""
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._requeue_expired(conn, now)
+                row = conn.execute(
+                    "SELECT offer_id, url, author_type, attempts FROM tasks "
+                    "WHERE status = 'pending' ORDER BY attempts, rowid LIMIT 1"
+                ).fetchone()
+                if row:
+                    conn.execute(
+                        "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                        "attempts = attempts + 1, updated_at = ? WHERE offer_id = ?",
+                        (worker_id, now + self.lease_timeout, now, row[0])
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if not row:
+            return None
+        return Task(row[0], row[1], row[2], row[3] + 1)
+
+    def complete(self, offer_id, worker_id, result):
+        """Сохраняет результат. False - аренда истекла и задачу уже забрал другой воркер"""
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? "
+                "WHERE offer_id = ? AND lease_owner = ? AND status = 'leased'",
+                (serialization.dumps_str(result), time.time(), offer_id, worker_id)
+            )
+            return cursor.rowcount > 0
+
+    def fail(self, offer_id, worker_id, error):
+        """Возвращает задачу в очередь после ошибки (или помечает failed после max_attempts)"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE offer_id = ? AND lease_owner = ? AND status = 'leased'",
+                (self.max_attempts, str(error), time.time(), offer_id, worker_id)
+            )
+
+    def has_active_leases(self):
+        """Есть ли задачи, которые сейчас обрабатывают другие воркеры"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT COUNT(*) FROM tasks WHERE status = 'leased'").fetchone()
+        return row[0] > 0
+
+    def results(self, run_id):
+        """Возвращает результаты всех завершенных задач запуска: {offer_id: запись}"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT offer_id, result FROM tasks WHERE run_id = ? AND status = 'done'",
+                (run_id,)
+            ).fetchall()
+        return {offer_id: serialization.loads(result) for offer_id, result in rows}
+
+    def counts(self, run_id=None):
+        """Количество задач по статусам (только задачи запуска run_id, если он указан)"""
+        with closing(self._connect()) as conn:
+            if run_id is None:
+                rows = conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT status, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY status", (run_id,)
+                ).fetchall()
+        return dict(rows)
+
+    def clear(self):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("DELETE FROM runs")